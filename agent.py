@@ -1,16 +1,65 @@
 import os
 import subprocess
 import json
-import requests
 from PIL import Image
-from io import BytesIO
-import google.generativeai as genai
 from typing import List, Dict
-import re # Import the regular expressions library
+import asyncio
+import queue
+import threading
+import metrics
+from orchestrator import scrape_all_platforms
+from result_cache import ResultCache
+from image_fetch import fetch_images
+from image_cache import get_default_cache
+from visual_prefilter import FEATURES, parse_features, score_candidates, top_k_indices
+from vision_scoring import PROMPT_VERSION, score_images
+from score_memo import get_default_memo, hash_file
+from gemini_client import DEFAULT_MODEL_NAME, get_model
+from deadline import NO_DEADLINE, Deadline
+from products import Product, ProductBatch, from_records
+from ranking import recommend
+from dedup import Deduper, dedupe
+
+# "concurrent" runs every scraper in-process with asyncio.gather and keeps results in
+# memory; "subprocess" keeps the original one-interpreter-per-scraper path as a fallback,
+# with each script saving its *_data.json file for load_json_data to read back.
+SCRAPER_MODE = os.getenv("SCRAPER_MODE", "concurrent")
+
+VISION_MODEL_NAME = DEFAULT_MODEL_NAME
+
+# "gemini" scores the locally pre-ranked top-K with Gemini Vision; "local" skips Gemini
+# and ranks by the NumPy image features alone (fast fallback when the API is slow).
+VISION_MODE = os.getenv("VISION_MODE", "gemini")
+PREFILTER_TOP_K = int(os.getenv("VISUAL_PREFILTER_TOP_K", "30"))
+PREFILTER_FEATURES = parse_features(os.getenv("VISUAL_PREFILTER_FEATURES", ",".join(FEATURES)))
+VISION_CHUNK_SIZE = int(os.getenv("VISION_CHUNK_SIZE", "10"))
+VISION_MAX_WORKERS = int(os.getenv("VISION_MAX_WORKERS", "4"))
+
+# Longest image download phase, and how much of a search deadline it must leave for Gemini.
+IMAGE_FETCH_SECONDS = float(os.getenv("IMAGE_FETCH_SECONDS", "30"))
+VISION_RESERVE_SECONDS = float(os.getenv("VISION_RESERVE_SECONDS", "8"))
+
+# "local" picks the best-value product with ranking.py in microseconds; "gemini" also asks
+# gemini-2.5-pro for a written recommendation (slower, costs a second API call).
+RECOMMENDATION_MODE = os.getenv("RECOMMENDATION_MODE", "local")
+
+# Collapse the same item listed on several platforms (or several times on one) before
+# scoring, so each is scored once and shown with its cheaper listings as offers.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") != "0"
+
+SCRAPER_SCRIPTS = [
+    ("flipkart_scraper.py", "flipkart_data.json", "Flipkart"),
+    ("amazon.py", "amazon_data.json", "Amazon"),
+    ("scrape_myntra.py", "myntra_data.json", "Myntra"),
+]
+
 # Triggering deployment
 # This function remains the same
-def run_scraper_with_input(script_name: str, search_query: str):
+def run_scraper_with_input(script_name: str, search_query: str, deadline: Deadline = NO_DEADLINE):
     print(f"\n{'='*20}\n[INFO] Running scraper: {script_name} for '{search_query}'\n{'='*20}")
+    if deadline.expired():
+        print(f"[WARNING] No time left to run {script_name}; skipping it.")
+        return False
     try:
         process = subprocess.run(
             ['python', script_name], 
@@ -19,7 +68,7 @@ def run_scraper_with_input(script_name: str, search_query: str):
             capture_output=True, 
             check=True, 
             encoding='utf-8',
-            timeout=300
+            timeout=deadline.clamp(300)
         )
         print(f"Output from {script_name}:\n{process.stdout}")
         print(f"[SUCCESS] Finished running {script_name}.")
@@ -41,17 +90,83 @@ def load_json_data(filename: str, source_name: str) -> List[Dict]:
         print(f"[WARNING] Could not load or parse '{filename}'.")
         return []
 
+def collect_products(search_query: str, mode: str = None, pool=None, cache: ResultCache = None,
+                     deadline: Deadline = None) -> List[Product]:
+    """
+    Scrapes every platform and returns one consolidated list of normalized Products.
+    With a `browser_pool.BrowserPool`, the scrapers share its warm browser instead of
+    each launching Chromium. With a ResultCache, recently scraped platforms are reused.
+    With a Deadline, scraping stops by then and keeps whatever was found.
+    """
+    deadline = deadline or NO_DEADLINE
+    mode = mode or SCRAPER_MODE
+    if mode == "subprocess":
+        all_products = []
+        for script_name, filename, source_name in SCRAPER_SCRIPTS:
+            run_scraper_with_input(script_name, search_query, deadline)
+            all_products += from_records(load_json_data(filename, source_name))
+        return all_products
+
+    if pool is not None:
+        per_platform = pool.run(metrics.bind_trace(
+            scrape_all_platforms(search_query, pool=pool, cache=cache, deadline=deadline)))
+    else:
+        per_platform = asyncio.run(scrape_all_platforms(search_query, cache=cache, deadline=deadline))
+    all_products = []
+    for source_name, products in per_platform.items():
+        all_products += from_records(products, source_name)
+    return all_products
+
+def iter_platform_results(search_query: str, pool=None, cache: ResultCache = None, deadline: Deadline = None):
+    """
+    Yields (platform, products) as each platform finishes scraping, fastest first, with
+    the records already parsed into Products. Scraping keeps running in the background (on the
+    pool's loop, or a helper thread) while the caller works on the earlier platforms.
+    """
+    finished = queue.Queue()
+    done = object()
+
+    def on_platform_done(platform, products):
+        finished.put((platform, products))
+
+    coro = metrics.bind_trace(
+        scrape_all_platforms(search_query, pool=pool, cache=cache, on_platform_done=on_platform_done,
+                             deadline=deadline))
+    if pool is not None:
+        pool.submit(coro).add_done_callback(lambda _: finished.put(done))
+    else:
+        def run():
+            try:
+                asyncio.run(coro)
+            finally:
+                finished.put(done)
+        threading.Thread(target=run, name="scrape-stream", daemon=True).start()
+
+    while True:
+        item = finished.get()
+        if item is done:
+            return
+        platform, products = item
+        yield platform, from_records(products, platform)
+
 # --- NEW: The fast, batch-based visual analysis function ---
-def find_visual_matches_in_batch(all_products: List[Dict], user_image_path: str, api_key: str) -> List[Dict]:
+def find_visual_matches_in_batch(all_products: List[Product], user_image_path: str, api_key: str,
+                                 top_k: int = None, mode: str = None, deadline: Deadline = None,
+                                 deduper: Deduper = None) -> List[Product]:
+    """
+    Top 5 of `all_products` by visual similarity to the user's image. Pass the same
+    `deduper` for every batch of one search (e.g. one per platform) so listings already
+    seen in an earlier batch are folded into those products' offers instead of re-scored.
+    """
     if not all_products:
         print("[WARNING] No products were scraped, cannot perform visual analysis.")
         return []
 
+    top_k = top_k or PREFILTER_TOP_K
+    mode = mode or VISION_MODE
+    deadline = deadline or NO_DEADLINE
     print(f"\n{'='*20}\n[INFO] Preparing images for fast batch analysis...\n{'='*20}")
     
-    genai.configure(api_key=api_key)
-    vision_model = genai.GenerativeModel('gemini-2.5-pro')
-    
     try:
         user_image = Image.open(user_image_path)
     except FileNotFoundError:
@@ -61,84 +176,127 @@ def find_visual_matches_in_batch(all_products: List[Dict], user_image_path: str,
         print(f"[ERROR] The user image file is invalid or corrupted: {e}")
         return []
 
-    # --- Step 1: Prepare the prompt and download all images ---
-    # The prompt will contain the user image first, then all product images
-    prompt_parts = [
-        "You are an AI expert in visual similarity.",
-        "The very first image is the user's reference image.",
-        "All subsequent images are products from an e-commerce site.",
-        "For each product image, compare it to the first user image and generate a similarity score from 0 (completely different) to 10 (nearly identical).",
-        "Your final response MUST be a numbered list of scores, one for each product image. For example:",
-        "1: 8",
-        "2: 3",
-        "3: 9",
-        "--- USER IMAGE ---",
-        user_image,
-        "--- PRODUCT IMAGES ---"
-    ]
-    
-    valid_products_for_batch = []
-    for i, product in enumerate(all_products):
-        product_image_url = product.get('image_url') or product.get('image')
-        if not product_image_url or not product_image_url.startswith('http'):
-            continue
-        
-        try:
-            print(f"Downloading image {i+1}/{len(all_products)} for batch...")
-            response = requests.get(product_image_url, timeout=10)
-            response.raise_for_status()
-            product_image = Image.open(BytesIO(response.content))
-            
-            # Add the valid product and its image to our lists
+    # --- Step 1: Download all product images ---
+    candidates = []
+    for product in all_products:
+        if product.image_url.startswith('http'):
+            candidates.append((product, product.image_url))
+
+    # Download all images concurrently over pooled connections, downsized as they arrive.
+    # Whatever hasn't arrived in time to leave Gemini its reserve is dropped; if even that
+    # leaves no time, download until the deadline and rank locally instead.
+    fetch_budget = deadline.clamp(IMAGE_FETCH_SECONDS, reserve=VISION_RESERVE_SECONDS if mode != "local" else 0)
+    if fetch_budget < 1:
+        fetch_budget = deadline.clamp(IMAGE_FETCH_SECONDS)
+    print(f"Downloading {len(candidates)} product images concurrently...")
+    with metrics.span("image_fetch"):
+        images, fetch_stats = fetch_images([url for _, url in candidates], cache=get_default_cache(),
+                                           deadline=fetch_budget, request_timeout=min(10.0, fetch_budget))
+    print(f"[INFO] {fetch_stats.summary()}")
+
+    valid_products_for_batch, product_images = [], []
+    for (product, _), product_image in zip(candidates, images):
+        if product_image is not None:
             valid_products_for_batch.append(product)
-            prompt_parts.append(product_image)
-        except requests.RequestException:
-            pass # Silently skip images that fail to download
+            product_images.append(product_image)
 
     if not valid_products_for_batch:
+        if deadline.expired():
+            # Out of time before any image arrived: unranked products beat no answer.
+            print("[WARNING] Deadline reached before any image was downloaded; returning unranked products.")
+            return list(all_products[:5])
         print("[WARNING] No valid images could be downloaded for comparison.")
         return []
 
-    # --- Step 2: Make ONE single, powerful API call ---
-    print(f"\n[INFO] Sending one batch of {len(valid_products_for_batch)} images to Gemini for analysis. This may take a moment...")
-    
-    try:
-        response = vision_model.generate_content(prompt_parts)
-        
-        # --- Step 3: Parse the single text response to get all scores ---
-        print("[INFO] Parsing batch response...")
-        scores_text = response.text
-        
-        # Use regular expressions to find all "number: score" pairs
-        matches = re.findall(r'(\d+):\s*(\d+)', scores_text)
-        
-        for product_index_str, score_str in matches:
-            # The model gives us product index (1, 2, 3...), we convert to list index (0, 1, 2...)
-            product_index = int(product_index_str) - 1
-            score = int(score_str)
-            
-            if 0 <= product_index < len(valid_products_for_batch):
-                valid_products_for_batch[product_index]['visual_score'] = score
+    # --- Step 1b: One representative per cluster of near-identical listings ---
+    if DEDUP_ENABLED:
+        with metrics.span("dedup"):
+            keep = dedupe(valid_products_for_batch, product_images, deduper)
+        if len(keep) < len(valid_products_for_batch):
+            print(f"[INFO] Dedup: {len(valid_products_for_batch)} listings -> {len(keep)} new distinct products.")
+        valid_products_for_batch = [valid_products_for_batch[i] for i in keep]
+        product_images = [product_images[i] for i in keep]
+        if not valid_products_for_batch:
+            print("[INFO] Every listing duplicates a product that was already scored.")
+            return []
 
-    except Exception as e:
-        print(f"[ERROR] An error occurred during the batch Gemini API call: {e}")
-        return []
+    # --- Step 2: Cheap local ranking; only the closest top-K go on to Gemini ---
+    with metrics.span("local_prefilter"):
+        local_scores = score_candidates(user_image, product_images, PREFILTER_FEATURES)
+    for product, local_score in zip(valid_products_for_batch, local_scores):
+        product.local_score = round(float(local_score) * 10, 1)
+
+    if mode == "local":
+        print("[INFO] VISION_MODE=local: ranking by local image features only.")
+        return _top_by_local_score(valid_products_for_batch)
+
+    keep = top_k_indices(local_scores, top_k)
+    if len(keep) < len(valid_products_for_batch):
+        print(f"[INFO] Local prefilter kept the top {len(keep)} of {len(valid_products_for_batch)} candidates.")
+    valid_products_for_batch = [valid_products_for_batch[i] for i in keep]
+    product_images = [product_images[i] for i in keep]
+
+    # --- Step 3: Reuse scores already paid for on earlier searches ---
+    memo = get_default_memo()
+    user_hash = hash_file(user_image_path)
+    score_version = f"{VISION_MODEL_NAME}:{PROMPT_VERSION}"
+    product_hashes = [image.info.get("content_hash") for image in product_images]
+    memoized = memo.get_many(user_hash, [h for h in product_hashes if h], score_version)
+    for product, product_hash in zip(valid_products_for_batch, product_hashes):
+        if product_hash in memoized:
+            product.visual_score = memoized[product_hash]
+    metrics.CACHE_LOOKUPS.inc(len(memoized), cache="score_memo", outcome="hit")
+    metrics.CACHE_LOOKUPS.inc(len(product_images) - len(memoized), cache="score_memo", outcome="miss")
+    print(f"[INFO] {len(memoized)} of {len(product_images)} scores reused; {memo.summary()}")
+
+    # --- Step 4: Score the rest with Gemini in concurrent chunks ---
+    # Product IDs tie every score in the JSON reply back to exactly one product.
+    to_score = [i for i, h in enumerate(product_hashes) if h not in memoized]
+    scoring_candidates = [(f"p{i + 1}", product_images[i]) for i in to_score]
+    scores = {}
+    if scoring_candidates:
+        print(f"\n[INFO] Sending {len(scoring_candidates)} images to Gemini in chunks of {VISION_CHUNK_SIZE}. This may take a moment...")
+        try:
+            vision_model = get_model(VISION_MODEL_NAME, api_key)
+            with metrics.span("gemini_scoring"):
+                scores, scoring_stats = score_images(vision_model, user_image, scoring_candidates,
+                                                     chunk_size=VISION_CHUNK_SIZE, max_workers=VISION_MAX_WORKERS,
+                                                     deadline=deadline)
+            print(f"[INFO] {scoring_stats.summary()}")
+        except Exception as e:
+            print(f"[ERROR] An error occurred during the Gemini scoring: {e}")
+
+    if not scores and not memoized:
+        print("[INFO] No Gemini scores available. Falling back to the local visual ranking.")
+        return _top_by_local_score(valid_products_for_batch)
+
+    new_memo_entries = {}
+    for i in to_score:
+        score = scores.get(f"p{i + 1}")
+        if score is not None:
+            valid_products_for_batch[i].visual_score = score
+            if product_hashes[i]:
+                new_memo_entries[product_hashes[i]] = score
+    memo.put_many(user_hash, new_memo_entries, score_version)
 
-    # --- Step 4: Sort and return the top 5 ---
-    valid_products_for_batch.sort(key=lambda x: x.get('visual_score', 0), reverse=True)
-    return valid_products_for_batch[:5]
+    # --- Step 5: Sort and return the top 5; cheaper duplicates are listed in their offers ---
+    return ProductBatch(valid_products_for_batch).top(5, "visual_score")
 
+def _top_by_local_score(products: List[Product]) -> List[Product]:
+    # visual_score stays None: local scores are not on Gemini's scale (see Product.match_key).
+    return ProductBatch(products).top(5, "local_score")
 
-# --- This function is now used for the FINAL recommendation step only ---
-def get_expert_recommendation(top_5_products: List[Dict], user_query: str, api_key: str) -> str:
+
+# --- Optional LLM write-up; the default recommendation comes from ranking.recommend ---
+def get_expert_recommendation(top_5_products: List[Product], user_query: str, api_key: str,
+                              deadline: Deadline = None) -> str:
     if not top_5_products:
         return "Could not determine the best product as no visual matches were found."
 
     print(f"\n{'='*20}\n[INFO] Sending top 5 visual matches to Gemini Pro for final recommendation...\n{'='*20}")
     
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-pro')
-    product_json_string = json.dumps(top_5_products, indent=2)
+    model = get_model(DEFAULT_MODEL_NAME, api_key)
+    product_json_string = json.dumps([p.to_dict() for p in top_5_products], indent=2, ensure_ascii=False)
 
     prompt = f"""
     You are a professional e-commerce shopping assistant.
@@ -158,9 +316,14 @@ def get_expert_recommendation(top_5_products: List[Dict], user_query: str, api_k
     """
     
     try:
-        response = model.generate_content(prompt)
+        options = {"request_options": {"timeout": deadline.timeout()}} if deadline and deadline.timeout() else {}
+        with metrics.span("gemini_call", "recommendation"):
+            response = model.generate_content(prompt, **options)
+        metrics.GEMINI_CALLS.inc(purpose="recommendation", outcome="ok")
+        metrics.record_gemini_usage(response, "recommendation")
         return response.text
     except Exception as e:
+        metrics.GEMINI_CALLS.inc(purpose="recommendation", outcome="error")
         print(f"[ERROR] An error occurred during the final recommendation API call: {e}")
         return "There was an error generating the final recommendation."
 
@@ -177,18 +340,8 @@ def main():
         print("[ERROR] API Key is missing in agent.py.")
         return
 
-    # Scraping
-    run_scraper_with_input('flipkart_scraper.py', search_query)
-    run_scraper_with_input('amazon.py', search_query)
-    run_scraper_with_input('scrape_myntra.py', search_query)
-    
-    # Consolidation
-    print(f"\n{'='*20}\n[INFO] Consolidating all scraped data...\n{'='*20}")
-    all_scraped_products = (
-        load_json_data('flipkart_data.json', 'Flipkart') +
-        load_json_data('amazon_data.json', 'Amazon') +
-        load_json_data('myntra_data.json', 'Myntra')
-    )
+    # Scraping & consolidation
+    all_scraped_products = collect_products(search_query, cache=ResultCache.from_env())
     if not all_scraped_products:
         print("\n[ERROR] No data was scraped from any platform. Exiting.")
         return
@@ -197,8 +350,11 @@ def main():
     # Step 1: Find the Top 5 Visual Matches using the fast batch method
     top_5_visual_matches = find_visual_matches_in_batch(all_scraped_products, image_path, GEMINI_API_KEY)
 
-    # Step 2: Get the Final Expert Recommendation on that Top 5 list
-    final_recommendation = get_expert_recommendation(top_5_visual_matches, search_query, GEMINI_API_KEY)
+    # Step 2: Pick the best value among the Top 5 locally, or ask Gemini for a write-up
+    if RECOMMENDATION_MODE == "gemini":
+        final_recommendation = get_expert_recommendation(top_5_visual_matches, search_query, GEMINI_API_KEY)
+    else:
+        final_recommendation = recommend(top_5_visual_matches, search_query)
 
     # Display the final, reasoned output
     print(f"\n{'='*30}\n[AGENT'S RECOMMENDATION]\n{'='*30}")
@@ -208,15 +364,9 @@ def main():
     if top_5_visual_matches:
         print(f"\n\n--- (Details of the Top 5 Visually-Matched Products) ---")
         for i, product in enumerate(top_5_visual_matches, 1):
-            name = product.get('name') or product.get('title', 'N/A')
-            price = product.get('price', 'N/A')
-            rating = product.get('rating', 'N/A')
-            source = product.get('source', 'N/A')
-            url = product.get('product_url', 'N/A')
-            visual_score = product.get('visual_score', 'N/A')
-            print(f"\n{i}. {name} (Visual Score: {visual_score}/10)")
-            print(f"   - Source: {source}, Price: {price}, Rating: {rating}")
-            print(f"   - URL: {url}")
+            print(f"\n{i}. {product.title} (Visual Score: {product.match_text})")
+            print(f"   - Source: {product.source}, Price: {product.price_text}, Rating: {product.rating_text}")
+            print(f"   - URL: {product.product_url or 'N/A'}")
 
 if __name__ == "__main__":
 
@@ -1,120 +1,307 @@
 # amazon.py
 import asyncio
-import json
+import time
+from typing import AsyncIterator
 from playwright.async_api import async_playwright, TimeoutError
+import metrics
+from deadline import NO_DEADLINE, Deadline
+from products import ProductRecord, save_products
+from resource_blocking import install_blocking
 
-async def scrape_amazon_products(query: str, max_pages: int = 3, output_filename: str = "amazon_data.json"):
+BASE_URL = "https://www.amazon.in"
+RESULT_SELECTOR = "div[data-component-type='s-search-result']"
+STEALTH_SCRIPT = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+# Later result pages are skipped once less than this much of the deadline is left:
+# a page that can't finish loading only delays the products already found.
+MIN_PAGE_SECONDS = 5
+
+# Options for the BrowserContext this scraper runs in, shared with the browser pool.
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36",
+    "viewport": {'width': 1920, 'height': 1080},
+}
+
+async def iter_amazon_products(query: str, max_pages: int = 3, context=None, extraction_mode: str = "bulk",
+                               pagination_mode: str = "parallel", max_concurrency: int = 3,
+                               base_url: str = BASE_URL, deadline: Deadline = None) -> AsyncIterator[ProductRecord]:
     """
-    Searches for a product on Amazon, paginates through results, and scrapes all product details
-    using a perfected, multi-step parsing logic to ensure all data is captured.
+    Searches for a product on Amazon, paginates through results, and yields product records
+    page by page as they are extracted, using a perfected, multi-step parsing logic to
+    ensure all data is captured.
+    Pass `context` to run inside an existing BrowserContext (e.g. from the browser pool);
+    otherwise a private headless browser is launched and closed.
+    `extraction_mode` is "bulk" (one in-page evaluate per results page) or "element"
+    (the original per-element queries).
+    `pagination_mode` "parallel" opens pages 1..max_pages directly in up to `max_concurrency`
+    tabs at once; "click" follows the next-page button one page at a time.
+    `base_url` points the scraper at another host, e.g. the benchmark fixture server.
+    With a `deadline`, page timeouts are shortened to fit it and later pages are skipped
+    when there is no time left to load them.
     """
+    deadline = deadline or NO_DEADLINE
     formatted_query = "+".join(query.split())
-    base_url = "https://www.amazon.in"
     search_url = f"{base_url}/s?k={formatted_query}"
-    results = []
 
     print(f"[INFO] Starting scrape for '{query}' on Amazon (headless)...")
 
+    async def iter_pages(ctx):
+        route_stats = await install_blocking(ctx, "Amazon")
+        try:
+            if pagination_mode == "parallel":
+                pages = _iter_pages_parallel(ctx, search_url, base_url, max_pages, extraction_mode, max_concurrency,
+                                             deadline)
+            else:
+                pages = _iter_pages(ctx, search_url, base_url, max_pages, extraction_mode, deadline)
+            async for record in pages:
+                yield record
+        finally:
+            print(f"[INFO] {route_stats.summary()}")
+
+    if context is not None:
+        async for record in iter_pages(context):
+            yield record
+        return
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context(**CONTEXT_OPTIONS)
+            async for record in iter_pages(context):
+                yield record
+            await context.close()
+        finally:
+            await browser.close()
+
+async def scrape_amazon_products(query: str, max_pages: int = 3, output_filename: str = None, context=None,
+                                 extraction_mode: str = "bulk", pagination_mode: str = "parallel", max_concurrency: int = 3,
+                                 base_url: str = BASE_URL, deadline: Deadline = None):
+    """
+    Collects `iter_amazon_products` into a list. Pass `output_filename` to also save the
+    results as JSON (debugging, and the subprocess scraper mode in agent.py).
+    """
+    results = []
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36",
-                viewport={'width': 1920, 'height': 1080},
-            )
-            await context.add_init_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-            page = await context.new_page()
+        async for record in iter_amazon_products(query, max_pages, context, extraction_mode,
+                                                 pagination_mode, max_concurrency, base_url, deadline):
+            results.append(record)
+    except Exception as e:
+        print(f"[ERROR] An unexpected error occurred: {e}")
+
+    if results:
+        print(f"\n[SUCCESS] Scraped details for {len(results)} products.")
+    else:
+        print("[WARNING] Scraping complete, but no data was extracted. Please check the selectors and page content.")
+    if output_filename:
+        save_products(results, output_filename)
+
+    return results
+
+async def _iter_pages(context, search_url: str, base_url: str, max_pages: int,
+                      extraction_mode: str = "bulk", deadline: Deadline = NO_DEADLINE) -> AsyncIterator[ProductRecord]:
+    """Walks the result pages inside `context` by clicking "next", yielding each page's products."""
+    await context.add_init_script(STEALTH_SCRIPT)
+    page = await context.new_page()
+    try:
+        await page.goto(search_url, wait_until="load", timeout=deadline.timeout_ms(90))
 
-            await page.goto(search_url, wait_until="load", timeout=90000)
+        if await _is_blocked(page):
+            return
 
-            page_title = await page.title()
-            if "robot" in page_title.lower() or "captcha" in page_title.lower():
-                print("[ERROR] CAPTCHA detected. Amazon is blocking the request. Cannot proceed.")
-                await browser.close()
-                return
+        for page_num in range(1, max_pages + 1):
+            print(f"--- Scraping Page {page_num} ---")
 
-            current_page_num = 0
-            for page_num in range(1, max_pages + 1):
-                current_page_num = page_num
-                print(f"--- Scraping Page {page_num} ---")
+            try:
+                await page.wait_for_selector(RESULT_SELECTOR, timeout=deadline.timeout_ms(30))
+            except TimeoutError:
+                print("[ERROR] Could not find search results on the page. Stopping.")
+                break
 
+            for record in await _extract_page(page, base_url, extraction_mode, page_num):
+                yield record
+
+            next_button = await page.query_selector("a.s-pagination-next:not(.s-pagination-disabled)")
+            if next_button and page_num < max_pages and deadline.remaining() < MIN_PAGE_SECONDS:
+                print("Out of time for more pages; keeping the results so far.")
+                break
+            if next_button and page_num < max_pages:
+                print("Navigating to the next page...")
+                await next_button.click()
+                await page.wait_for_load_state("load", timeout=deadline.timeout_ms(60))
+            else:
+                print("No more pages to scrape. Reached the end.")
+                break
+    finally:
+        await page.close()
+
+async def _iter_pages_parallel(context, search_url: str, base_url: str, max_pages: int,
+                               extraction_mode: str = "bulk", max_concurrency: int = 3,
+                               deadline: Deadline = NO_DEADLINE) -> AsyncIterator[ProductRecord]:
+    """
+    Loads `/s?k=...&page=N` for every page concurrently in separate tabs of `context`,
+    then yields products in page order, skipping repeated ASINs. Page N is yielded as
+    soon as it and every earlier page have finished, while later pages keep loading.
+    """
+    await context.add_init_script(STEALTH_SCRIPT)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def scrape_one(page_num: int) -> list:
+        async with semaphore:
+            if page_num > 1 and deadline.remaining() < MIN_PAGE_SECONDS:
+                print(f"[INFO] Skipping page {page_num}: not enough time left in the deadline.")
+                return []
+            print(f"--- Scraping Page {page_num} ---")
+            page = await context.new_page()
+            try:
+                page_url = search_url if page_num == 1 else f"{search_url}&page={page_num}"
+                await page.goto(page_url, wait_until="load", timeout=deadline.timeout_ms(90))
+                if await _is_blocked(page):
+                    return []
                 try:
-                    await page.wait_for_selector("div[data-component-type='s-search-result']", timeout=30000)
+                    await page.wait_for_selector(RESULT_SELECTOR, timeout=deadline.timeout_ms(30))
                 except TimeoutError:
-                    print("[ERROR] Could not find search results on the page. Stopping.")
-                    break
-
-                product_elements = await page.query_selector_all("div[data-component-type='s-search-result']")
-
-                for product in product_elements:
-                    asin = await product.get_attribute("data-asin")
-                    if not asin or asin.strip() == "":
-                        continue
-
-                    title = "N/A"
-                    title_el = await product.query_selector('h2 a.a-link-normal span.a-text-normal')
-                    if title_el:
-                        title = await title_el.text_content()
-
-                    if title == "N/A" or len(title.strip()) < 5:
-                        image_el = await product.query_selector('img.s-image')
-                        if image_el:
-                            alt_text = await image_el.get_attribute('alt')
-                            if alt_text and alt_text.strip():
-                                title = alt_text
-
-                    if title == "N/A" or len(title.strip()) < 5:
-                        simple_title_el = await product.query_selector('h2 a span')
-                        if simple_title_el:
-                             title = await simple_title_el.text_content()
-
-                    price, rating, image_url = "N/A", "N/A", "N/A"
-
-                    price_el = await product.query_selector('span.a-price-whole')
-                    if price_el:
-                        price = f"Rs.{await price_el.text_content()}"
-
-                    rating_el = await product.query_selector('span.a-icon-alt')
-                    if rating_el:
-                        rating = await rating_el.text_content()
-
-                    image_el_for_url = await product.query_selector('img.s-image')
-                    if image_el_for_url:
-                        image_url = await image_el_for_url.get_attribute('src')
-                    
-                    product_url = f"{base_url}/dp/{asin}"
-
-                    results.append({
-                        "title": title.strip(),
-                        "price": price.strip().replace('.',''),
-                        "rating": rating.strip(),
-                        "image_url": image_url,
-                        "product_url": product_url
-                    })
-
-                next_button = await page.query_selector("a.s-pagination-next:not(.s-pagination-disabled)")
-                if next_button and page_num < max_pages:
-                    print("Navigating to the next page...")
-                    await next_button.click()
-                    await page.wait_for_load_state("load", timeout=60000)
-                else:
-                    print("No more pages to scrape. Reached the end.")
-                    break
+                    print(f"[WARNING] No search results on page {page_num}.")
+                    return []
+                return await _extract_page(page, base_url, extraction_mode, page_num)
+            finally:
+                await page.close()
 
-            await context.close()
-            await browser.close()
+    tasks = [asyncio.ensure_future(scrape_one(n)) for n in range(1, max_pages + 1)]
+    seen_asins = set()
+    try:
+        for page_num, task in enumerate(tasks, 1):
+            try:
+                page_results = await task
+            except Exception as e:
+                print(f"[ERROR] Page {page_num} failed: {e}")
+                continue
+            for record in page_results:
+                asin = record["product_url"].rsplit("/", 1)[-1]
+                if asin not in seen_asins:
+                    seen_asins.add(asin)
+                    yield record
+    finally:
+        # The consumer stopped early (or timed out): don't leave tabs loading.
+        for task in tasks:
+            task.cancel()
 
-        if results:
-            print(f"\n[SUCCESS] Scraped details for {len(results)} products across {current_page_num} page(s).")
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            print(f"All data has been saved to '{output_filename}'")
+async def _is_blocked(page) -> bool:
+    page_title = await page.title()
+    if "robot" in page_title.lower() or "captcha" in page_title.lower():
+        print("[ERROR] CAPTCHA detected. Amazon is blocking the request. Cannot proceed.")
+        metrics.BLOCKED_PAGES.inc(platform="Amazon")
+        return True
+    return False
+
+async def _extract_page(page, base_url: str, extraction_mode: str, page_num: int) -> list:
+    started = time.perf_counter()
+    with metrics.span("extract_page", "Amazon"):
+        if extraction_mode == "bulk":
+            page_results = await extract_page_bulk(page, base_url)
         else:
-            print("[WARNING] Scraping complete, but no data was extracted. Please check the selectors and page content.")
+            page_results = await extract_page_per_element(page, base_url)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[TIMING] Page {page_num}: extracted {len(page_results)} products in {elapsed_ms:.0f} ms ({extraction_mode}).")
+    return page_results
 
-    except Exception as e:
-        print(f"[ERROR] An unexpected error occurred: {e}")
+# ------------------------------------------------------------------
+# Per-page extraction. Both paths apply the same fallback chains and
+# hand the raw fields to _build_record, so their output is identical.
+# ------------------------------------------------------------------
+
+# Runs inside the page: one CDP round-trip returns every card on the results page.
+_EXTRACT_CARDS_JS = """
+cards => cards.map(card => {
+    const asin = card.getAttribute('data-asin');
+    if (!asin || asin.trim() === '') return null;
+    const text = sel => { const el = card.querySelector(sel); return el ? el.textContent : null; };
+
+    let title = 'N/A';
+    const mainTitle = text('h2 a.a-link-normal span.a-text-normal');
+    if (mainTitle !== null) title = mainTitle;
+
+    const image = card.querySelector('img.s-image');
+    if (title === 'N/A' || title.trim().length < 5) {
+        const alt = image ? image.getAttribute('alt') : null;
+        if (alt && alt.trim()) title = alt;
+    }
+    if (title === 'N/A' || title.trim().length < 5) {
+        const simpleTitle = text('h2 a span');
+        if (simpleTitle !== null) title = simpleTitle;
+    }
+
+    return {
+        asin: asin,
+        title: title,
+        price: text('span.a-price-whole'),
+        rating: text('span.a-icon-alt'),
+        image_url: image ? image.getAttribute('src') : null,
+    };
+}).filter(Boolean)
+"""
+
+def _build_record(asin: str, title: str, price, rating, image_url, base_url: str) -> dict:
+    return {
+        "title": title.strip(),
+        "price": (f"Rs.{price}" if price is not None else "N/A").strip().replace('.',''),
+        "rating": (rating if rating is not None else "N/A").strip(),
+        "image_url": image_url if image_url is not None else "N/A",
+        "product_url": f"{base_url}/dp/{asin}"
+    }
+
+async def extract_page_bulk(page, base_url: str = BASE_URL) -> list:
+    """Extracts every product on the current results page with a single in-page evaluate."""
+    cards = await page.eval_on_selector_all(RESULT_SELECTOR, _EXTRACT_CARDS_JS)
+    return [
+        _build_record(c["asin"], c["title"], c["price"], c["rating"], c["image_url"], base_url)
+        for c in cards
+    ]
+
+async def extract_page_per_element(page, base_url: str = BASE_URL) -> list:
+    """Extracts products with individual element queries (several round-trips per product)."""
+    results = []
+    product_elements = await page.query_selector_all(RESULT_SELECTOR)
+
+    for product in product_elements:
+        asin = await product.get_attribute("data-asin")
+        if not asin or asin.strip() == "":
+            continue
+
+        title = "N/A"
+        title_el = await product.query_selector('h2 a.a-link-normal span.a-text-normal')
+        if title_el:
+            title = await title_el.text_content()
+
+        if title == "N/A" or len(title.strip()) < 5:
+            image_el = await product.query_selector('img.s-image')
+            if image_el:
+                alt_text = await image_el.get_attribute('alt')
+                if alt_text and alt_text.strip():
+                    title = alt_text
+
+        if title == "N/A" or len(title.strip()) < 5:
+            simple_title_el = await product.query_selector('h2 a span')
+            if simple_title_el:
+                 title = await simple_title_el.text_content()
+
+        price, rating, image_url = None, None, None
+
+        price_el = await product.query_selector('span.a-price-whole')
+        if price_el:
+            price = await price_el.text_content()
+
+        rating_el = await product.query_selector('span.a-icon-alt')
+        if rating_el:
+            rating = await rating_el.text_content()
+
+        image_el_for_url = await product.query_selector('img.s-image')
+        if image_el_for_url:
+            image_url = await image_el_for_url.get_attribute('src')
+
+        results.append(_build_record(asin, title, price, rating, image_url, base_url))
+
+    return results
 
 if __name__ == "__main__":
     search_query = input("Enter product to search on Amazon: ").strip() or "nike shoes"
-    asyncio.run(scrape_amazon_products(search_query, max_pages=1))
\ No newline at end of file
+    asyncio.run(scrape_amazon_products(search_query, max_pages=3, output_filename="amazon_data.json"))
@@ -0,0 +1,109 @@
+# benchmarks/fake_gemini.py
+import json
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from PIL import Image
+
+from visual_prefilter import score_candidates
+
+_PRODUCT_ID = re.compile(r"^Product ID: (\S+)$")
+
+
+class FakeStats:
+    def __init__(self):
+        self.calls = 0
+        self.images = 0
+        self.failures = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, images: int, seconds: float, failed: bool):
+        with self._lock:
+            self.calls += 1
+            self.images += images
+            self.failures += failed
+            self.busy_seconds += seconds
+
+
+class _UsageMetadata:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text: str, prompt_tokens: int):
+        self.text = text
+        self.usage_metadata = _UsageMetadata(prompt_tokens, len(text) // 4)
+
+
+class FakeGenerativeModel:
+    """
+    Offline stand-in for genai.GenerativeModel.
+
+    Sleeps `latency + per_image_latency * images` per call to mimic the API, fails a
+    `failure_rate` fraction of calls, and answers both prompt shapes the agent sends:
+    visual-scoring chunks get JSON scores (from the local image-similarity features, so
+    rankings stay meaningful) and anything else gets a short markdown recommendation.
+    """
+
+    latency = 1.0
+    per_image_latency = 0.02
+    failure_rate = 0.0
+    stats = FakeStats()
+    _rng = random.Random(0)
+
+    def __init__(self, model_name: str = "fake", **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, generation_config=None, **kwargs):
+        parts = contents if isinstance(contents, list) else [contents]
+        images = [part for part in parts if isinstance(part, Image.Image)]
+        delay = self.latency + self.per_image_latency * len(images)
+        time.sleep(delay)
+
+        failed = self._rng.random() < self.failure_rate
+        self.stats.record(len(images), delay, failed)
+        if failed:
+            raise RuntimeError("fake Gemini: simulated 503")
+
+        prompt_tokens = sum(len(part) // 4 for part in parts if isinstance(part, str)) + 258 * len(images)
+        ids = [m.group(1) for part in parts if isinstance(part, str) for m in [_PRODUCT_ID.match(part)] if m]
+        if ids and images:
+            # parts: ..., user image, ..., "Product ID: pN", image, "Product ID: pM", image, ...
+            similarity = score_candidates(images[0], images[1:])
+            scores = [{"id": pid, "score": int(round(float(s) * 10))} for pid, s in zip(ids, similarity)]
+            return FakeResponse(json.dumps({"scores": scores}), prompt_tokens)
+
+        return FakeResponse(
+            "**Top Recommendation**\nThe first product offers the best balance of price, rating and match.\n\n"
+            "**Other Good Options**\n- The others are close alternatives.",
+            prompt_tokens,
+        )
+
+
+@contextmanager
+def fake_gemini(latency: float = 1.0, per_image_latency: float = 0.02, failure_rate: float = 0.0):
+    """Patches google.generativeai so every GenerativeModel is a FakeGenerativeModel; yields its stats."""
+    import google.generativeai as genai
+    import gemini_client
+
+    FakeGenerativeModel.latency = latency
+    FakeGenerativeModel.per_image_latency = per_image_latency
+    FakeGenerativeModel.failure_rate = failure_rate
+    FakeGenerativeModel.stats = FakeStats()
+
+    saved = genai.GenerativeModel, genai.configure
+    genai.GenerativeModel = FakeGenerativeModel
+    genai.configure = lambda *args, **kwargs: None
+    gemini_client.clear()  # drop any real model cached before the patch
+    try:
+        yield FakeGenerativeModel.stats
+    finally:
+        genai.GenerativeModel, genai.configure = saved
+        gemini_client.clear()
@@ -0,0 +1,284 @@
+# benchmarks/fixture_server.py
+import html
+import io
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image, ImageDraw
+
+# Placeholder the recorder writes in place of the original image host; replaced with
+# this server's address when a recorded page is served.
+BASE_PLACEHOLDER = "__FIXTURE_BASE__"
+
+BRANDS = ["Nike", "Puma", "Adidas", "Roadster", "HRX", "Levis", "Campus", "Bata"]
+COLOURS = ["Black", "White", "Navy", "Red", "Olive", "Grey", "Beige", "Blue"]
+KINDS = ["Running Shoes", "Sneakers", "Polo T-shirt", "Hoodie", "Slim Fit Jeans", "Backpack"]
+
+
+class Catalog:
+    """
+    Deterministic synthetic catalogue. Each platform lists `size` products drawn from a
+    shared pool, so about half of each platform's listings also appear on another platform
+    (same image, reworded title, different price) - enough to exercise dedup and ranking.
+    """
+
+    PLATFORM_OFFSETS = {"amazon": 0, "flipkart": 0.5, "myntra": 1.0}
+
+    def __init__(self, size: int = 60, seed: int = 0):
+        self.size = size
+        self.seed = seed
+
+    def item(self, index: int) -> Dict:
+        rng = random.Random(f"{self.seed}:{index}")
+        return {
+            "index": index,
+            "brand": rng.choice(BRANDS),
+            "colour": rng.choice(COLOURS),
+            "kind": rng.choice(KINDS),
+            "price": rng.randrange(399, 4999),
+            "rating": round(rng.uniform(3.0, 4.8), 1),
+        }
+
+    def listings(self, platform: str):
+        start = int(self.PLATFORM_OFFSETS[platform] * self.size)
+        for index in range(start, start + self.size):
+            item = self.item(index)
+            rng = random.Random(f"{self.seed}:{platform}:{index}")
+            item["price"] = int(item["price"] * rng.uniform(0.9, 1.15))
+            yield item
+
+    def image_path(self, index: int) -> str:
+        return f"/img/{self.seed}/{index}.jpg"
+
+
+def render_image(seed: int, index: int, side: int = 256) -> bytes:
+    """A product-ish JPEG: flat background with a few coloured shapes, unique per item."""
+    rng = random.Random(f"img:{seed}:{index}")
+    image = Image.new("RGB", (side, side), tuple(rng.randrange(180, 256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(rng.randrange(2, 5)):
+        x0, y0 = rng.randrange(0, side // 2), rng.randrange(0, side // 2)
+        x1, y1 = x0 + rng.randrange(side // 4, side // 2), y0 + rng.randrange(side // 4, side // 2)
+        colour = tuple(rng.randrange(0, 200) for _ in range(3))
+        (draw.ellipse if rng.random() < 0.5 else draw.rectangle)((x0, y0, x1, y1), fill=colour)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+# ------------------------------------------------------------------
+# Pages in each site's markup, matching the scrapers' selectors
+# ------------------------------------------------------------------
+def _page(title: str, body: str, style: str = "") -> str:
+    return f"<!doctype html><html><head><title>{html.escape(title)}</title><style>{style}</style></head><body>{body}</body></html>"
+
+
+def amazon_page(catalog: Catalog, base: str, page: int, pages: int = 3) -> str:
+    listings = list(catalog.listings("amazon"))
+    per_page = max(1, math.ceil(len(listings) / pages))
+    cards = []
+    for item in listings[(page - 1) * per_page:page * per_page]:
+        asin = f"B{catalog.seed:03d}{item['index']:06d}"
+        title = html.escape(f"{item['brand']} Men's {item['kind']} - {item['colour']}")
+        cards.append(
+            f'<div data-component-type="s-search-result" data-asin="{asin}">'
+            f'<img class="s-image" src="{base}{catalog.image_path(item["index"])}" alt="{title}">'
+            f'<h2><a class="a-link-normal" href="/dp/{asin}"><span class="a-text-normal">{title}</span></a></h2>'
+            f'<span class="a-price"><span class="a-price-whole">{item["price"]:,}.</span></span>'
+            f'<span class="a-icon-alt">{item["rating"]} out of 5 stars</span></div>'
+        )
+    last = page * per_page >= len(listings)
+    next_link = (f'<a class="s-pagination-next s-pagination-disabled">Next</a>' if last
+                 else f'<a class="s-pagination-next" href="?k=fixture&page={page + 1}">Next</a>')
+    return _page("Amazon.in : fixture", "".join(cards) + next_link)
+
+
+def flipkart_page(catalog: Catalog, base: str) -> str:
+    cards = []
+    for item in catalog.listings("flipkart"):
+        title = html.escape(f"{item['brand'].upper()} {item['kind']} For Men ({item['colour']})")
+        cards.append(
+            f'<div data-id="ITM{catalog.seed}{item["index"]:06d}">'
+            f'<a href="/p/itm{item["index"]:06d}"><img src="{base}{catalog.image_path(item["index"])}"></a>'
+            f'<div class="KzDlHZ">{title}</div><div class="Nx9bqj">₹{item["price"]:,}</div>'
+            f'<div class="_3LWZlK">{item["rating"]}</div></div>'
+        )
+    return _page("Flipkart fixture", "".join(cards))
+
+
+def myntra_page(catalog: Catalog, base: str, embedded_state: bool = True) -> str:
+    """Rendered cards (for the browser path) plus, like the live site, the `window.__myx` state."""
+    items, products = [], []
+    for item in catalog.listings("myntra"):
+        landing_page = f'{item["kind"].lower().replace(" ", "-")}/{item["index"]}/buy'
+        products.append({
+            "brand": item["brand"],
+            "additionalInfo": f'{item["colour"]} {item["kind"]}',
+            "productName": f'{item["brand"]} {item["colour"]} {item["kind"]}',
+            "price": item["price"],
+            "rating": item["rating"],
+            "landingPageUrl": landing_page,
+            "searchImage": f"{base}{catalog.image_path(item['index'])}",
+        })
+        items.append(
+            f'<li class="product-base"><a href="{landing_page}">'
+            f'<img class="img-responsive" src="{base}{catalog.image_path(item["index"])}">'
+            f'<h3 class="product-brand">{html.escape(item["brand"])}</h3>'
+            f'<h4 class="product-product">{html.escape(item["colour"] + " " + item["kind"])}</h4>'
+            f'<div class="product-price"><span class="product-discountedPrice">Rs. {item["price"]}</span></div>'
+            f'</a></li>'
+        )
+    style = "li.product-base { height: 360px; list-style: none; }"
+    body = f'<ul class="results-base">{"".join(items)}</ul>'
+    if embedded_state:
+        state = json.dumps({"searchData": {"results": {"products": products}}}).replace("</", "<\\/")
+        body += f"<script>window.__myx = {state};</script>"
+    return _page("Myntra fixture", body, style)
+
+
+class FixtureServer:
+    """
+    Local HTTP server standing in for Amazon, Flipkart and Myntra (and their image CDNs).
+
+    Serves synthetic pages from a `Catalog` (catalogue size and seed can be changed between
+    runs with `configure`), or, when `recorded_dir` is given, pages saved by
+    record_fixtures.py. Platform base URLs are `<base_url>/amazon`, `/flipkart`, `/myntra`.
+    `latency_ms` delays every response to mimic a real network.
+    """
+
+    def __init__(self, catalog_size: int = 60, seed: int = 0, recorded_dir: Optional[str] = None,
+                 latency_ms: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.catalog = Catalog(catalog_size, seed)
+        self.recorded_dir = recorded_dir
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self._images: Dict[tuple, bytes] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def platform_urls(self) -> Dict[str, str]:
+        return {name: f"{self.base_url}/{name.lower()}" for name in ("Amazon", "Flipkart", "Myntra")}
+
+    def configure(self, catalog_size: int = None, seed: int = None):
+        self.catalog = Catalog(catalog_size or self.catalog.size,
+                               self.catalog.seed if seed is None else seed)
+
+    def start(self) -> "FixtureServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def image(self, seed: int, index: int) -> bytes:
+        key = (seed, index)
+        with self._lock:
+            data = self._images.get(key)
+        if data is None:
+            data = render_image(seed, index)
+            with self._lock:
+                self._images[key] = data
+        return data
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def respond(self, path: str, query: Dict[str, list]):
+        """Returns (status, content type, body bytes) for a request path."""
+        if path.startswith("/img/"):
+            try:
+                _, _, seed, name = path.split("/")
+                return 200, "image/jpeg", self.image(int(seed), int(name.split(".")[0]))
+            except ValueError:
+                return 404, "text/plain", b"not found"
+        if path.startswith("/recorded/images/") and self.recorded_dir:
+            return self._recorded_file(os.path.join("images", os.path.basename(path)), "image/jpeg")
+
+        page = int(query.get("page", ["1"])[0])
+        if path == "/amazon/s":
+            if self.recorded_dir:
+                return self._recorded_file(f"amazon_page{page}.html", "text/html; charset=utf-8")
+            return 200, "text/html; charset=utf-8", amazon_page(self.catalog, self.base_url, page).encode()
+        if path == "/flipkart/search":
+            if self.recorded_dir:
+                return self._recorded_file("flipkart.html", "text/html; charset=utf-8")
+            return 200, "text/html; charset=utf-8", flipkart_page(self.catalog, self.base_url).encode()
+        if path.startswith("/myntra/"):
+            if self.recorded_dir:
+                return self._recorded_file("myntra.html", "text/html; charset=utf-8")
+            return 200, "text/html; charset=utf-8", myntra_page(self.catalog, self.base_url).encode()
+        return 404, "text/plain", b"not found"
+
+    def _recorded_file(self, name: str, content_type: str):
+        path = os.path.join(self.recorded_dir, name)
+        if not os.path.exists(path):
+            return 404, "text/plain", b"not recorded"
+        with open(path, "rb") as f:
+            body = f.read()
+        if content_type.startswith("text/html"):
+            body = body.replace(BASE_PLACEHOLDER.encode(), self.base_url.encode())
+        return 200, content_type, body
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if server.latency_ms:
+                    time.sleep(server.latency_ms / 1000)
+                status, content_type, body = server.respond(url.path, parse_qs(url.query))
+                with server._lock:
+                    server.requests += 1
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve shopping-site fixtures locally.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--catalog-size", type=int, default=60)
+    parser.add_argument("--recorded", help="directory written by record_fixtures.py")
+    args = parser.parse_args()
+
+    fixture_server = FixtureServer(args.catalog_size, recorded_dir=args.recorded, port=args.port)
+    print(f"[INFO] Serving fixtures at {fixture_server.base_url}")
+    for platform, url in fixture_server.platform_urls().items():
+        print(f"   SCRAPER_BASE_URL_{platform.upper()}={url}")
+    fixture_server.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        fixture_server.stop()
@@ -0,0 +1,79 @@
+# benchmarks/import_times.py
+"""
+Import-time breakdown of a worker's cold start, measured with `python -X importtime`
+in a fresh interpreter.
+
+    python -m benchmarks.import_times                      # import whatsapp_bot (lazy startup)
+    python -m benchmarks.import_times --eager              # ...with STARTUP_MODE=eager
+    python -m benchmarks.import_times --module agent --top 30
+    python -m benchmarks.import_times --target-ms 800      # exit 1 if the import is slower
+
+Prints the top-level packages that take longest to import (each package's own module
+code, summed over its submodules) and the total, so a heavy dependency creeping back onto
+the startup path is easy to spot.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str, env: Dict[str, str] = None) -> List[Tuple[str, int, int]]:
+    """Imports `module` in a new interpreter; returns (name, self_us, cumulative_us) per import."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, env={**os.environ, **(env or {})},
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """Microseconds spent executing each top-level package's own modules (self times summed)."""
+    totals = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.strip().split(".")[0]] += self_us
+    return dict(totals)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="whatsapp_bot")
+    parser.add_argument("--eager", action="store_true", help="measure with STARTUP_MODE=eager")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--target-ms", type=float, help="fail if the total import takes longer")
+    args = parser.parse_args(argv)
+
+    env = {"STARTUP_MODE": "eager" if args.eager else "lazy"}
+    rows = measure(args.module, env)
+    total_ms = next(c for name, _, c in rows if name.strip() == args.module) / 1000
+
+    packages = sorted(by_package(rows).items(), key=lambda item: item[1], reverse=True)
+    print(f"\nimport {args.module} (STARTUP_MODE={env['STARTUP_MODE']}): {total_ms:.0f} ms")
+    print(f"{'package':<28} {'ms':>8} {'share':>6}")
+    for package, self_us in packages[:args.top]:
+        print(f"{package:<28} {self_us / 1000:>8.1f} {self_us / 1000 / total_ms:>6.0%}")
+
+    if args.target_ms is not None:
+        if total_ms > args.target_ms:
+            print(f"[REGRESSION] Cold import took {total_ms:.0f} ms, over the {args.target_ms:.0f} ms target.")
+            return 1
+        print(f"[SUCCESS] Cold import within the {args.target_ms:.0f} ms target.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
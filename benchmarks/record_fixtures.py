@@ -0,0 +1,100 @@
+# benchmarks/record_fixtures.py
+"""
+Saves live search-result pages and their product images for offline benchmarking:
+
+    python -m benchmarks.record_fixtures "nike shoes" --out benchmarks/fixtures/nike-shoes
+    python -m benchmarks.run_benchmarks --recorded benchmarks/fixtures/nike-shoes
+
+Pages are stored as rendered HTML with scripts and stylesheets stripped, and every product
+image is downloaded and rewritten to point at the fixture server, so replaying them
+touches no live host.
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+
+import requests
+from playwright.async_api import async_playwright
+
+import amazon
+import flipkart_scraper
+import scrape_myntra
+from benchmarks.fixture_server import BASE_PLACEHOLDER
+
+_STRIP = re.compile(r"<script\b.*?</script>|<link\b[^>]*stylesheet[^>]*>|<noscript\b.*?</noscript>",
+                    re.IGNORECASE | re.DOTALL)
+_IMAGE_URL = re.compile(r"""(?:src|data-src)=["'](https?://[^"']+?\.(?:jpe?g|png|webp)[^"']*)["']""", re.IGNORECASE)
+
+
+def _pages(query: str):
+    """(file name, URL, selector to wait for, CONTEXT_OPTIONS) for every page to record."""
+    amazon_url = f"{amazon.BASE_URL}/s?k={'+'.join(query.split())}"
+    pages = [(f"amazon_page{n}.html", amazon_url if n == 1 else f"{amazon_url}&page={n}",
+              amazon.RESULT_SELECTOR, amazon.CONTEXT_OPTIONS) for n in range(1, 4)]
+    pages.append(("flipkart.html", f"{flipkart_scraper.BASE_URL}/search?q={'+'.join(query.split())}",
+                  flipkart_scraper.CARD_SELECTOR, flipkart_scraper.CONTEXT_OPTIONS))
+    pages.append(("myntra.html", f"{scrape_myntra.BASE_URL}/{query.replace(' ', '-')}",
+                  scrape_myntra.ITEM_SELECTOR, scrape_myntra.CONTEXT_OPTIONS))
+    return pages
+
+
+def _localize_images(page_html: str, image_dir: str, session: requests.Session, max_images: int) -> str:
+    """Downloads product images referenced by the page and points the page at local copies."""
+    urls = list(dict.fromkeys(_IMAGE_URL.findall(page_html)))[:max_images]
+    for url in urls:
+        name = hashlib.sha1(url.encode()).hexdigest()[:20] + ".jpg"
+        path = os.path.join(image_dir, name)
+        if not os.path.exists(path):
+            try:
+                response = session.get(url, timeout=15)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                print(f"[WARN] Could not download {url}: {e}")
+                continue
+            with open(path, "wb") as f:
+                f.write(response.content)
+        page_html = page_html.replace(url, f"{BASE_PLACEHOLDER}/recorded/images/{name}")
+    return page_html
+
+
+async def record(query: str, out_dir: str, max_images: int = 200, scrolls: int = 8):
+    image_dir = os.path.join(out_dir, "images")
+    os.makedirs(image_dir, exist_ok=True)
+    session = requests.Session()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for name, url, selector, options in _pages(query):
+                context = await browser.new_context(**options)
+                page = await context.new_page()
+                try:
+                    await page.goto(url, wait_until="load", timeout=90000)
+                    await page.wait_for_selector(selector, timeout=30000)
+                    for _ in range(scrolls):  # let lazy-loaded cards and images render
+                        await page.evaluate("window.scrollBy(0, window.innerHeight * 2)")
+                        await page.wait_for_timeout(500)
+                    page_html = _STRIP.sub("", await page.content())
+                except Exception as e:
+                    print(f"[ERROR] Could not record {url}: {e}")
+                    continue
+                finally:
+                    await context.close()
+
+                page_html = _localize_images(page_html, image_dir, session, max_images)
+                with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+                    f.write(page_html)
+                print(f"[SUCCESS] Recorded {url} -> {name}")
+        finally:
+            await browser.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("query")
+    parser.add_argument("--out", required=True, help="directory to write pages and images to")
+    parser.add_argument("--max-images", type=int, default=200, help="per page")
+    args = parser.parse_args()
+    asyncio.run(record(args.query, args.out, args.max_images))
@@ -0,0 +1,251 @@
+# benchmarks/run_benchmarks.py
+"""
+Offline end-to-end benchmark: real scrapers and vision pipeline against the local fixture
+server, with Gemini replaced by a fake of configurable latency.
+
+    python -m benchmarks.run_benchmarks --sizes 30,120,480 --concurrency 1,4
+    python -m benchmarks.run_benchmarks --json results.json
+    python -m benchmarks.run_benchmarks --fetch-mode browser   # force Chromium for comparison
+    python -m benchmarks.run_benchmarks --baseline results.json --tolerance 0.25
+
+Reports per-stage timings (median / max across concurrent searches), throughput and peak
+memory (this process plus its Chromium children) per catalogue size and concurrency.
+With --baseline, exits non-zero when a stage's median is slower than the baseline by more
+than --tolerance, so regressions show up before a deploy.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from benchmarks.fake_gemini import fake_gemini
+from benchmarks.fixture_server import FixtureServer, render_image
+
+try:
+    import psutil
+except ImportError:  # optional: falls back to the process's own peak RSS
+    psutil = None
+
+STAGES = ["scrape:Flipkart", "scrape:Amazon", "scrape:Myntra", "scrape", "visual",
+          "recommend_llm", "recommend_local", "total"]
+
+# Stage medians must also be this many seconds slower before counting as a regression,
+# so millisecond-scale stages don't flap on noise.
+REGRESSION_FLOOR_SECONDS = 0.05
+
+
+class PeakMemory:
+    """Samples RSS of this process and its children (Chromium) in the background."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> float:
+        if psutil is None:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        process = psutil.Process()
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="peak-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, self._sample())
+
+
+def run_search(query: str, user_image_path: str, pool, deadline_seconds: float = None) -> Dict[str, float]:
+    """One full search (scrape, visual match, both recommendation paths); returns stage timings."""
+    from agent import find_visual_matches_in_batch, get_expert_recommendation
+    from deadline import Deadline
+    from orchestrator import scrape_all_platforms
+    from products import from_records
+    from ranking import recommend
+
+    timings = {}
+    started = time.perf_counter()
+    deadline = Deadline(deadline_seconds)
+
+    def on_platform_done(platform, products):
+        timings[f"scrape:{platform}"] = time.perf_counter() - started
+
+    per_platform = pool.run(scrape_all_platforms(query, pool=pool, on_platform_done=on_platform_done,
+                                                 deadline=deadline))
+    timings["scrape"] = time.perf_counter() - started
+    products = [p for platform, records in per_platform.items() for p in from_records(records, platform)]
+    timings["products"] = len(products)
+
+    stage_started = time.perf_counter()
+    top_5 = find_visual_matches_in_batch(products, user_image_path, api_key="offline", deadline=deadline)
+    timings["visual"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    get_expert_recommendation(top_5, query, api_key="offline")
+    timings["recommend_llm"] = time.perf_counter() - stage_started
+
+    stage_started = time.perf_counter()
+    recommend(top_5, query)
+    timings["recommend_local"] = time.perf_counter() - stage_started
+
+    timings["total"] = time.perf_counter() - started
+    return timings
+
+
+def run_config(server: FixtureServer, pool, gemini_stats, size: int, concurrency: int, seed: int,
+               workdir: str, deadline_seconds: float = None) -> Dict:
+    # A fresh seed per configuration means new image URLs and a new user image, so the
+    # image cache and score memo start cold for every row.
+    server.configure(catalog_size=size, seed=seed)
+    user_image_path = os.path.join(workdir, f"user_{seed}.jpg")
+    with open(user_image_path, "wb") as f:
+        f.write(render_image(seed, size // 2))
+
+    calls_before, requests_before = gemini_stats.calls, server.requests
+    with PeakMemory() as memory:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bench-search") as executor:
+            runs = list(executor.map(
+                lambda k: run_search(f"fixture query {seed} {k}", user_image_path, pool, deadline_seconds),
+                range(concurrency)))
+        wall = time.perf_counter() - started
+
+    stages = {}
+    for stage in STAGES:
+        values = [run[stage] for run in runs if stage in run]
+        if values:
+            stages[stage] = {"median": statistics.median(values), "max": max(values)}
+    return {
+        "size": size,
+        "concurrency": concurrency,
+        "stages": stages,
+        "products_per_search": statistics.mean(run["products"] for run in runs),
+        "searches_per_second": concurrency / wall,
+        "wall_seconds": wall,
+        "peak_memory_mb": memory.peak_mb,
+        "gemini_calls": gemini_stats.calls - calls_before,
+        "http_requests": server.requests - requests_before,
+    }
+
+
+def print_report(results: List[Dict]):
+    header = (f"{'size':>5} {'conc':>4} {'products':>8} {'scrape':>8} {'visual':>8} {'llm rec':>8} "
+              f"{'local rec':>10} {'total':>8} {'search/s':>9} {'peak MB':>8} {'gemini':>6}")
+    print(f"\n{'='*len(header)}\n{header}\n{'-'*len(header)}")
+    for r in results:
+        s = r["stages"]
+        print(f"{r['size']:>5} {r['concurrency']:>4} {r['products_per_search']:>8.0f} "
+              f"{s['scrape']['median']:>7.2f}s {s['visual']['median']:>7.2f}s {s['recommend_llm']['median']:>7.2f}s "
+              f"{s['recommend_local']['median'] * 1000:>8.2f}ms {s['total']['median']:>7.2f}s "
+              f"{r['searches_per_second']:>9.3f} {r['peak_memory_mb']:>8.0f} {r['gemini_calls']:>6}")
+    print("=" * len(header))
+    print("Stage times are medians across the concurrent searches of each row.")
+
+
+def compare_to_baseline(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["size"], r["concurrency"]): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in results:
+        base = baseline.get((r["size"], r["concurrency"]))
+        if base is None:
+            continue
+        for stage, timing in r["stages"].items():
+            old = base["stages"].get(stage, {}).get("median")
+            new = timing["median"]
+            if old is not None and new > old * (1 + tolerance) and new - old > REGRESSION_FLOOR_SECONDS:
+                regressions.append(f"size={r['size']} conc={r['concurrency']} {stage}: "
+                                   f"{old:.3f}s -> {new:.3f}s (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=_int_list, default=[30, 120], help="products per platform, e.g. 30,120,480")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4], help="concurrent searches, e.g. 1,4")
+    parser.add_argument("--gemini-latency", type=float, default=1.5, help="seconds per fake Gemini call")
+    parser.add_argument("--gemini-per-image", type=float, default=0.02, help="extra seconds per image in a call")
+    parser.add_argument("--gemini-failure-rate", type=float, default=0.0)
+    parser.add_argument("--network-latency-ms", type=float, default=0.0, help="delay per fixture HTTP response")
+    parser.add_argument("--fetch-mode", choices=["auto", "http", "browser"], default="auto",
+                        help="SCRAPER_FETCH_MODE: browserless HTTP first, HTTP only, or always Chromium")
+    parser.add_argument("--deadline", type=float, help="per-search deadline in seconds (default: none)")
+    parser.add_argument("--recorded", help="serve pages saved by benchmarks.record_fixtures instead of synthetic ones")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs. baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="shopping-bench-")
+    server = FixtureServer(recorded_dir=args.recorded, latency_ms=args.network_latency_ms).start()
+    print(f"[INFO] Fixture server at {server.base_url}; scratch dir {workdir}")
+
+    # Must be set before the pipeline modules are imported: they read them at import time.
+    for platform, url in server.platform_urls().items():
+        os.environ[f"SCRAPER_BASE_URL_{platform.upper()}"] = url
+    os.environ["SCRAPER_FETCH_MODE"] = args.fetch_mode
+    os.environ["IMAGE_CACHE_DIR"] = os.path.join(workdir, "image_cache")
+    os.environ["SCORE_MEMO_PATH"] = os.path.join(workdir, "score_memo.sqlite3")
+
+    from browser_pool import BrowserPool
+
+    pool = BrowserPool(max_contexts=3 * max(args.concurrency))
+    results = []
+    try:
+        with fake_gemini(args.gemini_latency, args.gemini_per_image, args.gemini_failure_rate) as gemini_stats:
+            seed = 0
+            for size in args.sizes:
+                for concurrency in args.concurrency:
+                    seed += 1
+                    print(f"\n[INFO] Benchmark: {size} products per platform, {concurrency} concurrent search(es)")
+                    results.append(run_config(server, pool, gemini_stats, size, concurrency, seed, workdir,
+                                              args.deadline))
+    finally:
+        pool.shutdown()
+        server.stop()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"[INFO] Results written to {args.json}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(results, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            return 1
+        print(f"[SUCCESS] No stage slower than the baseline by more than {args.tolerance:.0%}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# browser_pool.py
+import asyncio
+import os
+import threading
+from contextlib import asynccontextmanager
+
+import metrics
+
+try:
+    import psutil
+except ImportError:  # memory-based recycling is skipped without psutil
+    psutil = None
+
+
+class _BrowserSlot:
+    """One launched Chromium plus the bookkeeping needed to recycle it."""
+    __slots__ = ("browser", "pid", "uses", "active", "retired")
+
+    def __init__(self, browser, pid: int = None):
+        self.browser = browser
+        # Chromium's main process, so memory is measured per browser (None without psutil).
+        self.pid = pid
+        self.uses = 0
+        self.active = 0
+        self.retired = False
+
+
+class BrowserPool:
+    """
+    Keeps a warm Chromium alive for the lifetime of the process and hands out fresh,
+    isolated BrowserContexts from it.
+
+    - At most `max_contexts` contexts are open at once; extra callers wait their turn.
+    - A browser is retired after `max_uses` contexts, or when its own process tree grows
+      beyond `max_memory_mb` (needs psutil). Retired browsers finish their open contexts
+      and are then closed, while new contexts go to a freshly launched browser.
+    - A browser that crashes or disconnects is replaced on the next request.
+
+    Playwright objects are bound to the event loop that created them, so the pool owns a
+    background loop thread. Synchronous callers (Flask/gunicorn worker threads) use
+    `run()` to execute a coroutine on that loop.
+    """
+
+    def __init__(self, max_contexts: int = 3, max_uses: int = 50, max_memory_mb: int = 1500,
+                 headless: bool = True, launch_options: dict = None):
+        self.max_contexts = max_contexts
+        self.max_uses = max_uses
+        self.max_memory_mb = max_memory_mb
+        self.launch_options = {"headless": headless, **(launch_options or {})}
+
+        self._playwright = None
+        self._current = None
+        self._retired = []
+        self._semaphore = None
+        self._launch_lock = None
+
+        self._loop = None
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Background loop for synchronous callers
+    # ------------------------------------------------------------------
+    def run(self, coro, timeout: float = None):
+        """Runs `coro` on the pool's event loop and blocks until it finishes."""
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro):
+        """Schedules `coro` on the pool's event loop and returns a concurrent.futures.Future."""
+        self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _ensure_loop(self):
+        # Started lazily so that a gunicorn worker forked from the master gets its own thread.
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="browser-pool", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        """Closes every browser and stops the background loop."""
+        if not (self._thread and self._thread.is_alive()):
+            return
+        try:
+            self.run(self.close(), timeout=30)
+        except Exception as e:
+            print(f"[WARN] Browser pool did not close cleanly: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------------
+    # Async API
+    # ------------------------------------------------------------------
+    async def start(self):
+        if self._playwright is None:
+            # Imported here so a worker can boot (and answer webhooks) before Playwright loads.
+            from playwright.async_api import async_playwright
+            self._playwright = await async_playwright().start()
+            self._semaphore = asyncio.Semaphore(self.max_contexts)
+            self._launch_lock = asyncio.Lock()
+
+    async def warm(self):
+        """Starts Playwright and launches the browser ahead of the first search."""
+        await self.start()
+        async with self._launch_lock:
+            if self._current is None:
+                self._current = await self._launch()
+
+    async def close(self):
+        slots = self._retired + ([self._current] if self._current else [])
+        self._current, self._retired = None, []
+        for slot in slots:
+            await self._close_slot(slot)
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Yields a brand-new BrowserContext, closed again when the block exits."""
+        await self.start()
+        async with self._semaphore:
+            slot = await self._acquire_slot()
+            slot.active += 1
+            slot.uses += 1
+            context = None
+            try:
+                with metrics.span("browser_context"):
+                    context = await slot.browser.new_context(**context_options)
+                yield context
+            finally:
+                slot.active -= 1
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass  # the browser may have crashed underneath us
+                await self._reap_retired()
+
+    def stats(self) -> dict:
+        current = self._current
+        return {
+            "max_contexts": self.max_contexts,
+            "active_contexts": sum(s.active for s in self._retired) + (current.active if current else 0),
+            "current_browser_uses": current.uses if current else 0,
+            "retired_browsers": len(self._retired),
+            "browser_memory_mb": self._browser_memory_mb(current),
+        }
+
+    # ------------------------------------------------------------------
+    # Browser lifecycle
+    # ------------------------------------------------------------------
+    async def _acquire_slot(self) -> _BrowserSlot:
+        async with self._launch_lock:
+            slot = self._current
+            if slot is not None and not slot.retired and slot.browser.is_connected():
+                if slot.uses >= self.max_uses:
+                    print(f"[INFO] Recycling browser after {slot.uses} contexts.")
+                    self._retire(slot)
+                elif self._over_memory_limit(slot):
+                    print(f"[INFO] Recycling browser above {self.max_memory_mb} MB.")
+                    self._retire(slot)
+            elif slot is not None:
+                self._retire(slot)
+
+            if self._current is None:
+                self._current = await self._launch()
+            return self._current
+
+    async def _launch(self) -> _BrowserSlot:
+        print("[INFO] Launching pooled Chromium browser...")
+        # Launches are serialized by _launch_lock, so the one new process tree is this browser's.
+        before = _child_pids()
+        with metrics.span("browser_launch"):
+            browser = await self._playwright.chromium.launch(**self.launch_options)
+        slot = _BrowserSlot(browser, _new_browser_pid(before))
+        browser.on("disconnected", lambda _: self._on_disconnected(slot))
+        return slot
+
+    def _on_disconnected(self, slot: _BrowserSlot):
+        if not slot.retired:
+            print("[WARN] Pooled browser disconnected; a new one will be launched on the next request.")
+            slot.retired = True
+
+    def _retire(self, slot: _BrowserSlot):
+        slot.retired = True
+        if slot is self._current:
+            self._current = None
+        if slot not in self._retired:
+            self._retired.append(slot)
+
+    async def _reap_retired(self):
+        for slot in [s for s in self._retired if s.active == 0]:
+            self._retired.remove(slot)
+            await self._close_slot(slot)
+        if self._current is not None and self._current.retired:
+            self._retire(self._current)
+            await self._reap_retired()
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        slot.retired = True
+        try:
+            if slot.browser.is_connected():
+                await slot.browser.close()
+        except Exception as e:
+            print(f"[WARN] Failed to close pooled browser: {e}")
+
+    # ------------------------------------------------------------------
+    # Memory accounting
+    # ------------------------------------------------------------------
+    def _browser_memory_mb(self, slot: _BrowserSlot) -> float:
+        """Resident memory of one browser: its main process and every renderer/helper under it."""
+        if psutil is None or slot is None or slot.pid is None:
+            return 0.0
+        try:
+            root = psutil.Process(slot.pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0.0
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total / (1024 * 1024)
+
+    def _over_memory_limit(self, slot: _BrowserSlot) -> bool:
+        return bool(self.max_memory_mb) and self._browser_memory_mb(slot) > self.max_memory_mb
+
+
+def _child_pids() -> set:
+    """Pids of every process descended from this one."""
+    if psutil is None:
+        return set()
+    try:
+        return {child.pid for child in psutil.Process(os.getpid()).children(recursive=True)}
+    except psutil.Error:
+        return set()
+
+
+def _new_browser_pid(before: set):
+    """
+    The main Chromium process among the descendants that appeared since `before`: the new
+    process whose parent is not new itself (the Playwright driver started it). None if
+    it can't be told apart, in which case the browser is only recycled by use count.
+    """
+    if psutil is None:
+        return None
+    try:
+        new = [child for child in psutil.Process(os.getpid()).children(recursive=True) if child.pid not in before]
+    except psutil.Error:
+        return None
+    new_pids = {child.pid for child in new}
+    for child in new:
+        try:
+            if child.ppid() not in new_pids and "crashpad" not in child.name().lower():
+                return child.pid
+        except psutil.Error:
+            continue
+    return None
@@ -0,0 +1,59 @@
+# compare_extraction.py
+import asyncio
+import statistics
+import sys
+import time
+from playwright.async_api import async_playwright
+
+import amazon
+import flipkart_scraper
+
+# platform -> (search URL builder, scraper module, selector that marks a loaded page)
+TARGETS = {
+    "Amazon": (lambda q: f"{amazon.BASE_URL}/s?k={'+'.join(q.split())}", amazon, amazon.RESULT_SELECTOR),
+    "Flipkart": (lambda q: f"{flipkart_scraper.BASE_URL}/search?q={'+'.join(q.split())}", flipkart_scraper, flipkart_scraper.CARD_SELECTOR),
+}
+
+async def _time_extractor(extractor, page, base_url: str, repeats: int):
+    timings, records = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        records = await extractor(page, base_url)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), records
+
+async def compare(query: str, repeats: int = 5):
+    """
+    Loads one results page per platform and times the bulk (single evaluate) extractor
+    against the per-element extractor on the very same DOM.
+    """
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            for platform, (build_url, module, selector) in TARGETS.items():
+                context = await browser.new_context(**module.CONTEXT_OPTIONS)
+                page = await context.new_page()
+                try:
+                    await page.goto(build_url(query), wait_until="load", timeout=90000)
+                    await page.wait_for_selector(selector, timeout=30000)
+                except Exception as e:
+                    print(f"[ERROR] {platform}: could not load results page: {e}")
+                    await context.close()
+                    continue
+
+                bulk_ms, bulk_records = await _time_extractor(module.extract_page_bulk, page, module.BASE_URL, repeats)
+                element_ms, element_records = await _time_extractor(module.extract_page_per_element, page, module.BASE_URL, repeats)
+                await context.close()
+
+                speedup = element_ms / bulk_ms if bulk_ms else float("inf")
+                print(f"\n--- {platform} ({len(bulk_records)} products, median of {repeats}) ---")
+                print(f"   per-element: {element_ms:8.1f} ms")
+                print(f"   bulk:        {bulk_ms:8.1f} ms  ({speedup:.1f}x faster)")
+                if bulk_records != element_records:
+                    print("   [WARNING] The two extractors returned different records.")
+        finally:
+            await browser.close()
+
+if __name__ == "__main__":
+    search_query = " ".join(sys.argv[1:]) or input("Enter product to search: ").strip() or "nike shoes"
+    asyncio.run(compare(search_query))
@@ -0,0 +1,63 @@
+# deadline.py
+import math
+import time
+from typing import Optional
+
+
+class Deadline:
+    """
+    A point in time that a whole request must finish by, handed down to every stage.
+
+    Stages don't get fixed timeouts of their own any more; they `clamp` their usual
+    timeout to what is left, and cut their work short (fewer pages, fewer images,
+    smaller Gemini chunks) when the remaining budget is small. `Deadline()` with no
+    budget never expires, so callers without an SLA keep the old behaviour.
+    """
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.seconds = seconds
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    @classmethod
+    def at(cls, expires_at: Optional[float]) -> "Deadline":
+        deadline = cls()
+        deadline.expires_at = expires_at
+        if expires_at is not None:
+            deadline.seconds = max(0.0, expires_at - time.monotonic())
+        return deadline
+
+    def remaining(self) -> float:
+        """Seconds left; infinite for a deadline without a budget."""
+        if self.expires_at is None:
+            return math.inf
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self) -> Optional[float]:
+        """`remaining()` for APIs where None means "wait forever"."""
+        return None if self.expires_at is None else self.remaining()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def clamp(self, timeout: float, reserve: float = 0.0) -> float:
+        """`timeout`, shortened so it ends at least `reserve` seconds before the deadline."""
+        return max(0.0, min(timeout, self.remaining() - reserve))
+
+    def timeout_ms(self, timeout: float, reserve: float = 0.0) -> int:
+        """`clamp` in milliseconds for Playwright, never 0 (which Playwright reads as "no timeout")."""
+        return max(1, int(self.clamp(timeout, reserve) * 1000))
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """An earlier deadline that leaves `seconds` of this one for the stages that follow."""
+        if self.expires_at is None:
+            return self
+        return Deadline.at(self.expires_at - seconds)
+
+    def __repr__(self) -> str:
+        if self.expires_at is None:
+            return "Deadline(none)"
+        return f"Deadline({self.remaining():.1f}s left of {self.seconds:.0f}s)"
+
+
+# Shared by callers that pass no deadline.
+NO_DEADLINE = Deadline()
@@ -0,0 +1,213 @@
+# dedup.py
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from PIL import Image
+
+from products import Product
+from visual_prefilter import extract_features
+
+# Titles are compared as sets of character 3-grams; MinHash signatures of NUM_PERM
+# values are split into LSH_BANDS bands so only likely matches are compared exactly.
+# With 16 bands of 4 rows, pairs around 0.6 Jaccard collide in some band ~90% of the time.
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+LSH_BANDS = 16
+
+# Two listings are the same product when their colour/size words match exactly, their
+# images (when both have one) have a similar colour histogram (intersection >=
+# COLOUR_MIN_SIMILARITY), and either
+#   - their titles are similar (Jaccard >= TITLE_THRESHOLD) and their images are not clearly
+#     different (dhash distance <= IMAGE_MAX_DISTANCE, or no image to compare), or
+#   - their images are near-identical (distance <= IMAGE_NEAR_DUPLICATE) and the titles
+#     share at least some words (Jaccard >= TITLE_MIN_FOR_IMAGE_MATCH).
+# The dhash is grayscale, so the colour histogram is what tells "Black" from "White".
+TITLE_THRESHOLD = float(os.getenv("DEDUP_TITLE_THRESHOLD", "0.6"))
+IMAGE_MAX_DISTANCE = int(os.getenv("DEDUP_IMAGE_MAX_DISTANCE", "12"))
+IMAGE_NEAR_DUPLICATE = int(os.getenv("DEDUP_IMAGE_NEAR_DUPLICATE", "4"))
+COLOUR_MIN_SIMILARITY = float(os.getenv("DEDUP_COLOUR_MIN_SIMILARITY", "0.7"))
+TITLE_MIN_FOR_IMAGE_MATCH = 0.25
+
+# Image hashes are also bucketed by slices: two 64-bit hashes within IMAGE_NEAR_DUPLICATE
+# bits of each other must agree on at least one of IMAGE_NEAR_DUPLICATE + 1 slices.
+_IMAGE_SLICES = IMAGE_NEAR_DUPLICATE + 1
+_SLICE_BOUNDS = [64 * k // _IMAGE_SLICES for k in range(_IMAGE_SLICES + 1)]
+
+# Title words that name a variant rather than a product; they must match exactly.
+COLOUR_WORDS = {
+    "black", "white", "grey", "silver", "red", "maroon", "pink", "orange", "yellow", "gold",
+    "green", "olive", "blue", "navy", "teal", "purple", "brown", "tan", "beige", "cream",
+    "khaki", "multicolor",
+}
+_COLOUR_ALIASES = {"gray": "grey", "multicolour": "multicolor", "multi": "multicolor"}
+_LETTER_SIZES = {"xs", "xl", "xxl", "xxxl", "2xl", "3xl", "4xl", "5xl"}
+_NUMBERED_SIZE = re.compile(r"\b(?:size|uk|us|eu|waist)\s+(\d+(?:\s5)?|[sml])\b")
+
+_MERSENNE = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _MERSENNE, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _MERSENNE, size=NUM_PERM).astype(np.uint64)
+
+
+def normalize_title(title: str) -> str:
+    """'NIKE Men's Revolution-6 (Black)' -> 'nike men s revolution 6 black'."""
+    return " ".join(re.sub(r"[^\w]+", " ", title.lower()).split())
+
+
+def shingles(title: str) -> Set[int]:
+    text = normalize_title(title)
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode())}
+    return {zlib.crc32(text[i:i + SHINGLE_SIZE].encode()) for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(shingle_set: Set[int]) -> np.ndarray:
+    """NUM_PERM-value MinHash signature of a shingle set."""
+    values = np.fromiter(shingle_set, dtype=np.uint64, count=len(shingle_set)) % _MERSENNE
+    return ((np.outer(_PERM_A, values) + _PERM_B[:, None]) % _MERSENNE).min(axis=1)
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+
+def image_hashes(images: Sequence[Image.Image]) -> List[int]:
+    """64-bit dhash of each image as an int (the same hash the local prefilter uses)."""
+    if not images:
+        return []
+    bits = extract_features(images, ["dhash"])["dhash"]
+    return [int.from_bytes(np.packbits(row).tobytes(), "big") for row in bits]
+
+
+def colour_histograms(images: Sequence[Image.Image]) -> List[np.ndarray]:
+    """4x4x4 RGB histogram of each image (the same one the local prefilter uses)."""
+    if not images:
+        return []
+    return list(extract_features(images, ["histogram"])["histogram"])
+
+
+def variant_tokens(title: str) -> FrozenSet[str]:
+    """Colour and size words: 'Puma Tee (Navy, XL)' -> {'navy', 'xl'}; 'UK 8' -> {'size 8'}."""
+    text = normalize_title(title)
+    tokens = {_COLOUR_ALIASES.get(word, word) for word in text.split()}
+    tokens &= COLOUR_WORDS | _LETTER_SIZES
+    tokens.update("size " + size for size in _NUMBERED_SIZE.findall(text))
+    return frozenset(tokens)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def colour_similarity(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.minimum(a, b).sum())  # histogram intersection, 1.0 = identical
+
+
+def _same_product(a: Product, b: Product, title_similarity: float) -> bool:
+    if a.colour_histogram is not None and b.colour_histogram is not None:
+        if colour_similarity(a.colour_histogram, b.colour_histogram) < COLOUR_MIN_SIMILARITY:
+            return False
+    distance = hamming(a.image_hash, b.image_hash) if a.image_hash is not None and b.image_hash is not None else None
+    if title_similarity >= TITLE_THRESHOLD:
+        return distance is None or distance <= IMAGE_MAX_DISTANCE
+    return distance is not None and distance <= IMAGE_NEAR_DUPLICATE and title_similarity >= TITLE_MIN_FOR_IMAGE_MATCH
+
+
+def _offers(members: Sequence[Product]) -> List[Product]:
+    """Cheapest listing per platform, cheapest first (unknown prices last)."""
+    best: Dict[str, Product] = {}
+    for product in members:
+        current = best.get(product.source)
+        if current is None or (product.price_paise is not None and
+                               (current.price_paise is None or product.price_paise < current.price_paise)):
+            best[product.source] = product
+    return sorted(best.values(), key=lambda p: (p.price_paise is None, p.price_paise or 0))
+
+
+class Deduper:
+    """
+    A running set of distinct products, one representative (the first listing seen) each.
+
+    Every new listing is compared with the representatives only, never with other
+    duplicates, so a chain of pairwise-similar listings (Black ~ White ~ Olive) cannot
+    pull different products into one group. Candidates come from title MinHash bands and
+    slices of the image hash, so only likely matches are compared exactly.
+    A representative's `offers` lists the cheapest listing per platform among its duplicates
+    (and any offers the added listings already carried).
+    """
+
+    def __init__(self):
+        self.representatives: List[Product] = []
+        self._members: List[Dict[int, Product]] = []  # per representative, by id()
+        self._titles: List[Tuple[Set[int], FrozenSet[str]]] = []
+        self._buckets = defaultdict(list)
+
+    def add(self, product: Product) -> bool:
+        """Adds a listing; True if it is a new product, False if it duplicates a representative."""
+        title_set, variants = shingles(product.title), variant_tokens(product.title)
+        listings = {id(offer): offer for offer in (product.offers or [product])}
+        keys = self._bucket_keys(product, title_set)
+
+        best, best_similarity = None, -1.0
+        for i in sorted({i for key in keys for i in self._buckets.get(key, ())}):
+            rep_titles, rep_variants = self._titles[i]
+            if rep_variants != variants:
+                continue
+            similarity = jaccard(title_set, rep_titles)
+            if similarity > best_similarity and _same_product(product, self.representatives[i], similarity):
+                best, best_similarity = i, similarity
+
+        if best is not None:
+            self._members[best].update(listings)
+            self.representatives[best].offers = _offers(list(self._members[best].values()))
+            return False
+
+        for key in keys:
+            self._buckets[key].append(len(self.representatives))
+        self.representatives.append(product)
+        self._members.append(listings)
+        self._titles.append((title_set, variants))
+        product.offers = _offers(list(listings.values()))
+        return True
+
+    @staticmethod
+    def _bucket_keys(product: Product, title_set: Set[int]) -> List[tuple]:
+        rows = NUM_PERM // LSH_BANDS
+        signature = minhash(title_set)
+        keys = [("title", band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(LSH_BANDS)]
+        if product.image_hash is not None:
+            for band, (low, high) in enumerate(zip(_SLICE_BOUNDS, _SLICE_BOUNDS[1:])):
+                keys.append(("image", band, (product.image_hash >> low) & ((1 << (high - low)) - 1)))
+        return keys
+
+
+def dedupe(products: Sequence[Product], images: Optional[Sequence[Image.Image]] = None,
+           deduper: Optional[Deduper] = None) -> List[int]:
+    """
+    Returns the indices of the listings in `products` that are new products, dropping
+    duplicates (titles, plus image hash and colour from `images` when given). With a
+    `deduper` from an earlier call, listings are also checked against the products it
+    already holds, e.g. those of platforms that finished first.
+    """
+    if images is not None:
+        for product, image_hash, histogram in zip(products, image_hashes(images), colour_histograms(images)):
+            product.image_hash = image_hash
+            product.colour_histogram = histogram
+    deduper = deduper or Deduper()
+    return [i for i, product in enumerate(products) if deduper.add(product)]
+
+
+def merge_duplicates(products: Sequence[Product]) -> List[Product]:
+    """
+    Folds already-scored products (e.g. top picks from different platforms) into one entry
+    per product: the best-scored listing, with the others listed in its `offers`.
+    Scores stay on the listing whose image was scored.
+    """
+    deduper = Deduper()
+    for product in sorted(products, key=lambda p: p.match_key(), reverse=True):
+        deduper.add(product)
+    return deduper.representatives
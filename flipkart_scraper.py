@@ -1,106 +1,280 @@
 # flipkart_scraper.py
 import asyncio
-import json
+import time
+from typing import AsyncIterator
 from playwright.async_api import async_playwright, TimeoutError
+from bs4 import BeautifulSoup
+import metrics
+from deadline import NO_DEADLINE, Deadline
+from http_fetch import fetch_html
+from products import ProductRecord, save_products
+from resource_blocking import install_blocking
 
-async def scrape_flipkart_products(query: str, output_filename: str = "flipkart_data.json"):
+BASE_URL = "https://www.flipkart.com"
+CARD_SELECTOR = "div[data-id]"
+
+# Fallback selector chains, tried in order until one matches.
+TITLE_SELECTORS = [
+    "div.KzDlHZ",   # phones
+    "div._4rR01T",  # general
+    "a.IRpwTa",     # fashion
+    "a.s1Q9rs",     # generic
+    "a.WKTcLC"      # watches / accessories
+]
+PRICE_SELECTORS = ["div.Nx9bqj", "div._30jeq3", "div._25b18c"]
+RATING_SELECTORS = ["div._3LWZlK", "span.wjcEIp"]
+LINK_SELECTOR = "a[href*='/p/']"
+
+# Options for the BrowserContext this scraper runs in, shared with the browser pool.
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+}
+
+def _search_url(query: str, base_url: str) -> str:
     formatted_query = "+".join(query.split())
-    base_url = "https://www.flipkart.com"
-    search_url = f"{base_url}/search?q={formatted_query}"
-    results = []
+    return f"{base_url}/search?q={formatted_query}"
+
+async def iter_flipkart_products(query: str, context=None, extraction_mode: str = "bulk",
+                                 base_url: str = BASE_URL, fetch_mode: str = "auto",
+                                 deadline: Deadline = None) -> AsyncIterator[ProductRecord]:
+    """
+    Yields product records from the first Flipkart results page for `query` as soon as the
+    grid has been extracted. Pass `context` to run inside an existing BrowserContext
+    (e.g. from the browser pool); otherwise a private browser is launched.
+    `extraction_mode` is "bulk" (one in-page evaluate for the whole grid) or "element"
+    (the original per-card queries).
+    `fetch_mode` is "auto" (plain HTTP first, Chromium only if that finds nothing),
+    "http" (never start a browser) or "browser" (always render the page in Chromium).
+    `base_url` points the scraper at another host, e.g. the benchmark fixture server.
+    Page-load and grid waits are shortened to fit `deadline`, when one is given.
+    """
+    deadline = deadline or NO_DEADLINE
+    search_url = _search_url(query, base_url)
 
     print(f"[INFO] Starting Flipkart scrape for '{query}'")
 
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-            )
-            page = await context.new_page()
-            await page.goto(search_url, wait_until="load", timeout=90000)
-
-            try:
-                await page.wait_for_selector("div[data-id]", timeout=20000)
-                print("[INFO] Product grid found. Extracting products...")
-            except TimeoutError:
-                print("[WARNING] No visible grid. Page might be empty or changed.")
-                await browser.close()
-                json.dump([], open(output_filename, "w", encoding="utf-8"))
-                return
-
-            product_cards = await page.query_selector_all("div[data-id]")
-            if not product_cards:
-                print("[WARNING] No product cards found!")
-                await browser.close()
-                json.dump([], open(output_filename, "w", encoding="utf-8"))
-                return
-
-            for card in product_cards:
-                # Title (multiple layout fallbacks)
-                name = None
-                for selector in [
-                    "div.KzDlHZ",   # phones
-                    "div._4rR01T",  # general
-                    "a.IRpwTa",     # fashion
-                    "a.s1Q9rs",     # generic
-                    "a.WKTcLC"      # watches / accessories
-                ]:
-                    el = await card.query_selector(selector)
-                    if el:
-                        name = (await el.inner_text()).strip()
-                        break
-
-                # Price (multiple versions)
-                price = None
-                for selector in ["div.Nx9bqj", "div._30jeq3", "div._25b18c"]:
-                    el = await card.query_selector(selector)
-                    if el:
-                        price = (await el.inner_text()).strip()
-                        break
-
-                # Rating (optional)
-                rating = "N/A"
-                for selector in ["div._3LWZlK", "span.wjcEIp"]:
-                    el = await card.query_selector(selector)
-                    if el:
-                        rating = (await el.inner_text()).strip()
-                        break
-
-                # Image (lazy-load fallback)
-                img_el = await card.query_selector("img")
-                image_url = None
-                if img_el:
-                    image_url = await img_el.get_attribute("src") or await img_el.get_attribute("data-src")
-
-                # Product link
-                link_el = await card.query_selector("a[href*='/p/']")
-                product_href = await link_el.get_attribute("href") if link_el else None
-                product_url = f"{base_url}{product_href}" if product_href and product_href.startswith("/") else product_href
-
-                if name and price:
-                    results.append({
-                        "name": name,
-                        "price": price,
-                        "rating": rating,
-                        "image_url": image_url or "",
-                        "product_url": product_url or ""
-                    })
+    if fetch_mode != "browser":
+        results = await fetch_flipkart_http(query, base_url, deadline)
+        if results or fetch_mode == "http":
+            for record in results:
+                yield record
+            return
+        print("[INFO] Flipkart HTTP fetch found no products; falling back to Chromium.")
 
-            await browser.close()
+    if context is not None:
+        for record in await _scrape_results_page(context, search_url, base_url, extraction_mode, deadline):
+            yield record
+        return
 
-        if results:
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            print(f"[SUCCESS] {len(results)} products scraped and saved to '{output_filename}'")
-        else:
-            print("[WARNING] No products extracted, saving empty file.")
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump([], f)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            context = await browser.new_context(**CONTEXT_OPTIONS)
+            for record in await _scrape_results_page(context, search_url, base_url, extraction_mode, deadline):
+                yield record
+        finally:
+            await browser.close()
 
+async def scrape_flipkart_products(query: str, output_filename: str = None, context=None,
+                                   extraction_mode: str = "bulk", base_url: str = BASE_URL,
+                                   fetch_mode: str = "auto", deadline: Deadline = None):
+    """
+    Collects `iter_flipkart_products` into a list. Pass `output_filename` to also save the
+    results as JSON (debugging, and the subprocess scraper mode in agent.py).
+    """
+    results = []
+    try:
+        async for record in iter_flipkart_products(query, context, extraction_mode, base_url, fetch_mode,
+                                                   deadline):
+            results.append(record)
     except Exception as e:
         print(f"[ERROR] Flipkart scraper crashed: {e}")
 
+    if results:
+        print(f"[SUCCESS] {len(results)} products scraped.")
+    else:
+        print("[WARNING] No products extracted.")
+    if output_filename:
+        save_products(results, output_filename)
+
+    return results
+
+async def _scrape_results_page(context, search_url: str, base_url: str, extraction_mode: str = "bulk",
+                               deadline: Deadline = NO_DEADLINE) -> list:
+    results = []
+    route_stats = await install_blocking(context, "Flipkart")
+    page = await context.new_page()
+    try:
+        await page.goto(search_url, wait_until="load", timeout=deadline.timeout_ms(90))
+
+        try:
+            await page.wait_for_selector(CARD_SELECTOR, timeout=deadline.timeout_ms(20))
+            print("[INFO] Product grid found. Extracting products...")
+        except TimeoutError:
+            print("[WARNING] No visible grid. Page might be empty or changed.")
+            return results
+
+        started = time.perf_counter()
+        with metrics.span("extract_page", "Flipkart"):
+            if extraction_mode == "bulk":
+                results = await extract_page_bulk(page, base_url)
+            else:
+                results = await extract_page_per_element(page, base_url)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"[TIMING] Extracted {len(results)} products in {elapsed_ms:.0f} ms ({extraction_mode}).")
+    finally:
+        await page.close()
+        print(f"[INFO] {route_stats.summary()}")
+
+    return results
+
+# ------------------------------------------------------------------
+# Per-page extraction. Both paths walk the same selector chains and
+# produce identical records.
+# ------------------------------------------------------------------
+
+# Runs inside the page: one CDP round-trip returns every card in the grid.
+_EXTRACT_CARDS_JS = """
+(cards, sel) => cards.map(card => {
+    const firstText = selectors => {
+        for (const s of selectors) {
+            const el = card.querySelector(s);
+            if (el) return el.innerText.trim();
+        }
+        return null;
+    };
+    const img = card.querySelector('img');
+    const link = card.querySelector(sel.link);
+    return {
+        name: firstText(sel.title),
+        price: firstText(sel.price),
+        rating: firstText(sel.rating),
+        image_url: img ? (img.getAttribute('src') || img.getAttribute('data-src')) : null,
+        href: link ? link.getAttribute('href') : null,
+    };
+})
+"""
+
+def _build_record(name, price, rating, image_url, product_href, base_url: str):
+    if not (name and price):
+        return None
+    product_url = f"{base_url}{product_href}" if product_href and product_href.startswith("/") else product_href
+    return {
+        "name": name,
+        "price": price,
+        "rating": rating or "N/A",
+        "image_url": image_url or "",
+        "product_url": product_url or ""
+    }
+
+async def extract_page_bulk(page, base_url: str = BASE_URL) -> list:
+    """Extracts every product card on the page with a single in-page evaluate."""
+    selectors = {
+        "title": TITLE_SELECTORS,
+        "price": PRICE_SELECTORS,
+        "rating": RATING_SELECTORS,
+        "link": LINK_SELECTOR,
+    }
+    cards = await page.eval_on_selector_all(CARD_SELECTOR, _EXTRACT_CARDS_JS, selectors)
+    records = (
+        _build_record(c["name"], c["price"], c["rating"], c["image_url"], c["href"], base_url)
+        for c in cards
+    )
+    return [r for r in records if r]
+
+async def extract_page_per_element(page, base_url: str = BASE_URL) -> list:
+    """Extracts product cards with individual element queries (many round-trips per card)."""
+    results = []
+    product_cards = await page.query_selector_all(CARD_SELECTOR)
+    if not product_cards:
+        print("[WARNING] No product cards found!")
+        return results
+
+    for card in product_cards:
+        # Title (multiple layout fallbacks)
+        name = None
+        for selector in TITLE_SELECTORS:
+            el = await card.query_selector(selector)
+            if el:
+                name = (await el.inner_text()).strip()
+                break
+
+        # Price (multiple versions)
+        price = None
+        for selector in PRICE_SELECTORS:
+            el = await card.query_selector(selector)
+            if el:
+                price = (await el.inner_text()).strip()
+                break
+
+        # Rating (optional)
+        rating = None
+        for selector in RATING_SELECTORS:
+            el = await card.query_selector(selector)
+            if el:
+                rating = (await el.inner_text()).strip()
+                break
+
+        # Image (lazy-load fallback)
+        img_el = await card.query_selector("img")
+        image_url = None
+        if img_el:
+            image_url = await img_el.get_attribute("src") or await img_el.get_attribute("data-src")
+
+        # Product link
+        link_el = await card.query_selector(LINK_SELECTOR)
+        product_href = await link_el.get_attribute("href") if link_el else None
+
+        record = _build_record(name, price, rating, image_url, product_href, base_url)
+        if record:
+            results.append(record)
+
+    return results
+
+# ------------------------------------------------------------------
+# Browserless fast path: the results grid is server-rendered, so plain
+# HTTP plus BeautifulSoup with the same selector chains is usually enough.
+# ------------------------------------------------------------------
+def _first_text(card, selectors):
+    for selector in selectors:
+        el = card.select_one(selector)
+        if el:
+            return el.get_text(strip=True)
+    return None
+
+def parse_results_html(html: str, base_url: str = BASE_URL) -> list:
+    """Parses a server-rendered results page into the same records as the browser path."""
+    results = []
+    for card in BeautifulSoup(html, "html.parser").select(CARD_SELECTOR):
+        img = card.select_one("img")
+        link = card.select_one(LINK_SELECTOR)
+        record = _build_record(
+            _first_text(card, TITLE_SELECTORS),
+            _first_text(card, PRICE_SELECTORS),
+            _first_text(card, RATING_SELECTORS),
+            (img.get("src") or img.get("data-src")) if img else None,
+            link.get("href") if link else None,
+            base_url,
+        )
+        if record:
+            results.append(record)
+    return results
+
+async def fetch_flipkart_http(query: str, base_url: str = BASE_URL, deadline: Deadline = None) -> list:
+    """Fetches and parses the first results page without a browser; [] if that finds nothing."""
+    deadline = deadline or NO_DEADLINE
+    html = await fetch_html(_search_url(query, base_url), CONTEXT_OPTIONS["user_agent"],
+                            timeout=deadline.clamp(15.0))
+    if not html:
+        return []
+    started = time.perf_counter()
+    # Parsed off the event loop: the pool's loop is shared by every search in the worker.
+    with metrics.span("parse_html", "Flipkart"):
+        results = await asyncio.to_thread(parse_results_html, html, base_url)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[TIMING] Parsed {len(results)} products from HTML in {elapsed_ms:.0f} ms (http).")
+    return results
+
 if __name__ == "__main__":
     query = input("Enter product to search on Flipkart: ").strip() or "iphone 17"
-    asyncio.run(scrape_flipkart_products(query))
+    asyncio.run(scrape_flipkart_products(query, output_filename="flipkart_data.json"))
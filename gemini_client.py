@@ -0,0 +1,50 @@
+# gemini_client.py
+import os
+import threading
+
+# Gemini model used for both visual scoring and the optional written recommendation.
+DEFAULT_MODEL_NAME = "gemini-2.5-pro"
+
+_models = {}
+_configured_key = None
+_lock = threading.Lock()
+
+
+def _genai():
+    # google.generativeai (grpc, protobuf, google-auth) is the slowest import in the app,
+    # so it is only loaded the first time a model is actually needed.
+    import google.generativeai as genai
+    return genai
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME, api_key: str = None):
+    """
+    Returns the process-wide GenerativeModel for `model_name`, creating it on first use.
+    The model is shared by every request and thread, so genai.configure and client setup
+    happen once per process instead of once per search.
+    """
+    global _configured_key
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    model = _models.get(model_name)
+    if model is not None and api_key == _configured_key:
+        return model
+
+    with _lock:
+        genai = _genai()
+        if api_key != _configured_key:
+            # genai.configure is global: models built for the old key must not be reused.
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            _models.clear()
+        model = _models.get(model_name)
+        if model is None:
+            model = _models[model_name] = genai.GenerativeModel(model_name)
+        return model
+
+
+def clear():
+    """Forgets every cached model, e.g. after google.generativeai has been patched."""
+    global _configured_key
+    with _lock:
+        _models.clear()
+        _configured_key = None
@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+import os
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Import whatsapp_bot once in the master so forked workers start with it already loaded.
+# Safe because the browser pool and job queue start their threads lazily, after the fork.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") != "0"
+
+# "1" warms every worker right after it forks: agent.py, the Gemini client and Chromium.
+# "imports" skips the browser launch; "0" disables pre-warming.
+PREWARM = os.getenv("PREWARM", "1")
+
+
+def post_fork(server, worker):
+    if PREWARM == "0":
+        return
+
+    def warm():
+        import whatsapp_bot
+        whatsapp_bot.prewarm(browser=PREWARM != "imports")
+
+    # Runs in the background so the worker starts accepting requests immediately.
+    threading.Thread(target=warm, name="prewarm", daemon=True).start()
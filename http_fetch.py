@@ -0,0 +1,49 @@
+# http_fetch.py
+import asyncio
+from typing import Optional
+
+import requests
+import urllib3
+
+# Same keep-alive session as the image downloads, so repeated hosts reuse their connections.
+from image_fetch import get_session
+
+# Sent with browserless page fetches so servers return the same markup Chromium would get.
+HTML_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-IN,en;q=0.9",
+}
+
+MAX_PAGE_BYTES = 8 * 1024 * 1024
+
+
+def _get_html(url: str, user_agent: str, timeout: float) -> Optional[str]:
+    headers = {**HTML_HEADERS, "User-Agent": user_agent}
+    with get_session().get(url, headers=headers, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            print(f"[WARN] HTTP fetch of {url} returned {response.status_code}.")
+            return None
+        content = response.raw.read(MAX_PAGE_BYTES + 1, decode_content=True)
+        if len(content) > MAX_PAGE_BYTES:
+            print(f"[WARN] HTTP fetch of {url} is larger than {MAX_PAGE_BYTES} bytes; skipping.")
+            return None
+        # requests assumes ISO-8859-1 for text/* without a charset; these sites are UTF-8.
+        charset = response.encoding if "charset" in response.headers.get("Content-Type", "").lower() else "utf-8"
+        return content.decode(charset or "utf-8", errors="replace")
+
+
+async def fetch_html(url: str, user_agent: str, timeout: float = 15.0) -> Optional[str]:
+    """
+    Downloads a page over plain pooled HTTP, without a browser or JavaScript.
+    Returns the decoded HTML, or None on an error status, a network failure or an
+    undecodable or truncated body, so the caller falls back to the browser.
+    """
+    if timeout <= 0:  # no time left in the request's deadline
+        return None
+    try:
+        return await asyncio.to_thread(_get_html, url, user_agent, timeout)
+    # raw.read() raises urllib3's own errors (ProtocolError, DecodeError...), not requests';
+    # LookupError is an unknown charset.
+    except (requests.RequestException, urllib3.exceptions.HTTPError, LookupError) as e:
+        print(f"[WARN] HTTP fetch of {url} failed: {e}")
+        return None
@@ -0,0 +1,199 @@
+# image_cache.py
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+from io import BytesIO
+from typing import Optional, Tuple
+
+from PIL import Image
+
+DEFAULT_MAX_SIDE = 384
+JPEG_QUALITY = 85
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def normalize_image(image: Image.Image, max_side: int = DEFAULT_MAX_SIDE) -> bytes:
+    """RGB, at most max_side x max_side, re-encoded as JPEG: the canonical form we hash and store."""
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+class ImageCache:
+    """
+    Content-addressed store of normalized JPEGs, shared by every gunicorn worker.
+
+    blobs/<ab>/<sha256>.jpg   normalized image bytes, named by their own hash
+    urls/<cd>/<sha256(url)>   the content hash a source URL resolved to
+
+    Files are written to a temp file and renamed into place, so readers never see partial
+    data. When the store grows past `max_bytes`, least recently used blobs are removed along
+    with the URL entries pointing at them; one worker at a time evicts, guarded by an flock
+    on `.evict.lock`.
+    """
+
+    def __init__(self, root: str = "image_cache", max_bytes: int = 512 * 1024 * 1024,
+                 evict_every: int = 50):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        os.makedirs(os.path.join(root, "urls"), exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+    def blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "blobs", content_hash[:2], f"{content_hash}.jpg")
+
+    def _url_path(self, url: str) -> str:
+        key = url_key(url)
+        return os.path.join(self.root, "urls", key[:2], key)
+
+    def get_by_hash(self, content_hash: str) -> Optional[bytes]:
+        path = self.blob_path(content_hash)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # mtime doubles as the LRU clock for eviction
+        except OSError:
+            pass
+        return data
+
+    def get_by_url(self, url: str) -> Optional[Tuple[str, bytes]]:
+        """Returns (content_hash, jpeg_bytes) for a URL seen before, or None."""
+        url_path = self._url_path(url)
+        try:
+            with open(url_path, "r", encoding="ascii") as f:
+                content_hash = f.read().strip()
+        except OSError:
+            return None
+        data = self.get_by_hash(content_hash)
+        if data is None:
+            self._remove(url_path)  # its blob was evicted
+            return None
+        return content_hash, data
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+    def put_image(self, image: Image.Image, url: str = None, max_side: int = DEFAULT_MAX_SIDE) -> str:
+        """Stores the normalized form of `image` (and the URL it came from); returns its content hash."""
+        return self.put_normalized(normalize_image(image, max_side), url)
+
+    def put_normalized(self, data: bytes, url: str = None) -> str:
+        content_hash = hashlib.sha256(data).hexdigest()
+        blob_path = self.blob_path(content_hash)
+        if not os.path.exists(blob_path):
+            self._atomic_write(blob_path, data)
+        if url:
+            self._atomic_write(self._url_path(url), content_hash.encode("ascii"))
+
+        with self._lock:
+            self._writes += 1
+            should_evict = self._writes % self.evict_every == 0
+        if should_evict:
+            self.evict()
+        return content_hash
+
+    def _atomic_write(self, path: str, data: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    # ------------------------------------------------------------------
+    # Eviction
+    # ------------------------------------------------------------------
+    def evict(self):
+        """Removes least recently used blobs, and the URL entries for them, until the store is under max_bytes."""
+        lock_path = os.path.join(self.root, ".evict.lock")
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another worker is already evicting
+            try:
+                self._evict_locked()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _evict_locked(self):
+        blobs, total = [], 0
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "blobs")):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                blobs.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+
+        removed = set()
+        for _, size, path in sorted(blobs):
+            if not self._remove(path):
+                continue
+            total -= size
+            removed.add(os.path.basename(path)[:-len(".jpg")])
+            if total <= self.max_bytes * 0.9:  # leave headroom so we don't evict on every write
+                break
+
+        urls_removed = 0
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, "urls")):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    with open(path, "r", encoding="ascii") as f:
+                        content_hash = f.read().strip()
+                except (OSError, UnicodeDecodeError):
+                    continue
+                if content_hash in removed and self._remove(path):
+                    urls_removed += 1
+        print(f"[INFO] Image cache evicted {len(removed)} images and {urls_removed} URL entries, "
+              f"now {total / (1024 * 1024):.0f} MB.")
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+
+_default_cache = None
+
+
+def get_default_cache() -> ImageCache:
+    """Process-wide cache configured by IMAGE_CACHE_DIR and IMAGE_CACHE_MAX_MB."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ImageCache(
+            root=os.getenv("IMAGE_CACHE_DIR", "image_cache"),
+            max_bytes=int(os.getenv("IMAGE_CACHE_MAX_MB", "512")) * 1024 * 1024,
+        )
+    return _default_cache
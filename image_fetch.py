@@ -0,0 +1,153 @@
+# image_fetch.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from io import BytesIO
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+import metrics
+
+# Product thumbnails are compared visually, not inspected: DEFAULT_MAX_SIDE (384 px) is
+# plenty for Gemini and keeps each decoded image around 0.4 MB whatever the original size.
+from image_cache import DEFAULT_MAX_SIDE, ImageCache, normalize_image
+
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_host_limits = {}
+
+
+def get_session(pool_size: int = 32) -> requests.Session:
+    """Process-wide keep-alive session, so repeated hosts reuse their connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+            _session.headers["User-Agent"] = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+        return _session
+
+
+def _host_semaphore(url: str, per_host_limit: int) -> threading.BoundedSemaphore:
+    host = urlparse(url).hostname or ""
+    with _session_lock:
+        semaphore = _host_limits.get((host, per_host_limit))
+        if semaphore is None:
+            semaphore = _host_limits[(host, per_host_limit)] = threading.BoundedSemaphore(per_host_limit)
+        return semaphore
+
+
+class FetchStats:
+    def __init__(self):
+        self.requested = 0
+        self.fetched = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.cache_hits = 0
+        self.bytes_downloaded = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f"{self.fetched}/{self.requested} images fetched ({self.cache_hits} from cache), "
+                f"{self.failed} failed, {self.timed_out} timed out in {self.elapsed:.1f}s")
+
+
+def decode_image(content: bytes, max_side: int = DEFAULT_MAX_SIDE) -> Image.Image:
+    """Decodes and downsizes image bytes to an RGB image no larger than max_side x max_side."""
+    image = Image.open(BytesIO(content))
+    image.draft("RGB", (max_side, max_side))  # lets JPEG decode at reduced scale
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+def _fetch_one(url: str, max_side: int, per_host_limit: int, request_timeout: float,
+               cache: Optional[ImageCache] = None) -> Tuple[Image.Image, bool]:
+    """Returns (image, served_from_cache). The image's content hash is in image.info["content_hash"]."""
+    if cache is not None:
+        hit = cache.get_by_url(url)
+        if hit is not None:
+            content_hash, data = hit
+            image = Image.open(BytesIO(data))
+            image.load()
+            image.info["content_hash"] = content_hash
+            return image, True
+
+    with _host_semaphore(url, per_host_limit):
+        with get_session().get(url, timeout=request_timeout, stream=True) as response:
+            response.raise_for_status()
+            content = response.raw.read(MAX_IMAGE_BYTES + 1, decode_content=True)
+    if len(content) > MAX_IMAGE_BYTES:
+        raise ValueError(f"image larger than {MAX_IMAGE_BYTES} bytes")
+    image = decode_image(content, max_side)
+    image.info["bytes_downloaded"] = len(content)
+
+    if cache is not None:
+        data = normalize_image(image, max_side)
+        image.info["content_hash"] = cache.put_normalized(data, url)
+    return image, False
+
+
+def fetch_images(urls: List[str], max_side: int = DEFAULT_MAX_SIDE, max_workers: int = 16,
+                 per_host_limit: int = 6, deadline: float = 30.0,
+                 request_timeout: float = 10.0,
+                 cache: Optional[ImageCache] = None) -> Tuple[List[Optional[Image.Image]], FetchStats]:
+    """
+    Downloads `urls` concurrently over pooled keep-alive connections, at most
+    `per_host_limit` at a time per host, and decodes + downsizes each image as soon as it
+    arrives so raw bytes never pile up. Anything not finished within `deadline` seconds is
+    abandoned. Returns images aligned with `urls` (None where a fetch failed) and stats.
+    With an ImageCache, URLs seen before are served from disk without touching the network.
+    """
+    stats = FetchStats()
+    stats.requested = len(urls)
+    images = [None] * len(urls)
+    if not urls:
+        return images, stats
+    if deadline <= 0:
+        # No time left: don't start threads or connections that would only be abandoned.
+        stats.timed_out = len(urls)
+        metrics.IMAGES.inc(stats.timed_out, outcome="timed_out")
+        return images, stats
+
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fetch")
+    pending = {
+        executor.submit(_fetch_one, url, max_side, per_host_limit, request_timeout, cache): i
+        for i, url in enumerate(urls)
+    }
+    try:
+        while pending:
+            remaining = deadline - (time.monotonic() - started)
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    images[index], from_cache = future.result()
+                    stats.fetched += 1
+                    stats.cache_hits += from_cache
+                    stats.bytes_downloaded += images[index].info.get("bytes_downloaded", 0)
+                except Exception:
+                    stats.failed += 1
+    finally:
+        stats.timed_out = len(pending)
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+        stats.elapsed = time.monotonic() - started
+        metrics.IMAGES.inc(stats.fetched - stats.cache_hits, outcome="fetched")
+        metrics.IMAGES.inc(stats.cache_hits, outcome="cache_hit")
+        metrics.IMAGES.inc(stats.failed, outcome="failed")
+        metrics.IMAGES.inc(stats.timed_out, outcome="timed_out")
+
+    return images, stats
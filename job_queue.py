@@ -0,0 +1,125 @@
+# job_queue.py
+import threading
+import time
+import traceback
+from collections import Counter, deque
+
+STARTED = "started"
+QUEUED = "queued"
+REJECTED_USER_LIMIT = "rejected_user_limit"
+REJECTED_FULL = "rejected_full"
+
+
+class Admission:
+    """Outcome of JobQueue.submit: `status` plus the 1-based queue `position` when queued."""
+    __slots__ = ("status", "position")
+
+    def __init__(self, status: str, position: int = 0):
+        self.status = status
+        self.position = position
+
+    @property
+    def accepted(self) -> bool:
+        return self.status in (STARTED, QUEUED)
+
+
+class JobQueue:
+    """
+    Bounded FIFO of jobs served by a fixed pool of worker threads.
+
+    - At most `num_workers` jobs run at once; at most `max_queued` more may wait.
+    - Each user may have at most `per_user_limit` jobs queued or running.
+    Anything beyond that is rejected immediately, so a burst of messages turns into
+    polite "busy" replies instead of dozens of browsers.
+    """
+
+    def __init__(self, num_workers: int = 2, max_queued: int = 20, per_user_limit: int = 1,
+                 wait_samples: int = 200):
+        self.num_workers = num_workers
+        self.max_queued = max_queued
+        self.per_user_limit = per_user_limit
+
+        self._pending = deque()  # (user_id, fn, args, enqueued_at)
+        self._in_flight = Counter()  # user_id -> queued + running jobs
+        self._running = 0
+        self._cond = threading.Condition()
+        self._workers = []
+
+        self._wait_times = deque(maxlen=wait_samples)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = Counter()
+
+    def submit(self, user_id: str, fn, *args) -> Admission:
+        with self._cond:
+            self._ensure_workers()
+            if self._in_flight[user_id] >= self.per_user_limit:
+                self.rejected[REJECTED_USER_LIMIT] += 1
+                return Admission(REJECTED_USER_LIMIT)
+            if self._waiting() >= self.max_queued:
+                self.rejected[REJECTED_FULL] += 1
+                return Admission(REJECTED_FULL)
+
+            self._pending.append((user_id, fn, args, time.monotonic()))
+            self._in_flight[user_id] += 1
+            self._cond.notify()
+            # Idle workers pick the job up right away; otherwise report its place in line.
+            position = self._waiting()
+            return Admission(QUEUED, position) if position > 0 else Admission(STARTED)
+
+    def _waiting(self) -> int:
+        """Jobs that will not start until a busy worker frees up."""
+        return max(0, len(self._pending) + self._running - self.num_workers)
+
+    def stats(self) -> dict:
+        with self._cond:
+            waits = sorted(self._wait_times)
+            return {
+                "queue_depth": self._waiting(),
+                "running": self._running,
+                "workers": self.num_workers,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected_user_limit": self.rejected[REJECTED_USER_LIMIT],
+                "rejected_full": self.rejected[REJECTED_FULL],
+                "wait_seconds_avg": sum(waits) / len(waits) if waits else 0.0,
+                "wait_seconds_p95": waits[min(len(waits) - 1, int(0.95 * len(waits)))] if waits else 0.0,
+                "wait_seconds_max": waits[-1] if waits else 0.0,
+            }
+
+    def _ensure_workers(self):
+        # Started lazily so each forked gunicorn worker gets its own threads.
+        self._workers = [w for w in self._workers if w.is_alive()]
+        while len(self._workers) < self.num_workers:
+            worker = threading.Thread(target=self._work, name=f"job-worker-{len(self._workers)}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                user_id, fn, args, enqueued_at = self._pending.popleft()
+                self._running += 1
+                waited = time.monotonic() - enqueued_at
+                self._wait_times.append(waited)
+
+            print(f"[QUEUE] Starting job for {user_id} after waiting {waited:.1f}s")
+            ok = True
+            try:
+                fn(*args)
+            except Exception:
+                ok = False
+                traceback.print_exc()
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._in_flight[user_id] -= 1
+                    if self._in_flight[user_id] <= 0:
+                        del self._in_flight[user_id]
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
@@ -0,0 +1,260 @@
+# metrics.py
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition format, served by GET /metrics on the WhatsApp app.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds. Spans range from sub-millisecond (local ranking) to minutes (a full scrape).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# When set, every traced request writes its spans to <METRICS_TRACE_DIR>/<trace id>.json.
+TRACE_DIR = os.getenv("METRICS_TRACE_DIR")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines += self._render_value(key, value)
+        return lines
+
+    def _render_value(self, key: Tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key: Tuple, value) -> List[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            le = 'le="%s"' % bound
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+        lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ------------------------------------------------------------------
+# Pipeline metrics. Per process: each gunicorn worker exposes its own.
+# ------------------------------------------------------------------
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "shopping_stage_seconds", "Time spent in each pipeline stage.", ("stage", "platform")))
+SCRAPES = REGISTRY.register(Counter(
+    "shopping_scrapes_total", "Platform scrapes by outcome (ok, empty, timeout, error).", ("platform", "outcome")))
+PRODUCTS = REGISTRY.register(Counter(
+    "shopping_products_scraped_total", "Products returned by each platform's scraper.", ("platform",)))
+FETCH_PATHS = REGISTRY.register(Counter(
+    "shopping_fetch_path_total", "Scrapes served by the browserless HTTP path vs. Chromium.", ("platform", "path")))
+BLOCKED_PAGES = REGISTRY.register(Counter(
+    "shopping_blocked_pages_total", "Result pages that came back as a CAPTCHA/robot check.", ("platform",)))
+IMAGES = REGISTRY.register(Counter(
+    "shopping_images_total", "Product image fetches by outcome (fetched, cache_hit, failed, timed_out).", ("outcome",)))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "shopping_cache_lookups_total", "Cache lookups by cache and outcome.", ("cache", "outcome")))
+GEMINI_CALLS = REGISTRY.register(Counter(
+    "shopping_gemini_calls_total", "Gemini API calls by purpose and outcome.", ("purpose", "outcome")))
+GEMINI_TOKENS = REGISTRY.register(Counter(
+    "shopping_gemini_tokens_total", "Gemini tokens by purpose and kind (prompt, candidates).", ("purpose", "kind")))
+SEARCHES = REGISTRY.register(Counter(
+    "shopping_searches_total", "User searches by outcome, as written to the query log.", ("outcome",)))
+PREWARM = REGISTRY.register(Counter(
+    "shopping_prewarm_total", "Background pre-warm work for trending queries (scrape, image).", ("kind",)))
+QUEUE = REGISTRY.register(Gauge(
+    "shopping_job_queue", "Search job queue state (queue_depth, running, completed, ...).", ("stat",)))
+BROWSER_POOL = REGISTRY.register(Gauge(
+    "shopping_browser_pool", "Browser pool state (active_contexts, retired_browsers, ...).", ("stat",)))
+
+
+def record_gemini_usage(response, purpose: str):
+    """Adds a generate_content response's token counts, when the SDK reports them."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    GEMINI_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, purpose=purpose, kind="prompt")
+    GEMINI_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, purpose=purpose, kind="candidates")
+
+
+# ------------------------------------------------------------------
+# Spans and per-request traces
+# ------------------------------------------------------------------
+class Trace:
+    """Spans recorded while handling one request, as offsets from its start."""
+
+    def __init__(self, name: str, **attributes):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, platform: str, started: float, elapsed: float):
+        with self._lock:
+            self.spans.append({
+                "stage": stage,
+                "platform": platform,
+                "start_ms": round((started - self.started) * 1000, 1),
+                "duration_ms": round(elapsed * 1000, 1),
+            })
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        return {
+            "id": self.id,
+            "name": self.name,
+            "attributes": self.attributes,
+            "started_at": self.wall_started,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans": spans,
+        }
+
+    def dump(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"{self.id}.json"), "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str, platform: str = ""):
+    """Times the block into shopping_stage_seconds (and the current trace, if any)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, platform=platform)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, platform, started, elapsed)
+
+
+@contextmanager
+def trace_request(name: str, **attributes):
+    """Collects this thread's spans into a Trace, dumped to METRICS_TRACE_DIR when set."""
+    trace = Trace(name, **attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        if TRACE_DIR:
+            try:
+                trace.dump(TRACE_DIR)
+            except OSError as e:
+                print(f"[WARN] Could not write trace {trace.id}: {e}")
+
+
+def bind_trace(coro):
+    """Wraps `coro` so spans inside it land in the caller's trace, even on another loop thread."""
+    trace = _current_trace.get()
+
+    async def run():
+        _current_trace.set(trace)
+        return await coro
+    return run()
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,289 @@
+# orchestrator.py
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from deadline import NO_DEADLINE, Deadline
+from result_cache import ResultCache, normalize_query
+from single_flight import SingleFlight, copy_products
+import amazon
+import flipkart_scraper
+import scrape_myntra
+
+# ------------------------------------------------------------------
+# Platform registry: display name -> scraper module and time budget
+# ------------------------------------------------------------------
+# Each scraper is an async generator yielding product records as they are extracted,
+# so results stay in memory and nothing is written to the shared *_data.json files.
+PLATFORM_SCRAPERS = {
+    "Flipkart": flipkart_scraper.iter_flipkart_products,
+    "Amazon": amazon.iter_amazon_products,
+    "Myntra": scrape_myntra.iter_myntra_products,
+}
+
+# BrowserContext options each scraper expects when it runs on a pooled browser.
+PLATFORM_CONTEXT_OPTIONS = {
+    "Flipkart": flipkart_scraper.CONTEXT_OPTIONS,
+    "Amazon": amazon.CONTEXT_OPTIONS,
+    "Myntra": scrape_myntra.CONTEXT_OPTIONS,
+}
+
+# Host each scraper targets. SCRAPER_BASE_URL_<PLATFORM> overrides it, e.g. to run the
+# whole pipeline against the offline fixture server in benchmarks/.
+PLATFORM_BASE_URLS = {
+    "Flipkart": os.getenv("SCRAPER_BASE_URL_FLIPKART", flipkart_scraper.BASE_URL),
+    "Amazon": os.getenv("SCRAPER_BASE_URL_AMAZON", amazon.BASE_URL),
+    "Myntra": os.getenv("SCRAPER_BASE_URL_MYNTRA", scrape_myntra.BASE_URL),
+}
+
+# Browserless fast paths: plain HTTP plus HTML/JSON parsing of the results page.
+PLATFORM_HTTP_FETCHERS = {
+    "Flipkart": flipkart_scraper.fetch_flipkart_http,
+    "Myntra": scrape_myntra.fetch_myntra_http,
+}
+
+# "auto" tries the HTTP fast path first and starts Chromium only if it finds nothing;
+# "http" never starts a browser; "browser" always does. SCRAPER_FETCH_MODE sets the
+# default, SCRAPER_FETCH_MODE_<PLATFORM> overrides it per platform.
+FETCH_MODE = os.getenv("SCRAPER_FETCH_MODE", "auto")
+PLATFORM_FETCH_MODES = {
+    platform: os.getenv(f"SCRAPER_FETCH_MODE_{platform.upper()}", FETCH_MODE)
+    for platform in PLATFORM_HTTP_FETCHERS
+}
+
+# Caps on how many products a scraper collects, for scrapers that take one: Myntra
+# would otherwise keep scrolling until the page stops loading more. 0 means no cap.
+PLATFORM_MAX_ITEMS = {
+    "Myntra": int(os.getenv("SCRAPER_MAX_ITEMS_MYNTRA", "0")),
+}
+
+# Per-platform timeouts in seconds. Myntra scrolls and Amazon paginates,
+# so they get a little more room than Flipkart's single results page.
+DEFAULT_TIMEOUTS = {
+    "Flipkart": 120,
+    "Amazon": 180,
+    "Myntra": 180,
+}
+
+
+async def _scrape(platform: str, query: str, products: List[Dict], pool=None, deadline: Deadline = NO_DEADLINE):
+    """Appends records to `products` as the scraper yields them, so a timeout keeps what arrived."""
+    scraper = PLATFORM_SCRAPERS[platform]
+    base_url = PLATFORM_BASE_URLS[platform]
+    options = {"base_url": base_url, "deadline": deadline}
+    if PLATFORM_MAX_ITEMS.get(platform):
+        options["max_items"] = PLATFORM_MAX_ITEMS[platform]
+
+    http_fetcher = PLATFORM_HTTP_FETCHERS.get(platform)
+    if http_fetcher is not None:
+        fetch_mode = PLATFORM_FETCH_MODES[platform]
+        if fetch_mode != "browser":
+            # Tried here rather than inside the scraper, so no pooled context is opened for it.
+            with metrics.span("http_fetch", platform):
+                limit = {"max_items": options["max_items"]} if "max_items" in options else {}
+                records = await http_fetcher(query, base_url, deadline=deadline, **limit)
+            if records or fetch_mode == "http":
+                metrics.FETCH_PATHS.inc(platform=platform, path="http")
+                products.extend(records)
+                return
+            print(f"[INFO] {platform}: HTTP fetch found no products; falling back to Chromium.")
+        options["fetch_mode"] = "browser"
+
+    metrics.FETCH_PATHS.inc(platform=platform, path="browser")
+    if pool is None:
+        async for record in scraper(query, **options):
+            products.append(record)
+        return
+    async with pool.context(**PLATFORM_CONTEXT_OPTIONS[platform]) as context:
+        async for record in scraper(query, context=context, **options):
+            products.append(record)
+
+
+async def _run_platform(platform: str, query: str, timeout: float, pool=None,
+                        deadline: Deadline = NO_DEADLINE) -> Tuple[List[Dict], str]:
+    """Returns (products, outcome); on a timeout or error, the products found before it."""
+    started = time.perf_counter()
+    products = []
+    outcome = "ok"
+    # The per-platform timeout never outlasts the request's deadline.
+    timeout = deadline.clamp(timeout)
+    try:
+        with metrics.span("scrape", platform):
+            await asyncio.wait_for(_scrape(platform, query, products, pool, deadline), timeout=timeout)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        print(f"[ERROR] {platform} scraper timed out after {timeout:.0f}s; keeping {len(products)} products found so far.")
+        return products, outcome
+    except Exception as e:
+        outcome = "error"
+        print(f"[ERROR] {platform} scraper failed: {e}; keeping {len(products)} products found so far.")
+        return products, outcome
+    finally:
+        if outcome == "ok" and not products:
+            outcome = "empty"
+        metrics.SCRAPES.inc(platform=platform, outcome=outcome)
+        metrics.PRODUCTS.inc(len(products), platform=platform)
+
+    elapsed = time.perf_counter() - started
+    print(f"[SUCCESS] {platform}: {len(products)} products in {elapsed:.1f}s.")
+    return products, outcome
+
+
+# Identical in-flight scrapes (same normalized query and platform) share one run,
+# whichever loop or worker thread asked first.
+_in_flight = SingleFlight()
+
+
+def _copy_result(result: Tuple[List[Dict], str]) -> Tuple[List[Dict], str]:
+    products, outcome = result
+    return copy_products(products), outcome
+
+
+async def _shared_platform(platform: str, query: str, timeout: float, pool=None,
+                           deadline: Deadline = NO_DEADLINE) -> Tuple[List[Dict], str]:
+    """
+    Runs the scraper for `platform`, or joins an identical scrape that is already running.
+    A joining caller still stops at its own deadline: if the shared scrape (which runs on
+    the first caller's deadline) hasn't finished by then, it gets no products.
+    Returns (products, outcome).
+    """
+    key = (normalize_query(query), platform)
+    wait = deadline.clamp(timeout)
+    try:
+        return await _in_flight.do(key, lambda: _run_platform(platform, query, timeout, pool, deadline),
+                                   copy=_copy_result, timeout=wait)
+    except asyncio.TimeoutError:
+        print(f"[ERROR] Shared {platform} scrape did not finish within this search's {wait:.1f}s; returning no products.")
+        metrics.SCRAPES.inc(platform=platform, outcome="timeout")
+        return [], "timeout"
+
+
+async def scrape_platform(platform: str, query: str, timeout: Optional[float] = None, pool=None,
+                          deadline: Optional[Deadline] = None) -> Tuple[List[Dict], str]:
+    """Scrapes one platform without the result cache. Returns (products, outcome); only "ok" is complete."""
+    return await _shared_platform(platform, query, timeout or DEFAULT_TIMEOUTS[platform], pool,
+                                  deadline or NO_DEADLINE)
+
+
+# Strong references to background refreshes so they are not garbage-collected mid-run.
+_background_refreshes = set()
+
+_refresh_loop = None
+_refresh_loop_lock = threading.Lock()
+
+# The refresh loop thread is a daemon, so a CLI run (agent.py) would otherwise drop its
+# refreshes the moment it exits. At exit they get this long to finish; 0 drops them.
+REFRESH_EXIT_WAIT_SECONDS = float(os.getenv("CACHE_REFRESH_EXIT_WAIT_SECONDS", "60"))
+
+
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """A process-wide loop thread for refreshes started without a BrowserPool."""
+    global _refresh_loop
+    with _refresh_loop_lock:
+        if _refresh_loop is None:
+            _refresh_loop = asyncio.new_event_loop()
+            threading.Thread(target=_refresh_loop.run_forever, name="cache-refresh", daemon=True).start()
+            atexit.register(wait_for_refreshes, REFRESH_EXIT_WAIT_SECONDS)
+        return _refresh_loop
+
+
+def wait_for_refreshes(timeout: float) -> bool:
+    """Waits up to `timeout` seconds for background refreshes. True if none are left."""
+    pending = list(_background_refreshes)
+    if not pending:
+        return True
+    if timeout > 0:
+        print(f"[INFO] Waiting up to {timeout:.0f}s for {len(pending)} background cache refreshes...")
+        _, pending = concurrent.futures.wait(pending, timeout=timeout)
+    if pending:
+        print(f"[WARN] Abandoning {len(pending)} unfinished cache refreshes; their entries stay stale.")
+    return not pending
+
+
+def _start_refresh(coro, pool=None):
+    """
+    Runs a refresh on a loop that outlives the current search. Callers without a pool use
+    asyncio.run(), whose loop (and every task on it) is torn down as soon as they return.
+    """
+    if pool is not None:
+        future = pool.submit(coro)
+    else:
+        future = asyncio.run_coroutine_threadsafe(coro, _background_loop())
+    _background_refreshes.add(future)
+    future.add_done_callback(_background_refreshes.discard)
+
+
+async def _refresh_in_background(platform: str, query: str, timeout: float, pool, cache: ResultCache):
+    try:
+        products, outcome = await _shared_platform(platform, query, timeout, pool)
+        if outcome == "ok":
+            cache.put(query, platform, products)
+    finally:
+        cache.end_refresh(query, platform)
+
+
+async def _cached_platform(platform: str, query: str, timeout: float, pool=None,
+                           cache: Optional[ResultCache] = None, deadline: Deadline = NO_DEADLINE) -> List[Dict]:
+    """Serves `platform` from the cache when possible (stale-while-revalidate), else scrapes it."""
+    if cache is None:
+        products, _ = await _shared_platform(platform, query, timeout, pool, deadline)
+        return products
+
+    hit = cache.get(query, platform)
+    if hit is None:
+        metrics.CACHE_LOOKUPS.inc(cache="results", outcome="miss")
+    else:
+        products, fresh = hit
+        metrics.CACHE_LOOKUPS.inc(cache="results", outcome="fresh" if fresh else "stale")
+        if fresh:
+            print(f"[CACHE] {platform}: fresh hit, {len(products)} products.")
+        else:
+            print(f"[CACHE] {platform}: stale hit, {len(products)} products. Refreshing in the background.")
+            if cache.begin_refresh(query, platform):
+                _start_refresh(_refresh_in_background(platform, query, timeout, pool, cache), pool)
+        return products
+
+    products, outcome = await _shared_platform(platform, query, timeout, pool, deadline)
+    if outcome == "ok":  # empty, partial (timed-out or failed) results are not cached
+        cache.put(query, platform, products)
+    return products
+
+
+async def scrape_all_platforms(query: str, timeouts: Optional[Dict[str, float]] = None,
+                               platforms: Optional[List[str]] = None, pool=None,
+                               cache: Optional[ResultCache] = None,
+                               on_platform_done: Optional[Callable[[str, List[Dict]], None]] = None,
+                               deadline: Optional[Deadline] = None) -> Dict[str, List[Dict]]:
+    """
+    Runs every platform scraper concurrently in the current event loop and returns
+    {platform: products}. A platform that fails or times out contributes an empty
+    list, so the caller always gets whatever the other platforms managed to find.
+    When a BrowserPool is given, each scraper runs in a fresh context from it instead
+    of launching its own Chromium; the coroutine must then run on the pool's loop.
+    With a ResultCache, cached platforms are answered without scraping.
+    `on_platform_done(platform, products)` is called as soon as each platform finishes,
+    so callers can start on early results while slower platforms are still running.
+    With a Deadline, every platform stops by then and returns whatever it found so far.
+    """
+    deadline = deadline or NO_DEADLINE
+    timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+    platforms = platforms or list(PLATFORM_SCRAPERS)
+
+    print(f"\n{'='*20}\n[INFO] Scraping {', '.join(platforms)} concurrently for '{query}'\n{'='*20}")
+    started = time.perf_counter()
+
+    async def run_and_notify(platform: str) -> List[Dict]:
+        products = await _cached_platform(platform, query, timeouts[platform], pool, cache, deadline)
+        if on_platform_done is not None:
+            on_platform_done(platform, products)
+        return products
+
+    results = await asyncio.gather(*(run_and_notify(platform) for platform in platforms))
+
+    print(f"[INFO] All scrapers finished in {time.perf_counter() - started:.1f}s.")
+    return dict(zip(platforms, results))
@@ -0,0 +1,178 @@
+# prewarm_scheduler.py
+import fcntl
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from deadline import Deadline
+from query_log import QueryLog
+from result_cache import ResultCache
+
+# Images are pre-fetched in batches this big, so the bandwidth budget is overshot by one batch at most.
+IMAGE_BATCH_SIZE = 24
+
+
+def parse_hours(value: str) -> Optional[Tuple[int, int]]:
+    """'1-6' -> (1, 6): local hours [start, end) the scheduler may run in. Wraps past midnight ('22-6')."""
+    if not value:
+        return None
+    start, end = (int(part) % 24 for part in value.split("-", 1))
+    return start, end
+
+
+def in_hours(hours: Optional[Tuple[int, int]], hour: int) -> bool:
+    if hours is None:
+        return True
+    start, end = hours
+    return start <= hour < end if start <= end else hour >= start or hour < end
+
+
+class PrewarmScheduler:
+    """
+    Keeps the most searched queries warm: every `interval` seconds, while the worker is
+    idle (and inside `hours`, if set), it re-scrapes the top `top_n` trending queries
+    from the query log whose cached results have gone stale, and pre-downloads their
+    product images into the image cache, so popular searches are answered from warm data.
+
+    Each cycle is capped by a browser budget (`max_scrapes` platform scrapes, one at a
+    time, so it never holds more than one pooled context) and a bandwidth budget
+    (`max_image_mb` of downloaded images). With several gunicorn workers, a lock file
+    lets only one of them run a cycle at a time.
+    """
+
+    def __init__(self, query_log: QueryLog, pool, cache: ResultCache, platforms: List[str] = None,
+                 is_idle: Callable[[], bool] = None, top_n: int = 10, interval: float = 15 * 60,
+                 max_scrapes: int = 6, max_image_mb: float = 20.0, hours: Optional[Tuple[int, int]] = None,
+                 scrape_seconds: float = 60.0, lock_path: str = None):
+        self.query_log = query_log
+        self.pool = pool
+        self.cache = cache
+        self.platforms = platforms
+        self.is_idle = is_idle or (lambda: True)
+        self.top_n = top_n
+        self.interval = interval
+        self.max_scrapes = max_scrapes
+        self.max_image_bytes = int(max_image_mb * 1024 * 1024)
+        self.hours = hours
+        self.scrape_seconds = scrape_seconds
+        self.lock_path = lock_path or query_log.path + ".prewarm.lock"
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, query_log: QueryLog, pool, cache: ResultCache, platforms: List[str] = None,
+                 is_idle: Callable[[], bool] = None) -> "PrewarmScheduler":
+        """Reads the QUERY_PREWARM_* settings (see README)."""
+        return cls(
+            query_log, pool, cache, platforms, is_idle=is_idle,
+            top_n=int(os.getenv("QUERY_PREWARM_TOP_N", "10")),
+            interval=float(os.getenv("QUERY_PREWARM_INTERVAL_SECONDS", "900")),
+            max_scrapes=int(os.getenv("QUERY_PREWARM_MAX_SCRAPES", "6")),
+            max_image_mb=float(os.getenv("QUERY_PREWARM_MAX_IMAGE_MB", "20")),
+            hours=parse_hours(os.getenv("QUERY_PREWARM_HOURS", "")),
+        )
+
+    # ------------------------------------------------------------------
+    # Background thread
+    # ------------------------------------------------------------------
+    def start(self):
+        """Starts the scheduler thread if it isn't running. Safe to call on every request."""
+        with self._thread_lock:
+            # Started lazily so each forked gunicorn worker gets its own thread.
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="prewarm-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            if not in_hours(self.hours, time.localtime().tm_hour) or not self.is_idle():
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"[WARN] Pre-warm cycle failed: {e}")
+
+    # ------------------------------------------------------------------
+    # One cycle
+    # ------------------------------------------------------------------
+    def run_once(self) -> Dict[str, int]:
+        """Runs one cycle now, if no other worker is running one. Returns what it did."""
+        done = {"queries": 0, "scrapes": 0, "images": 0, "image_bytes": 0}
+        with open(self.lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return done  # another worker is already pre-warming
+            try:
+                with metrics.span("prewarm_cycle"):
+                    self._run_locked(done)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        print(f"[INFO] Pre-warmed {done['queries']} trending queries: {done['scrapes']} scrapes, "
+              f"{done['images']} images ({done['image_bytes'] / 1024 / 1024:.1f} MB).")
+        return done
+
+    def _run_locked(self, done: Dict[str, int]):
+        for query, _ in self.query_log.trending(self.top_n):
+            if done["scrapes"] >= self.max_scrapes and done["image_bytes"] >= self.max_image_bytes:
+                break
+            # A user search arriving mid-cycle gets the browser and the bandwidth first.
+            if not self.is_idle():
+                print("[INFO] Pre-warm paused: the worker is busy with user searches.")
+                break
+            products = self._warm_results(query, done)
+            self._warm_images(products, done)
+            done["queries"] += 1
+
+    def _warm_results(self, query: str, done: Dict[str, int]) -> List[Dict]:
+        """Re-scrapes the platforms whose cached results for `query` are missing or stale."""
+        from orchestrator import PLATFORM_SCRAPERS, scrape_platform
+
+        products = []
+        for platform in self.platforms or list(PLATFORM_SCRAPERS):
+            hit = self.cache.get(query, platform)
+            if hit is not None and hit[1]:
+                products.extend(hit[0])
+                continue
+            if done["scrapes"] >= self.max_scrapes:
+                if hit is not None:
+                    products.extend(hit[0])
+                continue
+            done["scrapes"] += 1
+            metrics.PREWARM.inc(kind="scrape")
+            # One platform at a time, bypassing the cache: a complete scrape replaces the stale entry.
+            scraped, outcome = self.pool.run(
+                scrape_platform(platform, query, pool=self.pool, deadline=Deadline(self.scrape_seconds)),
+                timeout=self.scrape_seconds + 30,
+            )
+            if outcome == "ok":
+                self.cache.put(query, platform, scraped)
+            products.extend(scraped if outcome == "ok" or not hit else hit[0])
+        return products
+
+    def _warm_images(self, products: List[Dict], done: Dict[str, int]):
+        """Downloads product images into the image cache until the bandwidth budget is spent."""
+        from image_cache import get_default_cache
+        from image_fetch import fetch_images
+
+        image_cache = get_default_cache()
+        urls = [record.get("image_url") or record.get("image") or "" for record in products]
+        urls = [url for url in dict.fromkeys(urls) if url.startswith("http") and image_cache.get_by_url(url) is None]
+        for start in range(0, len(urls), IMAGE_BATCH_SIZE):
+            if done["image_bytes"] >= self.max_image_bytes or not self.is_idle():
+                return
+            # Few connections per host: this traffic is never in a hurry.
+            _, stats = fetch_images(urls[start:start + IMAGE_BATCH_SIZE], max_workers=4,
+                                    per_host_limit=2, cache=image_cache)
+            done["images"] += stats.fetched - stats.cache_hits
+            done["image_bytes"] += stats.bytes_downloaded
+            metrics.PREWARM.inc(stats.fetched - stats.cache_hits, kind="image")
@@ -0,0 +1,217 @@
+# products.py
+import json
+import math
+import re
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple, TypedDict
+
+import numpy as np
+
+
+class ProductRecord(TypedDict, total=False):
+    """
+    One scraped product, as yielded by the `iter_*_products` scrapers.
+    Flipkart names the title field `name`; Amazon and Myntra use `title`.
+    `source` is added by the orchestrator/agent, not by the scrapers.
+    """
+    title: str
+    name: str
+    price: str
+    rating: str
+    image_url: str
+    product_url: str
+    source: str
+
+
+async def collect(records: AsyncIterator[ProductRecord]) -> List[ProductRecord]:
+    """Drains an `iter_*_products` generator into a list."""
+    return [record async for record in records]
+
+
+def save_products(products: Iterable[ProductRecord], output_filename: str):
+    """Optional debugging sink: writes the records to `output_filename` as indented JSON."""
+    products = list(products)
+    with open(output_filename, "w", encoding="utf-8") as f:
+        json.dump(products, f, indent=4, ensure_ascii=False)
+    print(f"All data has been saved to '{output_filename}'")
+
+
+# ------------------------------------------------------------------
+# Normalized product model: parsed once at ingest, numeric from then on
+# ------------------------------------------------------------------
+
+# "Rs.1,299", "Rs1,299", "₹999", "Rs. 1,299.50" -> the first number, commas allowed.
+_PRICE_NUMBER = re.compile(r"\d[\d,]*(?:\.\d{1,2})?")
+# "4.2 out of 5 stars", "4.3", "4.1★" -> 4.2 / 4.3 / 4.1
+_RATING_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+
+
+def parse_price_paise(text) -> Optional[int]:
+    """'Rs.1,299' -> 129900. None when there is no price."""
+    if isinstance(text, (int, float)):
+        return int(round(text * 100))
+    match = _PRICE_NUMBER.search(text or "")
+    if not match:
+        return None
+    return int(round(float(match.group().replace(",", "")) * 100))
+
+
+def parse_rating(text) -> float:
+    """'4.2 out of 5 stars' -> 4.2. NaN when missing or not on a 0-5 scale."""
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _RATING_NUMBER.search(text or "")
+    if not match:
+        return math.nan
+    rating = float(match.group())
+    return rating if 0 <= rating <= 5 else math.nan
+
+
+def format_price(price_paise: Optional[int]) -> str:
+    """129900 -> '₹1,299'; paise are shown only when non-zero."""
+    if price_paise is None:
+        return "N/A"
+    rupees, paise = divmod(price_paise, 100)
+    return f"₹{rupees:,}.{paise:02d}" if paise else f"₹{rupees:,}"
+
+
+class Product:
+    """
+    One product from any platform with the per-platform differences removed:
+    a single `title`, `price_paise` as an int (None if unknown) and `rating` as a float
+    (NaN if unknown). `local_score` (local image features) and `visual_score` (Gemini) are
+    filled in by the visual search; both run 0-10 but are not comparable with each other;
+    `image_hash` (64-bit dhash), `colour_histogram` and `offers` (the same item on other
+    platforms, cheapest first) by dedup.py.
+    """
+    __slots__ = ("title", "price_paise", "rating", "image_url", "product_url", "source",
+                 "local_score", "visual_score", "image_hash", "colour_histogram", "offers")
+
+    def __init__(self, title: str, price_paise: Optional[int], rating: float, image_url: str,
+                 product_url: str, source: str = "", local_score: Optional[float] = None,
+                 visual_score: Optional[float] = None):
+        self.title = title
+        self.price_paise = price_paise
+        self.rating = rating
+        self.image_url = image_url
+        self.product_url = product_url
+        self.source = source
+        self.local_score = local_score
+        self.visual_score = visual_score
+        self.image_hash = None
+        self.colour_histogram = None
+        self.offers = None
+
+    @classmethod
+    def from_record(cls, record: Dict, source: str = None) -> "Product":
+        """Parses a scraper record (any platform's field names and price/rating text)."""
+        return cls(
+            title=(record.get("title") or record.get("name") or "Product").strip(),
+            price_paise=parse_price_paise(record.get("price")),
+            rating=parse_rating(record.get("rating")),
+            image_url=record.get("image_url") or record.get("image") or "",
+            product_url=record.get("product_url") or "",
+            source=source or record.get("source", ""),
+        )
+
+    @property
+    def price_text(self) -> str:
+        return format_price(self.price_paise)
+
+    @property
+    def rating_text(self) -> str:
+        return "N/A" if math.isnan(self.rating) else f"{self.rating:.1f}"
+
+    @property
+    def match_text(self) -> str:
+        if self.visual_score is not None:
+            return f"{self.visual_score}/10"
+        if self.local_score is not None:
+            return f"~{self.local_score}/10 (local)"
+        return "N/A"
+
+    def match_key(self) -> Tuple[bool, float]:
+        """Sort key for visual matches: Gemini-scored products first, then local-only ones."""
+        if self.visual_score is not None:
+            return True, self.visual_score
+        return False, self.local_score if self.local_score is not None else 0.0
+
+    def other_offers(self) -> List["Product"]:
+        """Listings of this same item on other platforms."""
+        return [offer for offer in (self.offers or []) if offer is not self]
+
+    def to_dict(self) -> Dict:
+        """Display-friendly dict, e.g. for prompts and JSON output."""
+        record = {
+            "title": self.title,
+            "price": self.price_text,
+            "rating": self.rating_text,
+            "source": self.source,
+            "visual_score": self.visual_score,
+            "image_url": self.image_url,
+            "product_url": self.product_url,
+        }
+        if self.other_offers():
+            record["also_on"] = {offer.source: offer.price_text for offer in self.other_offers()}
+        return record
+
+    def __repr__(self):
+        return f"Product({self.title!r}, {self.price_text}, {self.rating_text}, {self.source})"
+
+
+def from_records(records: Iterable[Dict], source: str = None) -> List[Product]:
+    return [Product.from_record(record, source) for record in records]
+
+
+class ProductBatch:
+    """
+    Columnar view of many products for vectorized sorting and filtering.
+
+    Numeric fields are NumPy arrays aligned with `products`: `price_paise` (int64, -1
+    when unknown), `rating`, `local_score` and `visual_score` (float64, NaN when
+    unknown) and `source` (small int codes into `sources`). Built as a snapshot;
+    rebuild it after changing the products' scores.
+    """
+
+    def __init__(self, products: Sequence[Product]):
+        self.products = list(products)
+        n = len(self.products)
+        self.price_paise = np.fromiter(
+            (-1 if p.price_paise is None else p.price_paise for p in self.products), dtype=np.int64, count=n)
+        self.rating = np.fromiter((p.rating for p in self.products), dtype=np.float64, count=n)
+        self.local_score = np.fromiter(
+            (np.nan if p.local_score is None else p.local_score for p in self.products), dtype=np.float64, count=n)
+        self.visual_score = np.fromiter(
+            (np.nan if p.visual_score is None else p.visual_score for p in self.products), dtype=np.float64, count=n)
+        self.sources, codes = np.unique([p.source for p in self.products] or [""], return_inverse=True)
+        self.source = codes[:n].astype(np.int16)
+
+    def __len__(self):
+        return len(self.products)
+
+    @property
+    def has_price(self) -> np.ndarray:
+        return self.price_paise >= 0
+
+    def column(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+    def take(self, indices) -> List[Product]:
+        return [self.products[int(i)] for i in indices]
+
+    def where(self, mask: np.ndarray) -> "ProductBatch":
+        return ProductBatch(self.take(np.flatnonzero(mask)))
+
+    def from_source(self, source: str) -> np.ndarray:
+        """Boolean mask of products from `source`."""
+        matches = np.flatnonzero(self.sources == source)
+        return self.source == matches[0] if len(matches) else np.zeros(len(self), dtype=bool)
+
+    def top(self, n: int, column: str, descending: bool = True) -> List[Product]:
+        """The `n` products with the highest (or lowest) `column`; unknown values sort last."""
+        values = self.column(column).astype(np.float64)
+        if column == "price_paise":
+            values[~self.has_price] = np.nan
+        keys = -values if descending else values
+        keys = np.where(np.isnan(keys), np.inf, keys)
+        order = np.argsort(keys, kind="stable")
+        return self.take(order[:n])
@@ -0,0 +1,109 @@
+# query_log.py
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from result_cache import normalize_query
+
+# Outcomes recorded for each search.
+RESULTS = "results"
+NO_MATCH = "no_match"
+NO_RESULTS = "no_results"
+ERROR = "error"
+
+# Older records are only read when asked for; trending uses the last day or so.
+DEFAULT_WINDOW_SECONDS = 24 * 60 * 60
+DEFAULT_HALF_LIFE_SECONDS = 6 * 60 * 60
+
+
+class QueryLog:
+    """
+    Append-only JSON-lines log of user searches: one record per query with its
+    normalized text, outcome and end-to-end latency.
+
+    Every gunicorn worker appends to the same file. Each record is written with a single
+    O_APPEND write, so lines from different workers never interleave. The file is rotated
+    to `<path>.1` once it grows past `max_bytes`; `read` covers both.
+    """
+
+    def __init__(self, path: str = "query_log.jsonl", max_bytes: int = 16 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "QueryLog":
+        """Builds a log from QUERY_LOG_PATH and QUERY_LOG_MAX_MB."""
+        return cls(
+            path=os.getenv("QUERY_LOG_PATH", "query_log.jsonl"),
+            max_bytes=int(float(os.getenv("QUERY_LOG_MAX_MB", "16")) * 1024 * 1024),
+        )
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def record(self, query: str, outcome: str, latency: Optional[float] = None, **fields):
+        """Appends one search. Never raises: a full disk must not fail the user's search."""
+        entry = {"ts": round(time.time(), 3), "query": normalize_query(query), "outcome": outcome}
+        if latency is not None:
+            entry["latency_s"] = round(latency, 3)
+        entry.update(fields)
+        line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        try:
+            with self._lock:
+                self._rotate_if_full()
+                fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+        except OSError as e:
+            print(f"[WARN] Could not append to the query log {self.path}: {e}")
+
+    def _rotate_if_full(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        try:
+            os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass  # another worker rotated it first
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def read(self, since: float = 0.0) -> Iterator[Dict]:
+        """Yields records newer than `since` (a Unix time), oldest first."""
+        for path in (self.path + ".1", self.path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            continue  # a line cut short by a crash
+                        if entry.get("ts", 0) > since:
+                            yield entry
+            except FileNotFoundError:
+                continue
+
+    def trending(self, n: int = 10, window: float = DEFAULT_WINDOW_SECONDS,
+                 half_life: float = DEFAULT_HALF_LIFE_SECONDS, now: float = None) -> List[Tuple[str, float]]:
+        """
+        The `n` most searched queries of the last `window` seconds, as (query, score).
+        Each search counts 1, halved every `half_life` seconds, so today's spikes beat
+        yesterday's. Empty (image-only) queries are ignored.
+        """
+        now = now or time.time()
+        scores = defaultdict(float)
+        for entry in self.read(since=now - window):
+            query = entry.get("query")
+            if query:
+                scores[query] += math.pow(0.5, (now - entry["ts"]) / half_life)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n]
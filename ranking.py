@@ -0,0 +1,146 @@
+# ranking.py
+import os
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from products import Product, ProductBatch
+
+# How much each normalized signal (all in [0, 1]) contributes to a product's value score.
+#   visual  - visual_score / 10 (falls back to the local image score)
+#   price   - 1 for the cheapest product in the set, 0 for the most expensive
+#   rating  - rating / 5
+# A product missing a signal (e.g. Myntra has no ratings) is scored on the others only.
+DEFAULT_WEIGHTS = {"visual": 0.5, "price": 0.3, "rating": 0.2}
+SIGNALS = tuple(DEFAULT_WEIGHTS)
+
+# Multiplier per platform for how much its listings (sellers, returns, fakes) are trusted.
+DEFAULT_PLATFORM_TRUST = {"Amazon": 1.0, "Flipkart": 1.0, "Myntra": 1.0}
+
+# "weighted" orders purely by value score; "pareto" puts the Pareto front (products no
+# other product beats on visual, price and rating at once) first, each part by score.
+STRATEGIES = ("weighted", "pareto")
+
+
+def parse_weights(value: str, defaults: Dict[str, float]) -> Dict[str, float]:
+    """'visual=0.6, price=0.4' -> {..defaults, 'visual': 0.6, 'price': 0.4}, ignoring bad entries."""
+    weights = dict(defaults)
+    for part in (value or "").split(","):
+        name, _, number = part.partition("=")
+        try:
+            weights[name.strip()] = float(number)
+        except ValueError:
+            continue
+    return weights
+
+
+# Configured as e.g. RANKING_WEIGHTS="visual=0.6,price=0.4" and PLATFORM_TRUST="Myntra=0.9".
+RANKING_WEIGHTS = parse_weights(os.getenv("RANKING_WEIGHTS", ""), DEFAULT_WEIGHTS)
+PLATFORM_TRUST = parse_weights(os.getenv("PLATFORM_TRUST", ""), DEFAULT_PLATFORM_TRUST)
+RANKING_STRATEGY = os.getenv("RANKING_STRATEGY", "weighted")
+
+
+def signal_matrix(batch: ProductBatch) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns ((n, 3) signals in [0, 1] in SIGNALS order, (n, 3) mask of known values)."""
+    visual = np.where(np.isnan(batch.visual_score), batch.local_score, batch.visual_score) / 10.0
+
+    price = np.full(len(batch), np.nan)
+    known_price = batch.has_price
+    if known_price.any():
+        prices = batch.price_paise[known_price].astype(np.float64)
+        spread = prices.max() - prices.min()
+        price[known_price] = (prices.max() - prices) / spread if spread else 1.0
+
+    rating = batch.rating / 5.0
+
+    signals = np.stack([visual, price, rating], axis=1)
+    known = ~np.isnan(signals)
+    return np.nan_to_num(signals), known
+
+
+def value_scores(batch: ProductBatch, weights: Dict[str, float] = None,
+                 trust: Dict[str, float] = None) -> np.ndarray:
+    """Weighted value score in [0, 1] per product, scaled by its platform's trust."""
+    weights = weights or DEFAULT_WEIGHTS
+    trust = {**DEFAULT_PLATFORM_TRUST, **(trust or {})}
+    if not len(batch):
+        return np.zeros(0)
+
+    signals, known = signal_matrix(batch)
+    w = np.array([weights.get(name, 0.0) for name in SIGNALS])
+    weight_sum = (known * w).sum(axis=1)
+    scores = np.divide((signals * w).sum(axis=1), weight_sum, out=np.zeros(len(batch)), where=weight_sum > 0)
+
+    source_trust = np.array([trust.get(str(name), 1.0) for name in batch.sources])
+    return scores * source_trust[batch.source]
+
+
+def pareto_front(batch: ProductBatch) -> np.ndarray:
+    """
+    Boolean mask of non-dominated products: no other product is at least as good on every
+    signal (visual, price, rating; unknown counts as worst) and strictly better on one.
+    """
+    if not len(batch):
+        return np.zeros(0, dtype=bool)
+    signals, known = signal_matrix(batch)
+    signals = np.where(known, signals, -1.0)
+    at_least = (signals[:, None, :] >= signals[None, :, :]).all(axis=2)
+    better = (signals[:, None, :] > signals[None, :, :]).any(axis=2)
+    dominated = (at_least & better).any(axis=0)  # [i, j]: i dominates j
+    return ~dominated
+
+
+def rank_products(products: Sequence[Product], strategy: str = None, weights: Dict[str, float] = None,
+                  trust: Dict[str, float] = None) -> List[Tuple[Product, float]]:
+    """Returns [(product, value score)] best first."""
+    strategy = strategy or RANKING_STRATEGY
+    batch = ProductBatch(products)
+    scores = value_scores(batch, weights or RANKING_WEIGHTS, trust or PLATFORM_TRUST)
+    if strategy == "pareto":
+        order = np.lexsort((-scores, ~pareto_front(batch)))
+    else:
+        order = np.argsort(-scores, kind="stable")
+    return [(batch.products[i], float(scores[i])) for i in order]
+
+
+def _reason(product: Product, products: Sequence[Product]) -> str:
+    """One-line justification built from whichever signal stands out."""
+    prices = [p.price_paise for p in products if p.price_paise is not None]
+    ratings = [p.rating for p in products if not np.isnan(p.rating)]
+    visuals = [p.visual_score for p in products if p.visual_score is not None]
+
+    reasons = []
+    if product.visual_score is not None and visuals and product.visual_score >= max(visuals):
+        reasons.append(f"the closest visual match ({product.visual_score}/10)")
+    if product.price_paise is not None and prices and product.price_paise <= min(prices):
+        reasons.append(f"the lowest price ({product.price_text})")
+    if not np.isnan(product.rating) and ratings and product.rating >= max(ratings):
+        reasons.append(f"the best rating ({product.rating_text}★)")
+    if not reasons:
+        balance = [product.price_text, f"{product.rating_text}★"]
+        if product.visual_score is not None:
+            balance.append(f"a {product.visual_score}/10 match")
+        reasons.append("a good balance of " + ", ".join(balance))
+    return "It has " + " and ".join(reasons) + "."
+
+
+def recommend(products: Sequence[Product], user_query: str, strategy: str = None) -> str:
+    """
+    Deterministic replacement for the Gemini write-up: a "Top Recommendation" and
+    "Other Good Options" in the same markdown shape, from rank_products.
+    """
+    if not products:
+        return "Could not determine the best product as no visual matches were found."
+
+    ranked = rank_products(products, strategy)
+    best, _ = ranked[0]
+    lines = [
+        f"**Top Recommendation for \"{user_query}\"**",
+        f"{best.title} on {best.source} at {best.price_text}. {_reason(best, products)}",
+        "",
+        "**Other Good Options**",
+    ]
+    for product, _ in ranked[1:]:
+        lines.append(f"- {product.title} ({product.source}, {product.price_text}): {_reason(product, products)}")
+    return "\n".join(lines)
+
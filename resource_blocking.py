@@ -0,0 +1,114 @@
+# resource_blocking.py
+import os
+from collections import Counter
+from urllib.parse import urlparse
+
+# Resource types (Playwright's request.resource_type) that scrapers never need:
+# we read DOM text and image `src` attributes, not the pixels or the fonts.
+DEFAULT_BLOCKED_TYPES = {"image", "font", "media"}
+
+# Ad, analytics and tag-manager hosts; matched as a suffix of the request host.
+TRACKER_DOMAINS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "facebook.net",
+    "facebook.com",
+    "amazon-adsystem.com",
+    "scorecardresearch.com",
+    "criteo.com",
+    "criteo.net",
+    "hotjar.com",
+    "branch.io",
+    "clevertap-prod.com",
+    "moengage.com",
+    "newrelic.com",
+    "nr-data.net",
+)
+
+
+class BlockPolicy:
+    """Decides which requests a scraper's BrowserContext may make."""
+
+    def __init__(self, blocked_types=DEFAULT_BLOCKED_TYPES, block_trackers: bool = True, enabled: bool = True):
+        self.blocked_types = set(blocked_types)
+        self.block_trackers = block_trackers
+        self.enabled = enabled
+
+    def block_reason(self, request):
+        """Returns why `request` should be blocked, or None to let it through."""
+        if not self.enabled:
+            return None
+        if request.resource_type in self.blocked_types:
+            return request.resource_type
+        if self.block_trackers:
+            host = urlparse(request.url).hostname or ""
+            if any(host == d or host.endswith("." + d) for d in TRACKER_DOMAINS):
+                return "tracker"
+        return None
+
+
+# Per-platform overrides for sites that need a resource to render the results.
+PLATFORM_POLICIES = {
+    "Amazon": BlockPolicy(),
+    "Flipkart": BlockPolicy(),
+    # Myntra only inserts `img.img-responsive` into a card once its image has loaded,
+    # so images must go through or every card looks incomplete.
+    "Myntra": BlockPolicy(blocked_types={"font", "media"}),
+}
+
+
+def get_policy(platform: str) -> BlockPolicy:
+    """
+    Returns the policy for `platform`. SCRAPER_BLOCK_RESOURCES=0 disables blocking entirely;
+    SCRAPER_BLOCK_TYPES_<PLATFORM>="image,font" replaces that platform's blocked types.
+    """
+    base = PLATFORM_POLICIES.get(platform, BlockPolicy())
+    enabled = os.getenv("SCRAPER_BLOCK_RESOURCES", "1") != "0"
+    override = os.getenv(f"SCRAPER_BLOCK_TYPES_{platform.upper()}")
+    blocked_types = {t.strip() for t in override.split(",") if t.strip()} if override is not None else base.blocked_types
+    return BlockPolicy(blocked_types, base.block_trackers, enabled and base.enabled)
+
+
+class RouteStats:
+    """Requests blocked vs allowed for one scrape, plus bytes downloaded by allowed requests."""
+
+    def __init__(self, platform: str):
+        self.platform = platform
+        self.allowed = 0
+        self.blocked = Counter()
+        self.bytes_allowed = 0
+
+    def record_response(self, response):
+        # content-length is absent for chunked responses; those count as 0 bytes.
+        try:
+            self.bytes_allowed += int(response.headers.get("content-length", 0))
+        except ValueError:
+            pass
+
+    def summary(self) -> str:
+        blocked = ", ".join(f"{kind}={n}" for kind, n in self.blocked.most_common()) or "none"
+        return (f"{self.platform}: {self.allowed} requests allowed ({self.bytes_allowed / 1024:.0f} KB), "
+                f"{sum(self.blocked.values())} blocked ({blocked})")
+
+
+async def install_blocking(context, platform: str, policy: BlockPolicy = None) -> RouteStats:
+    """Routes every request of `context` through `policy` and returns the live counters."""
+    policy = policy or get_policy(platform)
+    stats = RouteStats(platform)
+
+    async def handle(route, request):
+        reason = policy.block_reason(request)
+        if reason:
+            stats.blocked[reason] += 1
+            await route.abort()
+        else:
+            stats.allowed += 1
+            await route.continue_()
+
+    if policy.enabled:
+        await context.route("**/*", handle)
+        context.on("response", stats.record_response)
+    return stats
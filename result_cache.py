@@ -0,0 +1,158 @@
+# result_cache.py
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Seconds a platform's results are served as fresh. Catalogues and prices move slowly,
+# but Amazon/Flipkart deals change more often than Myntra's listings.
+DEFAULT_TTLS = {
+    "Amazon": 30 * 60,
+    "Flipkart": 30 * 60,
+    "Myntra": 2 * 60 * 60,
+}
+
+# How long past its TTL an entry may still be served while a refresh runs in the background.
+DEFAULT_MAX_STALE = 24 * 60 * 60
+
+
+def normalize_query(query: str) -> str:
+    """'  Black   Hoodie!! ' -> 'black hoodie', so trivially different queries share results."""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+class ResultCache:
+    """
+    Scrape results keyed by (normalized query, platform).
+
+    Entries live in an in-memory LRU (bounded by `max_entries`) backed by a SQLite file,
+    so they survive gunicorn worker restarts and are shared between workers.
+    `get` reports whether an entry is still fresh; stale entries within `max_stale` are
+    returned too, so the caller can answer immediately and refresh in the background.
+    """
+
+    def __init__(self, path: str = "scrape_cache.sqlite3", max_entries: int = 256,
+                 ttls: Optional[Dict[str, float]] = None, max_stale: float = DEFAULT_MAX_STALE):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.max_stale = max_stale
+
+        self._memory = OrderedDict()  # (query, platform) -> (stored_at, products_json)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Builds a cache from RESULT_CACHE_PATH, RESULT_CACHE_MAX_ENTRIES and RESULT_CACHE_TTL_<PLATFORM>."""
+        ttls = {}
+        for platform in DEFAULT_TTLS:
+            value = os.getenv(f"RESULT_CACHE_TTL_{platform.upper()}")
+            if value:
+                ttls[platform] = float(value)
+        return cls(
+            path=os.getenv("RESULT_CACHE_PATH", "scrape_cache.sqlite3"),
+            max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+            ttls=ttls,
+        )
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, query: str, platform: str) -> Optional[Tuple[List[Dict], bool]]:
+        """Returns (products, is_fresh), or None on a miss or an entry too stale to serve."""
+        key = (normalize_query(query), platform)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is None:
+                return None
+            self._remember(key, entry)
+
+        stored_at, products_json = entry
+        age = time.time() - stored_at
+        ttl = self.ttls.get(platform, min(self.ttls.values()))
+        if age > ttl + self.max_stale:
+            return None
+        # Decoded per call: callers tag and score the dicts in place.
+        return json.loads(products_json), age <= ttl
+
+    def put(self, query: str, platform: str, products: List[Dict]):
+        key = (normalize_query(query), platform)
+        entry = (time.time(), json.dumps(products, ensure_ascii=False))
+        self._remember(key, entry)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (query, platform, stored_at, products) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], entry[0], entry[1]),
+                )
+                conn.execute("DELETE FROM results WHERE stored_at < ?",
+                             (time.time() - max(self.ttls.values()) - self.max_stale,))
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not persist cache entry for {key}: {e}")
+
+    def begin_refresh(self, query: str, platform: str) -> bool:
+        """Claims the background refresh for a key; False if one is already running."""
+        key = (normalize_query(query), platform)
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, query: str, platform: str):
+        with self._lock:
+            self._refreshing.discard((normalize_query(query), platform))
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    " query TEXT NOT NULL, platform TEXT NOT NULL,"
+                    " stored_at REAL NOT NULL, products TEXT NOT NULL,"
+                    " PRIMARY KEY (query, platform))"
+                )
+        except sqlite3.Error as e:
+            print(f"[WARN] Result cache database unavailable, using memory only: {e}")
+
+    def _load(self, key):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT stored_at, products FROM results WHERE query = ? AND platform = ?", key
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+        return tuple(row) if row else None
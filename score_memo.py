@@ -0,0 +1,149 @@
+# score_memo.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+
+def hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ScoreMemo:
+    """
+    Persistent memo of Gemini visual scores keyed by
+    (user-image hash, product-image hash, model/prompt version).
+
+    Backed by SQLite so every gunicorn worker shares it. Holds at most `max_entries`
+    pairs; the least recently used are evicted first. Hit/miss counters are per process.
+    """
+
+    def __init__(self, path: str = "score_memo.sqlite3", max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_evict = 0
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @classmethod
+    def from_env(cls) -> "ScoreMemo":
+        return cls(
+            path=os.getenv("SCORE_MEMO_PATH", "score_memo.sqlite3"),
+            max_entries=int(os.getenv("SCORE_MEMO_MAX_ENTRIES", "200000")),
+        )
+
+    def get_many(self, user_hash: str, product_hashes: Iterable[str], version: str) -> Dict[str, int]:
+        """Returns {product_hash: score} for every pair already scored under `version`."""
+        product_hashes = list(dict.fromkeys(product_hashes))
+        found = {}
+        try:
+            with self._connect() as conn:
+                # Chunked to stay below SQLite's bound-parameter limit.
+                for i in range(0, len(product_hashes), 500):
+                    batch = product_hashes[i:i + 500]
+                    marks = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT product_hash, score FROM scores WHERE user_hash = ? AND version = ?"
+                        f" AND product_hash IN ({marks})",
+                        (user_hash, version, *batch),
+                    ).fetchall()
+                    found.update(rows)
+                if found:
+                    conn.executemany(
+                        "UPDATE scores SET last_used = ? WHERE user_hash = ? AND product_hash = ? AND version = ?",
+                        [(time.time(), user_hash, h, version) for h in found],
+                    )
+        except sqlite3.Error as e:
+            print(f"[WARN] Score memo lookup failed: {e}")
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(product_hashes) - len(found)
+        return found
+
+    def put_many(self, user_hash: str, scores: Dict[str, int], version: str):
+        if not scores:
+            return
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO scores (user_hash, product_hash, version, score, last_used)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [(user_hash, h, version, score, now) for h, score in scores.items()],
+                )
+        except sqlite3.Error as e:
+            print(f"[WARN] Could not persist visual scores: {e}")
+            return
+
+        with self._lock:
+            self._writes_since_evict += len(scores)
+            should_evict = self._writes_since_evict >= max(1, self.max_entries // 100)
+            if should_evict:
+                self._writes_since_evict = 0
+        if should_evict:
+            self.evict()
+
+    def evict(self):
+        try:
+            with self._connect() as conn:
+                (count,) = conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+                if count > self.max_entries:
+                    conn.execute(
+                        "DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY last_used LIMIT ?)",
+                        (count - self.max_entries,),
+                    )
+        except sqlite3.Error as e:
+            print(f"[WARN] Score memo eviction failed: {e}")
+
+    def stats(self) -> Tuple[int, int]:
+        with self._lock:
+            return self.hits, self.misses
+
+    def summary(self) -> str:
+        hits, misses = self.stats()
+        total = hits + misses
+        rate = 100 * hits / total if total else 0.0
+        return f"score memo: {hits} hits, {misses} misses ({rate:.0f}% hit rate)"
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        try:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS scores ("
+                    " user_hash TEXT NOT NULL, product_hash TEXT NOT NULL, version TEXT NOT NULL,"
+                    " score INTEGER NOT NULL, last_used REAL NOT NULL,"
+                    " PRIMARY KEY (user_hash, product_hash, version))"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+        except sqlite3.Error as e:
+            print(f"[WARN] Score memo database unavailable: {e}")
+
+
+_default_memo = None
+
+
+def get_default_memo() -> ScoreMemo:
+    """Process-wide memo configured by SCORE_MEMO_PATH and SCORE_MEMO_MAX_ENTRIES."""
+    global _default_memo
+    if _default_memo is None:
+        _default_memo = ScoreMemo.from_env()
+    return _default_memo
@@ -1,94 +1,325 @@
 # scrape_myntra.py
 import asyncio
 import json
+import re
+import time
+from typing import AsyncIterator
 from playwright.async_api import async_playwright, TimeoutError
 from bs4 import BeautifulSoup
+import metrics
+from deadline import NO_DEADLINE, Deadline
+from http_fetch import fetch_html
+from products import ProductRecord, save_products
+from resource_blocking import install_blocking
 
-async def scrape_myntra_products(query: str, output_filename: str = "myntra_data.json"):
+BASE_URL = "https://www.myntra.com"
+ITEM_SELECTOR = "li.product-base"
+
+# Options for the BrowserContext this scraper runs in, shared with the browser pool.
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+}
+
+# XHRs that deliver more products while scrolling.
+PRODUCT_LIST_API = re.compile(r"/gateway/v\d+/search")
+
+# The results page ships its first batch of products as JSON in `window.__myx = {...}`.
+EMBEDDED_STATE = re.compile(r"window\.__myx\s*=\s*")
+
+def _search_url(query: str, base_url: str) -> str:
+    return f"{base_url}/{query.replace(' ', '-')}"
+
+async def iter_myntra_products(query: str, context=None, max_items: int = None, quiet_ms: int = 1500,
+                               headless: bool = True, base_url: str = BASE_URL,
+                               fetch_mode: str = "auto", deadline: Deadline = None) -> AsyncIterator[ProductRecord]:
     """
-    Searches for a product on Myntra, scrolls to the bottom to load all results,
-    scrapes all product details, and saves them to a JSON file.
-    This version uses a more reliable page loading strategy.
+    Searches for a product on Myntra and yields product records while scrolling, as each
+    batch of cards finishes rendering.
+    Scrolling stops as soon as `max_items` products are parsed, or once no new products
+    arrive and the product-list requests have been idle for `quiet_ms`.
+    Pass `context` to run inside an existing BrowserContext (e.g. from the browser pool).
+    `fetch_mode` is "auto" (the page's embedded JSON over plain HTTP first, Chromium only
+    if that finds nothing), "http" (never start a browser) or "browser" (always scroll).
+    `base_url` points the scraper at another host, e.g. the benchmark fixture server.
+    With a `deadline`, scrolling stops early enough to yield what has rendered by then.
     """
-    url = f"https://www.myntra.com/{query.replace(' ', '-')}"
-    results = []
+    deadline = deadline or NO_DEADLINE
+    url = _search_url(query, base_url)
 
     print(f"[INFO] Starting scrape for '{query}' on Myntra...")
-    
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=False, slow_mo=50)
-            page = await browser.new_page(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64)")
-            
-            print(f"Navigating to: {url}")
-            
-            await page.goto(url, wait_until="load", timeout=90000)
-
-            try:
-                print("Page loaded. Waiting for the product grid to become visible...")
-                await page.wait_for_selector("ul.results-base", timeout=30000)
-                print("[SUCCESS] Product grid found. Starting to scroll...")
-            except TimeoutError:
-                print("[ERROR] Could not find product grid after page load.")
-                print("   This can happen if there are no search results or the page layout has changed.")
-                await browser.close()
-                return
 
-            last_height = await page.evaluate("document.body.scrollHeight")
-            while True:
-                await page.mouse.wheel(0, 1000)
-                await page.wait_for_timeout(2000)
-                
-                new_height = await page.evaluate("document.body.scrollHeight")
-                if new_height == last_height:
-                    print("Reached the bottom of the page.")
-                    break
-                last_height = new_height
+    if fetch_mode != "browser":
+        results = await fetch_myntra_http(query, base_url, max_items, deadline)
+        if results or fetch_mode == "http":
+            for record in results:
+                yield record
+            return
+        print("[INFO] Myntra HTTP fetch found no products; falling back to Chromium.")
 
-            print("Getting final page content...")
-            html = await page.content()
+    if context is not None:
+        async for record in _scroll_and_collect(context, url, max_items, quiet_ms, base_url, deadline):
+            yield record
+        return
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=headless)
+        try:
+            context = await browser.new_context(**CONTEXT_OPTIONS)
+            async for record in _scroll_and_collect(context, url, max_items, quiet_ms, base_url, deadline):
+                yield record
+        finally:
             await browser.close()
 
-        print("Parsing HTML with BeautifulSoup...")
-        soup = BeautifulSoup(html, "html.parser")
-        items = soup.select("li.product-base")
+async def scrape_myntra_products(query: str, output_filename: str = None, context=None,
+                                 max_items: int = None, quiet_ms: int = 1500, headless: bool = True,
+                                 base_url: str = BASE_URL, fetch_mode: str = "auto", deadline: Deadline = None):
+    """
+    Collects `iter_myntra_products` into a list. Pass `output_filename` to also save the
+    results as JSON (debugging, and the subprocess scraper mode in agent.py).
+    """
+    results = []
+    try:
+        async for record in iter_myntra_products(query, context, max_items, quiet_ms, headless, base_url,
+                                                 fetch_mode, deadline):
+            results.append(record)
+    except Exception as e:
+        print(f"[ERROR] An unexpected error occurred: {e}")
+
+    if results:
+        print(f"\n[SUCCESS] Scraped details for {len(results)} products.")
+    else:
+        print("[WARNING] Scraping complete, but no data was extracted. Please check the selectors.")
+    if output_filename:
+        save_products(results, output_filename)
+
+    return results
+
+def parse_product_item(item, base_url: str = BASE_URL):
+    """Parses one `li.product-base` BeautifulSoup element; returns None if it is incomplete."""
+    title_el = item.select_one("h3.product-brand")
+    name_el = item.select_one("h4.product-product")
+    price_el = item.select_one("span.product-discountedPrice") or item.select_one("div.product-price > span")
+    link_el = item.select_one("a")
+    image_el = item.select_one("img.img-responsive")
+
+    if not (title_el and name_el and price_el and link_el and image_el):
+        return None
+
+    full_title = f"{title_el.get_text(strip=True)} {name_el.get_text(strip=True)}"
+    price = price_el.get_text(strip=True)
+    href = link_el['href']
+    product_url = f"{base_url}/" + href.lstrip('/')
+    image_url = image_el.get('src', 'N/A')
+
+    return {
+        "title": full_title,
+        "price": price,
+        "image_url": image_url,
+        "product_url": product_url
+    }
+
+def parse_items_html(fragments, base_url: str = BASE_URL):
+    """Parses a batch of `li.product-base` outerHTML snapshots into product records."""
+    records = []
+    for fragment in fragments:
+        item = BeautifulSoup(fragment, "html.parser").select_one(ITEM_SELECTOR)
+        record = parse_product_item(item, base_url) if item else None
+        if record:
+            records.append(record)
+    return records
+
+# ------------------------------------------------------------------
+# Browserless fast path: the embedded JSON state, else server-rendered cards
+# ------------------------------------------------------------------
+def parse_state_product(product: dict, base_url: str = BASE_URL):
+    """Converts one product from the embedded search state; returns None if it is incomplete."""
+    brand = product.get("brand")
+    name = product.get("additionalInfo")
+    title = f"{brand} {name}" if brand and name else product.get("productName")
+    price = product.get("price")
+    landing_page = product.get("landingPageUrl")
+    image_url = product.get("searchImage")
+
+    if not (title and price and landing_page and image_url):
+        return None
 
-        if not items:
-            print("[WARNING] No product items found after parsing. The selector 'li.product-base' might be outdated.")
+    record = {
+        "title": title,
+        "price": f"Rs. {price}",
+        "image_url": image_url,
+        "product_url": f"{base_url}/" + landing_page.lstrip('/')
+    }
+    if product.get("rating"):
+        record["rating"] = f"{float(product['rating']):.1f}"
+    return record
+
+def parse_embedded_state(html: str, base_url: str = BASE_URL) -> list:
+    """Parses the products in `window.__myx = {...}`; [] if the page has no such state."""
+    match = EMBEDDED_STATE.search(html)
+    if not match:
+        return []
+    try:
+        state, _ = json.JSONDecoder().raw_decode(html, match.end())
+    except ValueError:
+        print("[WARNING] Myntra embedded state is not valid JSON.")
+        return []
+    products = ((state.get("searchData") or {}).get("results") or {}).get("products") or []
+    records = (parse_state_product(product, base_url) for product in products)
+    return [r for r in records if r]
+
+def parse_results_html(html: str, base_url: str = BASE_URL) -> list:
+    """Products from a fetched results page: embedded JSON first, then any rendered cards."""
+    records = parse_embedded_state(html, base_url)
+    if records:
+        return records
+    items = BeautifulSoup(html, "html.parser").select(ITEM_SELECTOR)
+    records = (parse_product_item(item, base_url) for item in items)
+    return [r for r in records if r]
+
+async def fetch_myntra_http(query: str, base_url: str = BASE_URL, max_items: int = None,
+                            deadline: Deadline = None) -> list:
+    """Fetches and parses the first results page without a browser; [] if that finds nothing."""
+    deadline = deadline or NO_DEADLINE
+    html = await fetch_html(_search_url(query, base_url), CONTEXT_OPTIONS["user_agent"],
+                            timeout=deadline.clamp(15.0))
+    if not html:
+        return []
+    started = time.perf_counter()
+    # Parsed off the event loop: the pool's loop is shared by every search in the worker.
+    with metrics.span("parse_html", "Myntra"):
+        results = await asyncio.to_thread(parse_results_html, html, base_url)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"[TIMING] Parsed {len(results)} products from HTML in {elapsed_ms:.0f} ms (http).")
+    return results[:max_items] if max_items else results
+
+# ------------------------------------------------------------------
+# Scrolling: stop on a target count or once the page has gone quiet
+# ------------------------------------------------------------------
+
+# Returns outerHTML for items from `start` on, plus how many leading items are "ready"
+# (their lazy image has rendered, or they are already scrolled past), so half-rendered
+# cards are re-read on the next round instead of being parsed too early. Scrolling one
+# viewport at a time means a card is only "scrolled past" after it has been on screen.
+_SNAPSHOT_JS = """
+(items, start) => {
+    const fresh = items.slice(start);
+    const isReady = i => i.querySelector('img.img-responsive') || i.getBoundingClientRect().bottom < 0;
+    let ready = 0;
+    while (ready < fresh.length && isReady(fresh[ready])) ready++;
+    return { html: fresh.map(i => i.outerHTML), ready: ready };
+}
+"""
+
+_GROWTH_JS = "seen => document.querySelectorAll('li.product-base').length > seen"
+_AT_BOTTOM_JS = "() => window.innerHeight + window.scrollY >= document.body.scrollHeight - 2"
+
+# True once every not-yet-parsed card that has entered the viewport has rendered its image.
+_VIEWPORT_READY_JS = """
+start => Array.from(document.querySelectorAll('li.product-base')).slice(start)
+    .filter(i => i.getBoundingClientRect().top < window.innerHeight)
+    .every(i => i.querySelector('img.img-responsive'))
+"""
+
+async def _scroll_and_collect(context, url: str, max_items: int = None, quiet_ms: int = 1500,
+                              base_url: str = BASE_URL, deadline: Deadline = NO_DEADLINE) -> AsyncIterator[ProductRecord]:
+    """Opens the results page in `context`, scrolls, and yields products as they are parsed."""
+    route_stats = await install_blocking(context, "Myntra")
+    page = await context.new_page()
+
+    # Product-list XHRs still in flight; while any are pending the page is not "quiet".
+    pending_api_calls = set()
+    def on_request(request):
+        if PRODUCT_LIST_API.search(request.url):
+            pending_api_calls.add(request)
+    page.on("request", on_request)
+    page.on("requestfinished", pending_api_calls.discard)
+    page.on("requestfailed", pending_api_calls.discard)
+
+    yielded = 0
+    # Cards that never rendered their image (or price) before being scrolled past.
+    skipped = 0
+    try:
+        print(f"Navigating to: {url}")
+
+        await page.goto(url, wait_until="load", timeout=deadline.timeout_ms(90))
+
+        try:
+            print("Page loaded. Waiting for the product grid to become visible...")
+            await page.wait_for_selector("ul.results-base", timeout=deadline.timeout_ms(30))
+            print("[SUCCESS] Product grid found. Starting to scroll...")
+        except TimeoutError:
+            print("[ERROR] Could not find product grid after page load.")
+            print("   This can happen if there are no search results or the page layout has changed.")
             return
 
-        for item in items:
-            title_el = item.select_one("h3.product-brand")
-            name_el = item.select_one("h4.product-product")
-            price_el = item.select_one("span.product-discountedPrice") or item.select_one("div.product-price > span")
-            link_el = item.select_one("a")
-            image_el = item.select_one("img.img-responsive")
-
-            if title_el and name_el and price_el and link_el and image_el:
-                full_title = f"{title_el.get_text(strip=True)} {name_el.get_text(strip=True)}"
-                price = price_el.get_text(strip=True)
-                href = link_el['href']
-                product_url = "https://www.myntra.com/" + href.lstrip('/')
-                image_url = image_el.get('src', 'N/A')
-
-                results.append({
-                    "title": full_title,
-                    "price": price,
-                    "image_url": image_url,
-                    "product_url": product_url
-                })
-
-        if results:
-            print(f"\n[SUCCESS] Scraped details for {len(results)} products.")
-            with open(output_filename, "w", encoding="utf-8") as f:
-                json.dump(results, f, indent=4, ensure_ascii=False)
-            print(f"All data has been saved to '{output_filename}'")
-        else:
-            print("[WARNING] Scraping complete, but no data was extracted. Please check the selectors.")
+        parsed_upto = 0
+        while True:
+            snapshot = await page.eval_on_selector_all(ITEM_SELECTOR, _SNAPSHOT_JS, parsed_upto)
+            ready_items = snapshot["html"][:snapshot["ready"]]
+            records = parse_items_html(ready_items, base_url)
+            skipped += len(ready_items) - len(records)
+            for record in records:
+                if max_items and yielded >= max_items:
+                    break
+                yielded += 1
+                yield record
+            parsed_upto += snapshot["ready"]
 
-    except Exception as e:
-        print(f"[ERROR] An unexpected error occurred: {e}")
+            if max_items and yielded >= max_items:
+                print(f"Reached the target of {max_items} products.")
+                return
+
+            # Leave time for one last snapshot of the cards already on the page.
+            if deadline.remaining() < quiet_ms / 1000:
+                print("Out of time for this search; keeping the products loaded so far.")
+                break
+
+            # One viewport per step: cards are never scrolled past before they had a chance to render.
+            await page.evaluate("window.scrollBy(0, window.innerHeight)")
+            if not await page.evaluate(_AT_BOTTOM_JS):
+                # Mid-page: only wait for the cards now on screen to render, then keep going.
+                try:
+                    await page.wait_for_function(_VIEWPORT_READY_JS, arg=parsed_upto, timeout=quiet_ms)
+                except TimeoutError:
+                    pass
+                continue
+
+            total_items = parsed_upto + len(snapshot["html"])
+            if not await _wait_for_more_items(page, total_items, quiet_ms, pending_api_calls):
+                print("No more products loading. Reached the bottom of the page.")
+                break
+
+        # Whatever is still half-rendered at the end gets one last chance.
+        snapshot = await page.eval_on_selector_all(ITEM_SELECTOR, _SNAPSHOT_JS, parsed_upto)
+        records = parse_items_html(snapshot["html"], base_url)
+        skipped += len(snapshot["html"]) - len(records)
+        for record in records:
+            if max_items and yielded >= max_items:
+                break
+            yielded += 1
+            yield record
+    finally:
+        await page.close()
+        if skipped:
+            print(f"[WARN] Myntra: skipped {skipped} product cards with no image or price.")
+        print(f"[INFO] {route_stats.summary()}")
+
+async def _wait_for_more_items(page, seen: int, quiet_ms: int, pending_api_calls: set,
+                               max_quiet_windows: int = 5) -> bool:
+    """
+    Waits until more than `seen` items are in the DOM. Gives up once a full `quiet_ms`
+    window passes with no new items and no product-list request in flight, or after
+    `max_quiet_windows` windows if a request appears to hang.
+    """
+    for _ in range(max_quiet_windows):
+        try:
+            await page.wait_for_function(_GROWTH_JS, arg=seen, timeout=quiet_ms)
+            return True
+        except TimeoutError:
+            if not pending_api_calls:
+                return False
+    return False
 
 if __name__ == "__main__":
     search_query = input("Enter product to search on Myntra: ").strip() or "nike shoes"
-    asyncio.run(scrape_myntra_products(search_query))
\ No newline at end of file
+    asyncio.run(scrape_myntra_products(search_query, output_filename="myntra_data.json"))
@@ -0,0 +1,70 @@
+# single_flight.py
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+def copy_products(products: List[Dict]) -> List[Dict]:
+    """Product dicts are flat, and every caller tags/scores its own copy in place."""
+    return [dict(p) for p in products]
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls: while one caller (the leader) is running the
+    work for a key, anyone else asking for the same key waits for that result instead
+    of starting their own.
+
+    Waiters are tracked with a thread-safe concurrent.futures.Future, so followers can
+    attach from any thread or event loop (pool loop, per-request asyncio.run loops, ...).
+    Each caller gets its own copy of the result, made by `copy` (a product list by default).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]],
+                 copy: Callable[[Any], Any] = copy_products, timeout: Optional[float] = None) -> Any:
+        """
+        Runs `work`, or waits for the identical call already running. A follower waits at
+        most `timeout` seconds (raising asyncio.TimeoutError); the leader runs unbounded.
+        """
+        with self._lock:
+            shared = self._calls.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._calls[key] = concurrent.futures.Future()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            print(f"[INFO] Joining in-flight scrape for {key}.")
+            # shield: a follower timing out must not cancel the leader's shared result.
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(shared)), timeout)
+            return copy(result)
+
+        try:
+            result = await work()
+        except BaseException as e:
+            if not shared.done():
+                # Followers see a plain error even if the leader was cancelled by its own timeout.
+                error = e if isinstance(e, Exception) else RuntimeError(f"shared scrape for {key} was cancelled")
+                shared.set_exception(error)
+            raise
+        else:
+            if not shared.done():
+                shared.set_result(copy(result))
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is shared:
+                    del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,52 @@
+# tests/test_deadline.py
+"""The end-to-end request budget."""
+import math
+
+import pytest
+
+import deadline as deadline_module
+from deadline import NO_DEADLINE, Deadline
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(deadline_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_no_budget_never_expires():
+    assert NO_DEADLINE.remaining() == math.inf
+    assert NO_DEADLINE.timeout() is None
+    assert not NO_DEADLINE.expired()
+    assert NO_DEADLINE.clamp(30) == 30
+    assert NO_DEADLINE.reserve(10) is NO_DEADLINE
+
+
+def test_budget_counts_down_and_expires(clock):
+    deadline = Deadline(45)
+    assert deadline.remaining() == 45 and deadline.timeout() == 45
+    clock[0] += 40
+    assert deadline.remaining() == 5 and not deadline.expired()
+    clock[0] += 10
+    assert deadline.remaining() == 0 and deadline.expired()
+
+
+def test_clamp_and_timeout_ms(clock):
+    deadline = Deadline(10)
+    assert deadline.clamp(30) == 10
+    assert deadline.clamp(5) == 5
+    assert deadline.clamp(30, reserve=4) == 6
+    assert deadline.clamp(30, reserve=20) == 0
+    assert deadline.timeout_ms(30) == 10_000
+    # Playwright reads 0 as "no timeout", so an exhausted budget still gives 1 ms.
+    assert deadline.timeout_ms(30, reserve=20) == 1
+
+
+def test_reserve_ends_earlier(clock):
+    deadline = Deadline(45)
+    scraping = deadline.reserve(15)
+    assert scraping.remaining() == 30
+    clock[0] += 31
+    assert scraping.expired() and not deadline.expired()
+    assert Deadline(5).reserve(15).expired()
@@ -0,0 +1,72 @@
+# tests/test_dedup.py
+"""Cross-platform dedup: variants stay apart, duplicates fold into offers."""
+import math
+
+import numpy as np
+
+from dedup import Deduper, dedupe, merge_duplicates, variant_tokens
+from products import Product
+
+BLACK = np.array([1.0] + [0.0] * 63)
+WHITE = np.array([0.0] * 63 + [1.0])
+
+
+def _product(title, source, price_rupees, image_hash=None, histogram=None, visual_score=None):
+    product = Product(title, price_rupees * 100, math.nan, "", "", source, visual_score=visual_score)
+    product.image_hash = image_hash
+    product.colour_histogram = histogram
+    return product
+
+
+def test_variant_tokens():
+    assert variant_tokens("Puma Tee (Navy, XL)") == {"navy", "xl"}
+    assert variant_tokens("Bata Loafers UK 8 Gray") == {"grey", "size 8"}
+    assert variant_tokens("Roadster Hoodie") == frozenset()
+
+
+def test_same_listing_on_two_platforms_merges_into_offers():
+    amazon = _product("Nike Revolution 6 Running Shoes (Black)", "Amazon", 3299)
+    flipkart = _product("NIKE Revolution 6 Running Shoes - Black", "Flipkart", 2999)
+    assert dedupe([amazon, flipkart]) == [0]
+    assert [o.source for o in amazon.offers] == ["Flipkart", "Amazon"]  # cheapest first
+    assert [o.source for o in amazon.other_offers()] == ["Flipkart"]
+
+
+def test_colour_and_size_variants_stay_separate():
+    listings = [
+        _product("Puma Essential Logo Tee Black M", "Amazon", 799),
+        _product("Puma Essential Logo Tee White M", "Amazon", 799),
+        _product("Puma Essential Logo Tee Black XL", "Flipkart", 799),
+    ]
+    assert dedupe(listings) == [0, 1, 2]
+
+
+def test_colour_histogram_separates_identical_titles():
+    black = _product("Roadster Men Hoodie", "Myntra", 999, image_hash=0xF0F0, histogram=BLACK)
+    white = _product("Roadster Men Hoodie", "Flipkart", 999, image_hash=0xF0F0, histogram=WHITE)
+    assert dedupe([black, white]) == [0, 1]
+
+
+def test_near_identical_images_merge_reworded_titles():
+    a = _product("Campus Sneakers Men Casual Shoes", "Amazon", 1299, image_hash=0xDEADBEEF, histogram=BLACK)
+    b = _product("Casual Sneakers for Men by Campus", "Myntra", 1199, image_hash=0xDEADBEEF ^ 0b11, histogram=BLACK)
+    assert dedupe([a, b]) == [0]
+    far = _product("Casual Sneakers for Men by Campus", "Myntra", 1199, image_hash=~0xDEADBEEF & (2**64 - 1),
+                   histogram=BLACK)
+    assert dedupe([a, far]) == [0, 1]
+
+
+def test_a_deduper_carries_products_across_batches():
+    deduper = Deduper()
+    assert dedupe([_product("HRX Slim Fit Jeans Blue", "Amazon", 1499)], deduper=deduper) == [0]
+    later = [_product("HRX Slim-Fit Jeans (Blue)", "Myntra", 1399), _product("Levis 511 Jeans Blue", "Myntra", 2999)]
+    assert dedupe(later, deduper=deduper) == [1]
+    assert [o.source for o in deduper.representatives[0].offers] == ["Myntra", "Amazon"]
+
+
+def test_merge_duplicates_keeps_the_best_scored_listing():
+    low = _product("Nike Revolution 6 Running Shoes Black", "Amazon", 3299, visual_score=6)
+    high = _product("Nike Revolution 6 Running Shoes (Black)", "Flipkart", 3499, visual_score=9)
+    merged = merge_duplicates([low, high])
+    assert merged == [high]
+    assert {o.source for o in high.offers} == {"Amazon", "Flipkart"}
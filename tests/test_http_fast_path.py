@@ -0,0 +1,92 @@
+# tests/test_http_fast_path.py
+"""The browserless fast path against pages served by the offline fixture server."""
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("bs4")
+
+import http_fetch
+from benchmarks.fixture_server import FixtureServer
+
+CATALOG_SIZE = 24
+
+
+@pytest.fixture(scope="module")
+def server():
+    with FixtureServer(catalog_size=CATALOG_SIZE) as fixture_server:
+        yield fixture_server
+
+
+def test_flipkart_http_parses_fixture_page(server):
+    pytest.importorskip("playwright")  # imported by the scraper modules
+    import flipkart_scraper
+
+    products = asyncio.run(flipkart_scraper.fetch_flipkart_http("running shoes", server.platform_urls()["Flipkart"]))
+    assert len(products) == CATALOG_SIZE
+    for product in products:
+        assert product["name"] and product["price"].startswith("₹")
+        assert product["image_url"].startswith(server.base_url)
+        assert product["product_url"].startswith(server.platform_urls()["Flipkart"])
+
+
+def test_myntra_http_parses_embedded_state(server):
+    pytest.importorskip("playwright")  # imported by the scraper modules
+    import scrape_myntra
+
+    products = asyncio.run(scrape_myntra.fetch_myntra_http("running shoes", server.platform_urls()["Myntra"]))
+    assert len(products) == CATALOG_SIZE
+    for product in products:
+        assert product["title"] and product["price"].startswith("Rs.")
+        assert product["image_url"].startswith(server.base_url)
+        assert product["product_url"].startswith(server.platform_urls()["Myntra"])
+
+
+def test_orchestrator_caps_myntra_products(server, monkeypatch):
+    pytest.importorskip("playwright")  # imported by the scraper modules
+    import orchestrator
+
+    monkeypatch.setitem(orchestrator.PLATFORM_BASE_URLS, "Myntra", server.platform_urls()["Myntra"])
+    monkeypatch.setitem(orchestrator.PLATFORM_FETCH_MODES, "Myntra", "http")
+    monkeypatch.setitem(orchestrator.PLATFORM_MAX_ITEMS, "Myntra", 5)
+    products = []
+    asyncio.run(orchestrator._scrape("Myntra", "running shoes", products))
+    assert len(products) == 5
+
+
+def test_fetch_html_treats_unknown_charset_as_a_miss(monkeypatch):
+    def bogus_charset(*args):
+        raise LookupError("unknown encoding: x-bogus")
+
+    monkeypatch.setattr(http_fetch, "_get_html", bogus_charset)
+    assert asyncio.run(http_fetch.fetch_html("http://127.0.0.1:9/", "test")) is None
+
+
+class _GarbageGzipHandler(BaseHTTPRequestHandler):
+    """Claims a gzip-encoded body but sends bytes that are not gzip."""
+
+    def do_GET(self):
+        body = b"\x1f\x8b\x08\x00not really gzip"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_fetch_html_treats_a_corrupt_gzip_body_as_a_miss():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _GarbageGzipHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+        assert asyncio.run(http_fetch.fetch_html(url, "test")) is None
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
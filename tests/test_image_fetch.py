@@ -0,0 +1,13 @@
+# tests/test_image_fetch.py
+"""Concurrent image downloads: budget handling."""
+import image_fetch
+
+
+def test_no_budget_left_fetches_nothing(monkeypatch):
+    def no_executor(*args, **kwargs):
+        raise AssertionError("no thread pool should be started without a budget")
+
+    monkeypatch.setattr(image_fetch, "ThreadPoolExecutor", no_executor)
+    images, stats = image_fetch.fetch_images(["http://127.0.0.1:9/a.jpg", "http://127.0.0.1:9/b.jpg"], deadline=0)
+    assert images == [None, None]
+    assert stats.timed_out == 2 and stats.fetched == 0
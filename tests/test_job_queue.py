@@ -0,0 +1,57 @@
+# tests/test_job_queue.py
+"""Webhook admission control: worker limit, per-user limit, bounded queue."""
+import threading
+import time
+
+import pytest
+
+from job_queue import QUEUED, REJECTED_FULL, REJECTED_USER_LIMIT, STARTED, JobQueue
+
+
+@pytest.fixture
+def gate():
+    """Jobs block on this until the test releases them."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def _wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_admission_positions_and_limits(gate):
+    jobs = JobQueue(num_workers=1, max_queued=2, per_user_limit=1)
+
+    first = jobs.submit("alice", gate.wait)
+    assert first.status == STARTED and first.accepted
+    _wait_until(lambda: jobs.stats()["running"] == 1)
+
+    second, third = jobs.submit("bob", gate.wait), jobs.submit("carol", gate.wait)
+    assert (second.status, second.position) == (QUEUED, 1)
+    assert (third.status, third.position) == (QUEUED, 2)
+
+    assert jobs.submit("alice", gate.wait).status == REJECTED_USER_LIMIT
+    full = jobs.submit("dave", gate.wait)
+    assert full.status == REJECTED_FULL and not full.accepted
+
+    gate.set()
+    _wait_until(lambda: jobs.stats()["completed"] == 3)
+    stats = jobs.stats()
+    assert (stats["rejected_user_limit"], stats["rejected_full"], stats["queue_depth"]) == (1, 1, 0)
+    # A user's slot is freed once their job finishes.
+    assert jobs.submit("alice", lambda: None).status == STARTED
+
+
+def test_a_failing_job_frees_its_slot():
+    jobs = JobQueue(num_workers=1, per_user_limit=1)
+
+    def boom():
+        raise RuntimeError("boom")
+
+    jobs.submit("alice", boom)
+    _wait_until(lambda: jobs.stats()["failed"] == 1)
+    assert jobs.submit("alice", lambda: None).accepted
@@ -0,0 +1,82 @@
+# tests/test_products.py
+"""The normalized Product model and its columnar batch."""
+import math
+
+import pytest
+
+from products import Product, ProductBatch, format_price, from_records, parse_price_paise, parse_rating
+
+
+def _product(title, visual_score=None, local_score=None, price_paise=100_00):
+    return Product(title, price_paise, math.nan, "", "", "Amazon",
+                   local_score=local_score, visual_score=visual_score)
+
+
+def test_gemini_scores_rank_above_local_fallbacks():
+    gemini = _product("gemini", visual_score=6)
+    local = _product("local", local_score=9.4)
+    unscored = _product("unscored")
+    ranked = sorted([local, unscored, gemini], key=Product.match_key, reverse=True)
+    assert [p.title for p in ranked] == ["gemini", "local", "unscored"]
+    assert gemini.match_text == "6/10"
+    assert local.match_text == "~9.4/10 (local)"
+    assert unscored.match_text == "N/A"
+
+
+@pytest.mark.parametrize("text, paise", [
+    ("Rs.1,299", 129900),
+    ("Rs. 1,299.50", 129950),
+    ("₹999", 99900),
+    (499, 49900),
+    ("", None),
+    (None, None),
+    ("Currently unavailable", None),
+])
+def test_parse_price_paise(text, paise):
+    assert parse_price_paise(text) == paise
+
+
+@pytest.mark.parametrize("text, rating", [
+    ("4.2 out of 5 stars", 4.2),
+    ("4.1★", 4.1),
+    (3, 3.0),
+])
+def test_parse_rating(text, rating):
+    assert parse_rating(text) == rating
+
+
+@pytest.mark.parametrize("text", ["", None, "No ratings", "12,345 ratings"])
+def test_parse_rating_unknown(text):
+    assert math.isnan(parse_rating(text))
+
+
+def test_format_price():
+    assert format_price(129900) == "₹1,299"
+    assert format_price(129950) == "₹1,299.50"
+    assert format_price(None) == "N/A"
+
+
+def test_from_records_reads_every_platforms_fields():
+    flipkart, myntra = from_records([
+        {"name": " Puma Sneakers ", "price": "₹1,999", "rating": "4.3", "image_url": "f.jpg", "source": "Flipkart"},
+        {"title": "Roadster Hoodie", "price": "Rs. 899", "image": "m.jpg", "product_url": "https://m/1"},
+    ], source=None)
+    assert (flipkart.title, flipkart.price_paise, flipkart.rating, flipkart.source) == ("Puma Sneakers", 199900, 4.3, "Flipkart")
+    assert (myntra.price_paise, myntra.image_url, myntra.rating_text) == (89900, "m.jpg", "N/A")
+
+
+def test_top_sorts_unknown_values_last():
+    cheap = _product("cheap", price_paise=500_00, visual_score=4)
+    dear = _product("dear", price_paise=2_000_00, visual_score=9)
+    no_price = _product("no price", price_paise=None, visual_score=None)
+    batch = ProductBatch([dear, no_price, cheap])
+    assert [p.title for p in batch.top(3, "price_paise", descending=False)] == ["cheap", "dear", "no price"]
+    assert [p.title for p in batch.top(2, "visual_score")] == ["dear", "cheap"]
+    assert [p.title for p in batch.top(3, "visual_score")][-1] == "no price"
+
+
+def test_batch_masks_by_source():
+    batch = ProductBatch([_product("a"), Product("b", None, math.nan, "", "", "Myntra")])
+    assert list(batch.from_source("Myntra")) == [False, True]
+    assert not batch.from_source("Flipkart").any()
+    assert list(batch.has_price) == [True, False]
@@ -0,0 +1,65 @@
+# tests/test_ranking.py
+"""Local value ranking: weighted scores, the Pareto front and the write-up."""
+import math
+
+import numpy as np
+
+from products import Product, ProductBatch
+from ranking import parse_weights, pareto_front, rank_products, recommend, value_scores
+
+WEIGHTS = {"visual": 0.5, "price": 0.3, "rating": 0.2}
+TRUST = {"Amazon": 1.0, "Flipkart": 1.0, "Myntra": 1.0}
+
+
+def _product(title, price_rupees, rating, visual_score, source="Amazon"):
+    return Product(title, None if price_rupees is None else price_rupees * 100, rating, "", "", source,
+                   visual_score=visual_score)
+
+
+def test_parse_weights_keeps_defaults_and_skips_bad_entries():
+    assert parse_weights("visual=0.6, price=x,rating", WEIGHTS) == {"visual": 0.6, "price": 0.3, "rating": 0.2}
+
+
+def test_pareto_front_drops_dominated_products():
+    best_match = _product("best match", 2000, 4.0, 9)
+    cheapest = _product("cheapest", 500, 3.5, 6)
+    dominated = _product("dominated", 2500, 3.0, 5)  # beaten by "best match" on everything
+    assert list(pareto_front(ProductBatch([best_match, cheapest, dominated]))) == [True, True, False]
+    assert len(pareto_front(ProductBatch([]))) == 0
+
+
+def test_missing_signals_are_skipped_not_zeroed():
+    rated = _product("rated", 1000, 4.0, 8)
+    unrated = _product("unrated", 1000, math.nan, 8, source="Myntra")
+    scores = value_scores(ProductBatch([rated, unrated]), WEIGHTS, TRUST)
+    # Same price (price signal 1.0) and visual; "unrated" is scored on those two alone.
+    assert np.isclose(scores[1], (0.5 * 0.8 + 0.3 * 1.0) / 0.8)
+    assert np.isclose(scores[0], 0.5 * 0.8 + 0.3 * 1.0 + 0.2 * 0.8)
+
+
+def test_platform_trust_scales_the_score():
+    amazon = _product("amazon", 1000, 4.0, 8)
+    myntra = _product("myntra", 1000, 4.0, 8, source="Myntra")
+    ranked = rank_products([myntra, amazon], "weighted", WEIGHTS, {"Myntra": 0.5})
+    assert [p.title for p, _ in ranked] == ["amazon", "myntra"]
+    assert np.isclose(ranked[1][1], ranked[0][1] * 0.5)
+
+
+def test_pareto_strategy_puts_the_front_first():
+    best_match = _product("best match", 2000, 4.0, 9)
+    near_copy = _product("near copy", 2100, 3.9, 8.9)  # dominated by "best match"
+    cheapest = _product("cheapest", 500, 3.5, 5)
+    products = [near_copy, best_match, cheapest]
+    weights = {"visual": 1.0, "price": 0.0, "rating": 0.0}
+    weighted = [p.title for p, _ in rank_products(products, "weighted", weights, TRUST)]
+    assert weighted == ["best match", "near copy", "cheapest"]
+    pareto = [p.title for p, _ in rank_products(products, "pareto", weights, TRUST)]
+    assert pareto == ["best match", "cheapest", "near copy"]
+
+
+def test_recommend_names_the_best_value():
+    text = recommend([_product("Puma Sneakers", 1999, 4.3, 9), _product("Bata Sneakers", 999, 3.9, 6)],
+                     "sneakers", "weighted")
+    assert text.startswith('**Top Recommendation for "sneakers"**')
+    assert "Other Good Options" in text
+    assert recommend([], "sneakers").startswith("Could not determine")
@@ -0,0 +1,80 @@
+# tests/test_result_cache.py
+"""Scrape-result caching: fresh, stale-while-revalidate and expired entries."""
+import asyncio
+import time
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache, normalize_query
+
+PRODUCTS = [{"title": "Black Hoodie", "price": "₹999"}]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return ResultCache(path=str(tmp_path / "cache.sqlite3"), ttls={"Amazon": 60}, max_stale=600)
+
+
+def test_normalize_query():
+    assert normalize_query("  Black   Hoodie!! ") == "black hoodie"
+
+
+def test_fresh_then_stale_then_expired(cache, clock):
+    assert cache.get("black hoodie", "Amazon") is None
+    cache.put("Black Hoodie!", "Amazon", PRODUCTS)
+
+    assert cache.get("black hoodie", "Amazon") == (PRODUCTS, True)
+    clock[0] += 61
+    assert cache.get("black hoodie", "Amazon") == (PRODUCTS, False)
+    clock[0] += 600
+    assert cache.get("black hoodie", "Amazon") is None
+
+
+def test_entries_survive_a_new_process(tmp_path, cache):
+    cache.put("black hoodie", "Amazon", PRODUCTS)
+    reopened = ResultCache(path=cache.path, ttls={"Amazon": 60})
+    assert reopened.get("black hoodie", "Amazon") == (PRODUCTS, True)
+
+
+def test_memory_lru_is_bounded(tmp_path, clock):
+    cache = ResultCache(path=str(tmp_path / "cache.sqlite3"), max_entries=2)
+    for query in ("a", "b", "c"):
+        cache.put(query, "Amazon", PRODUCTS)
+    assert len(cache._memory) == 2
+    assert cache.get("a", "Amazon") == (PRODUCTS, True)  # still on disk
+
+
+def test_only_one_refresh_per_key(cache):
+    assert cache.begin_refresh("black hoodie", "Amazon")
+    assert not cache.begin_refresh("Black Hoodie", "Amazon")
+    cache.end_refresh("black hoodie", "Amazon")
+    assert cache.begin_refresh("black hoodie", "Amazon")
+
+
+def test_poolless_refreshes_are_awaited_at_exit():
+    pytest.importorskip("playwright")  # imported by the scraper modules
+    import orchestrator
+
+    finished = []
+
+    async def refresh(delay):
+        await asyncio.sleep(delay)
+        finished.append(delay)
+
+    orchestrator._start_refresh(refresh(0.05))
+    assert orchestrator.wait_for_refreshes(5)
+    assert finished == [0.05]
+
+    orchestrator._start_refresh(refresh(0.5))
+    started = time.monotonic()
+    assert not orchestrator.wait_for_refreshes(0.05)
+    assert time.monotonic() - started < 0.4
+    assert orchestrator.wait_for_refreshes(5)
@@ -0,0 +1,39 @@
+# tests/test_score_memo.py
+"""Memoized Gemini scores keyed by image content hashes."""
+import itertools
+
+import pytest
+
+import score_memo
+from score_memo import ScoreMemo, hash_file
+
+
+@pytest.fixture
+def memo(tmp_path, monkeypatch):
+    ticks = itertools.count(1)
+    monkeypatch.setattr(score_memo.time, "time", lambda: float(next(ticks)))
+    return ScoreMemo(path=str(tmp_path / "memo.sqlite3"), max_entries=3)
+
+
+def test_scores_are_keyed_by_user_image_and_version(memo):
+    memo.put_many("user", {"p1": 7, "p2": 3}, "v1")
+    assert memo.get_many("user", ["p1", "p2", "p3"], "v1") == {"p1": 7, "p2": 3}
+    assert memo.get_many("user", ["p1"], "v2") == {}
+    assert memo.get_many("other user", ["p1"], "v1") == {}
+    assert memo.stats() == (2, 3)
+
+
+def test_least_recently_used_pairs_are_evicted(memo):
+    for product_hash in ("p1", "p2", "p3"):
+        memo.put_many("user", {product_hash: 5}, "v1")
+    memo.get_many("user", ["p1"], "v1")  # p1 is now more recent than p2
+    memo.put_many("user", {"p4": 5}, "v1")
+    assert set(memo.get_many("user", ["p1", "p2", "p3", "p4"], "v1")) == {"p1", "p3", "p4"}
+
+
+def test_hash_file_is_content_based(tmp_path):
+    a, b, c = tmp_path / "a.jpg", tmp_path / "b.jpg", tmp_path / "c.jpg"
+    a.write_bytes(b"same bytes")
+    b.write_bytes(b"same bytes")
+    c.write_bytes(b"other bytes")
+    assert hash_file(str(a)) == hash_file(str(b)) != hash_file(str(c))
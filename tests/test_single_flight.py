@@ -0,0 +1,79 @@
+# tests/test_single_flight.py
+"""Coalescing identical in-flight scrapes."""
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+PRODUCTS = [{"title": "Black Hoodie", "price": "₹999"}]
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return PRODUCTS
+
+    async def search():
+        return await asyncio.gather(*(flight.do("hoodie", work) for _ in range(3)))
+
+    results = asyncio.run(search())
+    assert len(calls) == 1
+    assert (flight.leaders, flight.followers, flight.in_flight()) == (1, 2, 0)
+    assert all(result == PRODUCTS for result in results)
+    # Every caller gets its own copy to tag and score.
+    assert len({id(product) for result in results for product in result}) == 3
+    results[1][0]["source"] = "Amazon"
+    assert "source" not in results[2][0]
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return PRODUCTS
+
+    async def search():
+        await asyncio.gather(flight.do("hoodie", work), flight.do("jeans", work))
+
+    asyncio.run(search())
+    assert (flight.leaders, flight.followers) == (2, 0)
+
+
+def test_a_follower_timeout_leaves_the_leader_running():
+    flight = SingleFlight()
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return PRODUCTS
+
+    async def search():
+        leader = asyncio.ensure_future(flight.do("hoodie", slow))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do("hoodie", slow, timeout=0.02)
+        return await leader
+
+    assert asyncio.run(search()) == PRODUCTS
+    assert flight.in_flight() == 0
+
+
+def test_followers_see_the_leaders_error():
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("blocked")
+
+    async def search():
+        return await asyncio.gather(flight.do("hoodie", failing), flight.do("hoodie", failing),
+                                    return_exceptions=True)
+
+    leader_error, follower_error = asyncio.run(search())
+    assert isinstance(leader_error, RuntimeError) and isinstance(follower_error, RuntimeError)
+    assert flight.in_flight() == 0
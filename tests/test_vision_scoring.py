@@ -0,0 +1,34 @@
+# tests/test_vision_scoring.py
+"""Parsing Gemini's JSON score replies."""
+import pytest
+
+from vision_scoring import parse_scores
+
+IDS = ["p1", "p2", "p3"]
+
+
+def test_parse_scores_reads_the_json_reply():
+    text = '{"scores": [{"id": "p1", "score": 8}, {"id": "p2", "score": 3.6}, {"id": " p3 ", "score": 0}]}'
+    assert parse_scores(text, IDS) == {"p1": 8, "p2": 4, "p3": 0}
+
+
+def test_parse_scores_ignores_prose_around_the_json():
+    text = 'Sure! Here you go:\n```json\n{"scores": [{"id": "p2", "score": 7}]}\n```'
+    assert parse_scores(text, IDS) == {"p2": 7}
+
+
+def test_parse_scores_drops_entries_it_cannot_trust():
+    text = ('{"scores": ['
+            '{"id": "p9", "score": 9},'        # not in this chunk
+            '{"id": "p1", "score": 6},'
+            '{"id": "p1", "score": 10},'       # duplicate: the first one wins
+            '{"id": "p2", "score": 11},'       # out of range
+            '{"id": "p3", "score": "high"}'    # not a number
+            ']}')
+    assert parse_scores(text, IDS) == {"p1": 6}
+
+
+def test_parse_scores_without_json_raises():
+    with pytest.raises(ValueError):
+        parse_scores("I cannot compare these images.", IDS)
+    assert parse_scores('{"answer": "none"}', IDS) == {}
@@ -0,0 +1,163 @@
+# vision_scoring.py
+import contextvars
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+
+import metrics
+from deadline import NO_DEADLINE, Deadline
+
+DEFAULT_CHUNK_SIZE = 10
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_MAX_ATTEMPTS = 3
+
+# No Gemini round is started with less than this left in the deadline; a call that
+# can't return in time only delays the local fallback.
+MIN_CALL_SECONDS = 3.0
+
+# Bump whenever PROMPT_HEADER or the scoring scale changes, so memoized scores from the
+# old prompt are not reused (see score_memo.py).
+PROMPT_VERSION = "chunked-json-v1"
+
+PROMPT_HEADER = [
+    "You are an AI expert in visual similarity.",
+    "The first image is the user's reference image.",
+    "Each following image is an e-commerce product, preceded by its product ID.",
+    "For each product image, compare it to the reference image and give a similarity score "
+    "from 0 (completely different) to 10 (nearly identical).",
+    'Respond with JSON only, in the form {"scores": [{"id": "<product ID>", "score": <0-10>}]}, '
+    "with exactly one entry for every product ID shown.",
+]
+
+
+class ScoringStats:
+    def __init__(self):
+        self.chunks = 0
+        self.calls = 0
+        self.retried_chunks = 0
+        self.failed_ids = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f"{self.chunks} chunks, {self.calls} Gemini calls ({self.retried_chunks} retries), "
+                f"{self.failed_ids} products unscored, {self.elapsed:.1f}s")
+
+
+def _chunk(items: Sequence, size: int) -> List[List]:
+    return [list(items[i:i + size]) for i in range(0, len(items), size)]
+
+
+def parse_scores(text: str, expected_ids: Sequence[str]) -> Dict[str, int]:
+    """
+    Parses the model's JSON reply and keeps only entries whose ID belongs to this chunk and
+    whose score is a number in 0..10. Anything else (unknown or duplicate IDs, prose around
+    the JSON) is ignored rather than guessed at.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1:
+        raise ValueError("no JSON object in response")
+    payload = json.loads(text[start:end + 1])
+
+    expected = set(expected_ids)
+    scores = {}
+    for entry in payload.get("scores", []):
+        product_id = str(entry.get("id", "")).strip()
+        score = entry.get("score")
+        if product_id in expected and product_id not in scores and isinstance(score, (int, float)) \
+                and 0 <= score <= 10:
+            scores[product_id] = int(round(score))
+    return scores
+
+
+def _score_chunk(model, user_image: Image.Image, chunk: List[Tuple[str, Image.Image]],
+                 timeout: Optional[float] = None) -> Dict[str, int]:
+    prompt_parts = [*PROMPT_HEADER, "--- USER IMAGE ---", user_image, "--- PRODUCT IMAGES ---"]
+    for product_id, image in chunk:
+        prompt_parts += [f"Product ID: {product_id}", image]
+    options = {"request_options": {"timeout": timeout}} if timeout else {}
+    try:
+        with metrics.span("gemini_call", "vision"):
+            response = model.generate_content(
+                prompt_parts,
+                generation_config={"response_mime_type": "application/json"},
+                **options,
+            )
+        scores = parse_scores(response.text, [product_id for product_id, _ in chunk])
+    except Exception:
+        metrics.GEMINI_CALLS.inc(purpose="vision", outcome="error")
+        raise
+    metrics.GEMINI_CALLS.inc(purpose="vision", outcome="ok")
+    metrics.record_gemini_usage(response, "vision")
+    return scores
+
+
+def score_images(model, user_image: Image.Image, candidates: Sequence[Tuple[str, Image.Image]],
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_workers: int = DEFAULT_MAX_WORKERS,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 deadline: Deadline = None) -> Tuple[Dict[str, int], ScoringStats]:
+    """
+    Scores (product_id, image) candidates against the user image in fixed-size chunks,
+    up to `max_workers` Gemini calls at a time. After each round only the products that
+    failed or came back without a valid score are re-chunked and resent, for at most
+    `max_attempts` rounds. Returns {product_id: score} and stats.
+    With a `deadline`, each round is split into smaller chunks across every worker so it
+    returns sooner, no round starts without MIN_CALL_SECONDS left, and calls still
+    running when it passes are abandoned, leaving their products unscored.
+    """
+    deadline = deadline or NO_DEADLINE
+    stats = ScoringStats()
+    started = time.monotonic()
+    scores: Dict[str, int] = {}
+    pending = list(candidates)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini-score")
+    try:
+        for attempt in range(1, max_attempts + 1):
+            if not pending:
+                break
+            if deadline.remaining() < MIN_CALL_SECONDS:
+                print(f"[WARN] Out of time for Gemini; {len(pending)} products left unscored.")
+                break
+            size = chunk_size
+            if deadline.expires_at is not None:
+                size = min(chunk_size, math.ceil(len(pending) / max_workers))
+            chunks = _chunk(pending, size)
+            stats.calls += len(chunks)
+            if attempt == 1:
+                stats.chunks = len(chunks)
+            else:
+                stats.retried_chunks += len(chunks)
+                print(f"[INFO] Retrying {len(pending)} unscored products in {len(chunks)} chunk(s) (attempt {attempt}).")
+
+            # Each chunk runs in a copy of this thread's context so its spans join the request trace.
+            futures = [executor.submit(contextvars.copy_context().run, _score_chunk, model, user_image, chunk,
+                                       deadline.timeout())
+                       for chunk in chunks]
+            _, late = wait(futures, timeout=deadline.timeout())
+            retry = []
+            for chunk, future in zip(chunks, futures):
+                if future in late:
+                    future.cancel()
+                    retry += chunk
+                    continue
+                try:
+                    chunk_scores = future.result()
+                except Exception as e:
+                    print(f"[WARN] Gemini chunk of {len(chunk)} failed: {e}")
+                    chunk_scores = {}
+                scores.update(chunk_scores)
+                retry += [(pid, img) for pid, img in chunk if pid not in chunk_scores]
+            pending = retry
+            if late:
+                print(f"[WARN] {len(late)} Gemini call(s) still running at the deadline; using the scores so far.")
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    stats.failed_ids = len(pending)
+    stats.elapsed = time.monotonic() - started
+    return scores, stats
@@ -0,0 +1,86 @@
+# visual_prefilter.py
+from typing import Dict, List, Sequence
+
+import numpy as np
+from PIL import Image
+
+# Available features and how much each contributes to the combined local score.
+#   dhash      - 64-bit difference hash: overall shape/layout, robust to recompression
+#   histogram  - 4x4x4 RGB colour histogram: "is it the same colour"
+#   pixels     - 16x16 grayscale thumbnail: coarse appearance
+FEATURES = ("dhash", "histogram", "pixels")
+DEFAULT_WEIGHTS = {"dhash": 0.3, "histogram": 0.4, "pixels": 0.3}
+
+_HASH_SIZE = 8
+_HIST_BINS = 4
+_PIXEL_SIDE = 16
+
+
+def _dhash_bits(image: Image.Image) -> np.ndarray:
+    gray = np.asarray(image.convert("L").resize((_HASH_SIZE + 1, _HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+    return (gray[:, 1:] > gray[:, :-1]).ravel()
+
+
+def _histogram(image: Image.Image) -> np.ndarray:
+    rgb = np.asarray(image.convert("RGB").resize((64, 64), Image.BILINEAR))
+    quantized = (rgb // (256 // _HIST_BINS)).reshape(-1, 3).astype(np.int32)
+    codes = (quantized[:, 0] * _HIST_BINS + quantized[:, 1]) * _HIST_BINS + quantized[:, 2]
+    hist = np.bincount(codes, minlength=_HIST_BINS ** 3).astype(np.float32)
+    return hist / hist.sum()
+
+
+def _pixels(image: Image.Image) -> np.ndarray:
+    gray = np.asarray(image.convert("L").resize((_PIXEL_SIDE, _PIXEL_SIDE), Image.BILINEAR), dtype=np.float32).ravel()
+    gray -= gray.mean()
+    norm = np.linalg.norm(gray)
+    return gray / norm if norm else gray
+
+
+_EXTRACTORS = {"dhash": _dhash_bits, "histogram": _histogram, "pixels": _pixels}
+
+
+def extract_features(images: Sequence[Image.Image], features: Sequence[str] = FEATURES) -> Dict[str, np.ndarray]:
+    """Returns {feature: (len(images), dim) matrix}, one row per image."""
+    return {name: np.stack([_EXTRACTORS[name](img) for img in images]) for name in features}
+
+
+def score_candidates(user_image: Image.Image, images: Sequence[Image.Image],
+                     features: Sequence[str] = FEATURES, weights: Dict[str, float] = None) -> np.ndarray:
+    """
+    Similarity of every candidate image to the user image in [0, 1], computed with one
+    vectorized comparison per feature across the whole candidate set.
+    """
+    if not images:
+        return np.zeros(0, dtype=np.float32)
+    weights = weights or DEFAULT_WEIGHTS
+    query = extract_features([user_image], features)
+    matrix = extract_features(images, features)
+
+    total = np.zeros(len(images), dtype=np.float32)
+    weight_sum = 0.0
+    for name in features:
+        q, m = query[name][0], matrix[name]
+        if name == "dhash":
+            similarity = 1.0 - np.count_nonzero(m != q, axis=1) / q.size
+        elif name == "histogram":
+            similarity = np.minimum(m, q).sum(axis=1)  # histogram intersection
+        else:
+            similarity = (m @ q + 1.0) / 2.0  # cosine similarity mapped to [0, 1]
+        w = weights.get(name, 0.0)
+        total += w * similarity.astype(np.float32)
+        weight_sum += w
+    return total / weight_sum if weight_sum else total
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> List[int]:
+    """Indices of the k highest scores, best first."""
+    if k >= len(scores):
+        return [int(i) for i in np.argsort(-scores)]
+    top = np.argpartition(-scores, k)[:k]
+    return [int(i) for i in top[np.argsort(-scores[top])]]
+
+
+def parse_features(value: str) -> List[str]:
+    """'dhash, histogram' -> ['dhash', 'histogram'], ignoring unknown names."""
+    names = [v.strip() for v in value.split(",") if v.strip() in _EXTRACTORS]
+    return names or list(FEATURES)
@@ -1,27 +1,53 @@
-from flask import Flask, request
+from flask import Flask, request, jsonify
 from twilio.twiml.messaging_response import MessagingResponse
 from twilio.rest import Client
-import threading
 import os
 import requests
 import importlib.util
 import sys
 import json
+import atexit
+import threading
+import time
+import metrics
+from deadline import Deadline
+from browser_pool import BrowserPool
+from result_cache import ResultCache
+from job_queue import JobQueue, QUEUED, REJECTED_FULL, REJECTED_USER_LIMIT
+import query_log
+from query_log import QueryLog
+from prewarm_scheduler import PrewarmScheduler
+
+# "lazy" (default) lets the worker answer webhooks right away and loads agent.py and its
+# heavy dependencies (Playwright, NumPy, Gemini SDK) on the first search or in prewarm();
+# "eager" loads everything at import time, as before.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
 
 # ------------------------------------------------------------------
 # Dynamically import your existing agent.py (no rename required)
 # ------------------------------------------------------------------
-module_name = "agent"
-module_path = os.path.join(os.path.dirname(__file__), "agent.py")
-spec = importlib.util.spec_from_file_location(module_name, module_path)
-agent = importlib.util.module_from_spec(spec)
-sys.modules[module_name] = agent
-spec.loader.exec_module(agent)
+_agent = None
+_agent_lock = threading.Lock()
+
+def load_agent():
+    """Imports agent.py once per process; later calls return the loaded module."""
+    global _agent
+    if _agent is not None:
+        return _agent
+    with _agent_lock:
+        if _agent is None:
+            with metrics.span("import_agent"):
+                module_name = "agent"
+                module_path = os.path.join(os.path.dirname(__file__), "agent.py")
+                spec = importlib.util.spec_from_file_location(module_name, module_path)
+                module = importlib.util.module_from_spec(spec)
+                sys.modules[module_name] = module
+                spec.loader.exec_module(module)
+            _agent = module
+    return _agent
 
-run_scraper_with_input = agent.run_scraper_with_input
-load_json_data = agent.load_json_data
-find_visual_matches_in_batch = agent.find_visual_matches_in_batch
-get_expert_recommendation = agent.get_expert_recommendation
+if STARTUP_MODE == "eager":
+    load_agent()
 
 # ------------------------------------------------------------------
 # Twilio configuration
@@ -31,21 +57,47 @@ AUTH_TOKEN = os.getenv("AUTH_TOKEN")
 WHATSAPP_NUMBER = "whatsapp:+14155238886"  # Twilio Sandbox
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")  # Your existing key
 
+# Reference photos keep more detail than product thumbnails
+USER_IMAGE_MAX_SIDE = 1024
+
 app = Flask(__name__)
 client = Client(ACCOUNT_SID, AUTH_TOKEN)
 
+# ------------------------------------------------------------------
+# Warm Chromium shared by every search handled in this worker
+# ------------------------------------------------------------------
+browser_pool = BrowserPool(
+    max_contexts=int(os.getenv("BROWSER_POOL_MAX_CONTEXTS", "3")),
+    max_uses=int(os.getenv("BROWSER_POOL_MAX_USES", "50")),
+    max_memory_mb=int(os.getenv("BROWSER_POOL_MAX_MEMORY_MB", "1500")),
+)
+atexit.register(browser_pool.shutdown)
+
+# Recent results per (query, platform), persisted to SQLite across worker restarts
+result_cache = ResultCache.from_env()
+
 # ------------------------------------------------------------------
 # Download media from WhatsApp
 # ------------------------------------------------------------------
-def download_media(media_url: str, filename: str) -> str:
+def download_media(media_url: str, deadline: Deadline = None) -> str:
+    """
+    Stores the user's image in the content-addressed image cache and returns its path.
+    Identical photos share one file, and different users can never overwrite each other.
+    """
+    # Pillow is imported on first use, like agent.py, so it stays out of worker start-up.
+    from io import BytesIO
+    from PIL import Image
+    from image_cache import get_default_cache
+
     try:
-        os.makedirs("downloads", exist_ok=True)
-        path = os.path.join("downloads", filename)
-        response = requests.get(media_url, stream=True, auth=(ACCOUNT_SID, AUTH_TOKEN))
-        response.raise_for_status()
-        with open(path, "wb") as f:
-            for chunk in response.iter_content(1024):
-                f.write(chunk)
+        with metrics.span("media_download"):
+            timeout = deadline.clamp(30) if deadline else 30
+            response = requests.get(media_url, auth=(ACCOUNT_SID, AUTH_TOKEN), timeout=timeout)
+            response.raise_for_status()
+            image = Image.open(BytesIO(response.content))
+            cache = get_default_cache()
+            content_hash = cache.put_image(image, max_side=USER_IMAGE_MAX_SIDE)
+        path = cache.blob_path(content_hash)
         print(f"[INFO] ✅ Image downloaded → {path}")
         return path
     except Exception as e:
@@ -58,7 +110,8 @@ def download_media(media_url: str, filename: str) -> str:
 def shorten_url_real(url: str) -> str:
     try:
         api_url = f"http://tinyurl.com/api-create.php?url={url}"
-        response = requests.get(api_url, timeout=5)
+        with metrics.span("url_shorten"):
+            response = requests.get(api_url, timeout=5)
         response.raise_for_status()
         return response.text
     except Exception as e:
@@ -66,97 +119,223 @@ def shorten_url_real(url: str) -> str:
         return url  # fallback to original
 
 # ------------------------------------------------------------------
-# Background thread — run scrapers & send a single WhatsApp message
+# Format & send a list of matches as one WhatsApp message
 # ------------------------------------------------------------------
-def process_visual_search(to_number, query, image_path):
-    try:
-        print(f"[THREAD] Starting visual search for '{query}'")
-
-        # 1️⃣ Run all scrapers
-        run_scraper_with_input("flipkart_scraper.py", query)
-        run_scraper_with_input("amazon.py", query)
-        run_scraper_with_input("scrape_myntra.py", query)
-
-        # 2️⃣ Load all scraped data
-        all_products = (
-            load_json_data("flipkart_data.json", "Flipkart")
-            + load_json_data("amazon_data.json", "Amazon")
-            + load_json_data("myntra_data.json", "Myntra")
+def send_message(to_number, body, media_url=None):
+    with metrics.span("twilio_send"):
+        if media_url:
+            client.messages.create(from_=WHATSAPP_NUMBER, to=to_number, body=body, media_url=[media_url])
+        else:
+            client.messages.create(from_=WHATSAPP_NUMBER, to=to_number, body=body)
+
+def send_results(to_number, heading, top_5, highlight=None):
+    message_lines = [heading]
+    if highlight:
+        message_lines.append(highlight)
+    first_img = None
+
+    for i, p in enumerate(top_5, 1):
+        url = p.product_url
+        img = p.image_url
+
+        # Shorten Flipkart URLs to reduce message length
+        if "flipkart.com" in url:
+            url = shorten_url_real(url)
+
+        also_on = ", ".join(f"{o.source} {o.price_text}" for o in p.other_offers())
+        price = f"{p.price_text} on {p.source}" + (f" (also {also_on})" if also_on else "")
+
+        message_lines.append(
+            f"{i}. {p.title}\n💰 {price}\n⭐ {p.rating_text} | 🎯 Match: {p.match_text}\n🔗 {url}\n"
         )
-        if not all_products:
-            client.messages.create(
-                from_=WHATSAPP_NUMBER, to=to_number,
-                body="❌ No products found on Amazon, Flipkart, or Myntra."
-            )
-            return
-
-        # 3️⃣ Find top 5 visual matches (if image provided)
-        if image_path:
-            top_5 = find_visual_matches_in_batch(all_products, image_path, api_key=GEMINI_API_KEY)
-            if not top_5:
-                client.messages.create(
-                    from_=WHATSAPP_NUMBER, to=to_number,
-                    body="⚠️ Could not find visually similar products."
+
+        # Only use the first image
+        if not first_img and img:
+            first_img = img
+
+    # Combine text into a single message
+    final_message = "\n".join(message_lines)
+    if len(final_message) > 1500:
+        final_message = final_message[:1500] + "\n⚠️ Results truncated."
+
+    # Send the single WhatsApp message
+    send_message(to_number, final_message, media_url=first_img)
+
+# ------------------------------------------------------------------
+# Background thread — run scrapers & send results as they arrive
+# ------------------------------------------------------------------
+# Send an early "top picks so far" message once a match scores at least this high...
+EARLY_REPLY_MIN_SCORE = float(os.getenv("EARLY_REPLY_MIN_SCORE", "8"))
+# ...or once this share of the scraping budget has passed with at least one platform done
+# (with the defaults, 15s into the 30s left for scraping).
+EARLY_REPLY_AFTER_FRACTION = float(os.getenv("EARLY_REPLY_AFTER_FRACTION", "0.5"))
+
+# One end-to-end budget per search: past it the user gets the best answer found so far.
+SEARCH_DEADLINE_SECONDS = float(os.getenv("SEARCH_DEADLINE_SECONDS", "45"))
+# Scraping may use all of it but this much, left for image download and Gemini scoring.
+SCORING_RESERVE_SECONDS = float(os.getenv("SCORING_RESERVE_SECONDS", "15"))
+
+def _merge_top_5(top_5, batch, scored):
+    from dedup import merge_duplicates
+
+    # Batches are deduped against earlier platforms before scoring; this only catches
+    # what that missed (e.g. DEDUP_ENABLED=0), keeping one entry with the other as an offer.
+    merged = merge_duplicates(top_5 + batch)
+    if scored:
+        # Gemini-scored products rank above local-only fallbacks; their scores don't compare.
+        merged.sort(key=lambda p: p.match_key(), reverse=True)
+    return merged[:5]
+
+def process_visual_search(to_number, query, image_path, deadline: Deadline = None) -> str:
+    """Runs one search and messages the user. Returns its query_log outcome."""
+    try:
+        deadline = deadline or Deadline(SEARCH_DEADLINE_SECONDS)
+        agent = load_agent()
+        from dedup import Deduper, dedupe
+        from orchestrator import PLATFORM_SCRAPERS
+        from ranking import rank_products
+
+        print(f"[THREAD] Starting visual search for '{query}' ({deadline})")
+        started = time.monotonic()
+        top_5, platforms_done, early_sent, found_any = [], [], False, False
+        # Distinct products seen so far across platforms: a listing another platform already
+        # returned joins that product's offers instead of being scored again.
+        deduper = Deduper()
+
+        # 1️⃣ Scrape all platforms concurrently; each one is scored as soon as it lands.
+        # Scrapers stop early enough to leave time for scoring the last platform.
+        scrape_deadline = deadline.reserve(SCORING_RESERVE_SECONDS if image_path else 0)
+        early_reply_after = scrape_deadline.remaining() * EARLY_REPLY_AFTER_FRACTION
+        for platform, products in agent.iter_platform_results(query, pool=browser_pool, cache=result_cache,
+                                                              deadline=scrape_deadline):
+            platforms_done.append(platform)
+            if not products:
+                continue
+            found_any = True
+
+            # 2️⃣ Top visual matches for this platform (if image provided)
+            if image_path:
+                batch = agent.find_visual_matches_in_batch(products, image_path, api_key=GEMINI_API_KEY,
+                                                           deadline=deadline, deduper=deduper)
+            else:
+                # just take the first (new) products if no image
+                new = dedupe(products, deduper=deduper) if agent.DEDUP_ENABLED else list(range(len(products)))
+                batch = [products[i] for i in new[:5]]
+            top_5 = _merge_top_5(top_5, batch, scored=bool(image_path))
+
+            # 3️⃣ Early "top picks so far" reply while slower platforms are still running
+            still_running = [p for p in PLATFORM_SCRAPERS if p not in platforms_done]
+            # Only a Gemini score is confident enough; local-only fallbacks wait for the timer.
+            best_score = (top_5[0].visual_score or 0) if top_5 and image_path else 0
+            confident = best_score >= EARLY_REPLY_MIN_SCORE
+            waited = time.monotonic() - started >= early_reply_after
+            if top_5 and still_running and not early_sent and (confident or waited):
+                send_results(
+                    to_number,
+                    f"⏳ Top picks so far for: {query} (still searching {', '.join(still_running)})\n",
+                    top_5,
                 )
-                return
-        else:
-            top_5 = all_products[:5]  # just take top 5 if no image
-
-        # 4️⃣ Prepare single message with all products
-        message_lines = [f"✅ Top 5 Matches for: {query}\n"]
-        first_img = None
-
-        for i, p in enumerate(top_5, 1):
-            name = p.get("name") or p.get("title", "Product")
-            price = p.get("price", "N/A")
-            rating = p.get("rating", "N/A")
-            visual = p.get("visual_score", "N/A")
-            url = p.get("product_url", "")
-            img = p.get("image_url")
-
-            # Shorten Flipkart URLs to reduce message length
-            if "flipkart.com" in url:
-                url = shorten_url_real(url)
-
-            message_lines.append(
-                f"{i}. {name}\n💰 {price}\n⭐ {rating} | 🎯 Match: {visual}/10\n🔗 {url}\n"
-            )
+                early_sent = True
+                metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage="first_reply", platform="")
+                print(f"[THREAD] Early results sent to {to_number} after {time.monotonic() - started:.0f}s")
 
-            # Only use the first image
-            if not first_img and img:
-                first_img = img
-
-        # Combine text into a single message
-        final_message = "\n".join(message_lines)
-        if len(final_message) > 1500:
-            final_message = final_message[:1500] + "\n⚠️ Results truncated."
-
-        # Send the single WhatsApp message
-        if first_img:
-            client.messages.create(
-                from_=WHATSAPP_NUMBER,
-                to=to_number,
-                body=final_message,
-                media_url=[first_img]
-            )
-        else:
-            client.messages.create(
-                from_=WHATSAPP_NUMBER,
-                to=to_number,
-                body=final_message
+        if not top_5:
+            send_message(
+                to_number,
+                "⚠️ Could not find visually similar products." if found_any
+                else "❌ No products found on Amazon, Flipkart, or Myntra."
             )
+            return query_log.NO_MATCH if found_any else query_log.NO_RESULTS
 
-        print(f"[THREAD] ✅ Results sent to {to_number}")
+        # 4️⃣ Final message with the best matches across every platform, best value first
+        best, _ = rank_products(top_5)[0]
+        send_results(to_number, f"✅ Top 5 Matches for: {query}\n", top_5,
+                     highlight=f"🏆 Best value: {best.title} on {best.source} ({best.price_text})\n")
+        if not early_sent:
+            metrics.STAGE_SECONDS.observe(time.monotonic() - started, stage="first_reply", platform="")
+        print(f"[THREAD] ✅ Results sent to {to_number} after {time.monotonic() - started:.0f}s")
+
+        # 5️⃣ Optional Gemini write-up, sent as a follow-up once the results are already out
+        if agent.RECOMMENDATION_MODE == "gemini" and deadline.expired():
+            print("[THREAD] Skipping the Gemini write-up: the search deadline has passed.")
+        elif agent.RECOMMENDATION_MODE == "gemini":
+            write_up = agent.get_expert_recommendation(top_5, query, GEMINI_API_KEY, deadline=deadline)
+            send_message(to_number, write_up[:1500])
+        return query_log.RESULTS
 
     except Exception as e:
         print(f"[ERROR] process_visual_search failed: {e}")
         try:
-            client.messages.create(
-                from_=WHATSAPP_NUMBER, to=to_number,
-                body=f"⚠️ Something went wrong while processing your request: {e}"
-            )
+            send_message(to_number, f"⚠️ Something went wrong while processing your request: {e}")
         except:
             pass
+        return query_log.ERROR
+
+# ------------------------------------------------------------------
+# Pre-warm: pay the cold-start costs before the first user does
+# ------------------------------------------------------------------
+def prewarm(browser: bool = True):
+    """
+    Loads agent.py, builds the shared Gemini model and (optionally) launches the pooled
+    Chromium. Called from gunicorn's post_fork hook (see gunicorn.conf.py) on a background
+    thread, so the worker accepts requests while it warms up.
+    """
+    started = time.monotonic()
+    try:
+        agent = load_agent()
+        with metrics.span("prewarm_gemini"):
+            agent.get_model(agent.VISION_MODEL_NAME, GEMINI_API_KEY)
+        if browser:
+            with metrics.span("prewarm_browser"):
+                browser_pool.run(browser_pool.warm(), timeout=60)
+        print(f"[INFO] Worker pre-warmed in {time.monotonic() - started:.1f}s.")
+        if QUERY_PREWARM:
+            prewarm_scheduler.start()
+    except Exception as e:
+        print(f"[WARN] Pre-warm failed; the first search will pay the start-up cost: {e}")
+
+# ------------------------------------------------------------------
+# Bounded job queue — a fixed number of searches run at once
+# ------------------------------------------------------------------
+job_queue = JobQueue(
+    num_workers=int(os.getenv("SEARCH_WORKERS", "2")),
+    max_queued=int(os.getenv("SEARCH_QUEUE_SIZE", "20")),
+    per_user_limit=int(os.getenv("SEARCH_PER_USER_LIMIT", "1")),
+)
+
+def _worker_idle() -> bool:
+    stats = job_queue.stats()
+    return stats["running"] == 0 and stats["queue_depth"] == 0
+
+# ------------------------------------------------------------------
+# Query log & pre-warming of trending searches
+# ------------------------------------------------------------------
+search_log = QueryLog.from_env()
+
+def log_search(query, outcome, latency=None, **fields):
+    metrics.SEARCHES.inc(outcome=outcome)
+    search_log.record(query, outcome, latency, **fields)
+
+# "1" (default) re-scrapes trending queries and pre-fetches their images while the worker
+# is idle; "0" turns it off. See QUERY_PREWARM_* in the README for the budgets.
+QUERY_PREWARM = os.getenv("QUERY_PREWARM", "1") == "1"
+
+prewarm_scheduler = PrewarmScheduler.from_env(search_log, browser_pool, result_cache, is_idle=_worker_idle)
+
+def run_search_job(to_number, query, media_url):
+    # The media download runs here, on a queue worker, so the webhook replies instantly.
+    # The deadline starts here so the media download counts against it too.
+    deadline = Deadline(SEARCH_DEADLINE_SECONDS)
+    started = time.monotonic()
+    outcome = query_log.ERROR
+    try:
+        with metrics.trace_request("whatsapp_search", query=query, image=bool(media_url)):
+            with metrics.span("search_total"):
+                image_path = download_media(media_url, deadline) if media_url else None
+                outcome = process_visual_search(to_number, query, image_path, deadline)
+    finally:
+        log_search(query, outcome, time.monotonic() - started, image=bool(media_url),
+                   deadline_expired=deadline.expired())
 
 # ------------------------------------------------------------------
 # WhatsApp webhook
@@ -185,18 +364,46 @@ def whatsapp_webhook():
         msg.body("Please send a product name and optionally an image 🛍️")
         return str(resp)
 
-    image_path = None
-    if num_media > 0:
-        media_url = request.values.get("MediaUrl0")
-        image_path = download_media(media_url, f"user_{from_number[-4:]}.jpg")
-        msg.body(f"📸 Received your image for '{incoming_msg}'. Searching visually... ⏳")
+    media_url = request.values.get("MediaUrl0") if num_media > 0 else None
+    admission = job_queue.submit(from_number, run_search_job, from_number, incoming_msg, media_url)
+
+    if admission.status == REJECTED_USER_LIMIT:
+        reply = "⏳ I'm still working on your previous search. I'll reply as soon as it's done!"
+    elif admission.status == REJECTED_FULL:
+        reply = "🚦 I'm handling a lot of searches right now. Please try again in a minute."
+    elif media_url:
+        reply = f"📸 Received your image for '{incoming_msg}'. Searching visually... ⏳"
     else:
-        msg.body(f"🔍 Searching '{incoming_msg}' across Amazon, Flipkart & Myntra...")
+        reply = f"🔍 Searching '{incoming_msg}' across Amazon, Flipkart & Myntra..."
 
-    threading.Thread(target=process_visual_search,
-                     args=(from_number, incoming_msg, image_path)).start()
+    if admission.status == QUEUED:
+        reply += f"\n🕒 You're #{admission.position} in line."
+    if not admission.accepted:
+        log_search(incoming_msg, admission.status, image=bool(media_url))
+    if QUERY_PREWARM:
+        prewarm_scheduler.start()
+    msg.body(reply)
+    print(f"[QUEUE] {from_number}: {admission.status} | {job_queue.stats()}")
     return str(resp)
 
+# ------------------------------------------------------------------
+# Queue depth & wait-time metrics
+# ------------------------------------------------------------------
+@app.route("/queue", methods=["GET"])
+def queue_stats():
+    return jsonify(job_queue.stats())
+
+# ------------------------------------------------------------------
+# Prometheus metrics: stage latencies, scrape outcomes, images, Gemini, caches
+# ------------------------------------------------------------------
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    for stat, value in job_queue.stats().items():
+        metrics.QUEUE.set(value, stat=stat)
+    for stat, value in browser_pool.stats().items():
+        metrics.BROWSER_POOL.set(value, stat=stat)
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
 # ------------------------------------------------------------------
 # Run the Flask server
 # ------------------------------------------------------------------